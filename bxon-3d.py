@@ -37,11 +37,17 @@ bl_info = {
     "wiki_url": "https://github.com/nczeroshift/bxon-3d",
     "category": "Import-Export"}
     
-import bpy
-import struct, time, sys, os, math, codecs
-from mathutils import *
-from bpy_extras.io_utils import ExportHelper
-from bpy.props import *
+import struct, time, sys, os, io, re, json, argparse, math, codecs, array, hashlib, zlib, lzma, gzip, contextlib, heapq
+import concurrent.futures, multiprocessing, cProfile, pstats, tracemalloc
+
+try:
+    import bpy
+    from mathutils import *
+    from bpy_extras.io_utils import ExportHelper
+    from bpy.props import *
+except ImportError:
+    # Imported outside of Blender by the mesh serialization workers
+    bpy = None
 
 
 ## BXON python writer methods ##
@@ -54,30 +60,163 @@ BXON_LONG       = 4
 BXON_FLOAT      = 5
 BXON_DOUBLE     = 6
 BXON_BYTE       = 7
+BXON_SHORT      = 8
+BXON_HALF       = 9
+BXON_STRING_REF = 10
 
 BXON_LENGTH_8   = 0x00
 BXON_LENGTH_16  = 0x10
 BXON_LENGTH_32  = 0x20
 BXON_LENGTH_64  = 0x30
+BXON_LENGTH_MASK = 0x30
+
+BXON_LENGTH_FORMATS = {
+    BXON_LENGTH_8 : "<B",
+    BXON_LENGTH_16 : "<H",
+    BXON_LENGTH_32 : "<I",
+    BXON_LENGTH_64 : "<Q"}
+
+## Return the smallest length class holding length.
+def bxon_length_class(length):
+    if length < 0x100:
+        return BXON_LENGTH_8
+    elif length < 0x10000:
+        return BXON_LENGTH_16
+    elif length < 0x100000000:
+        return BXON_LENGTH_32
+    return BXON_LENGTH_64
 
 BXON_OBJECT     = 0x00
 BXON_ARRAY      = 0x40
 BXON_MAP        = 0x80
+BXON_COMPRESSED = 0xC0
+
+# Key of the string table heading the root map
+BXON_STRING_TABLE = "strings"
+
+BXON_FILTER_NONE    = 0
+BXON_FILTER_SHUFFLE = 1
+BXON_FILTER_DELTA   = 2
+
+## Compression codecs by id, each entry holds the name, compress and
+## decompress functions. Ids are stored in the file.
+BXON_CODECS = {}
+
+## Register a compression codec.
+def bxon_register_codec(id, name, compress, decompress):
+    BXON_CODECS[id] = (name, compress, decompress)
+
+## Return the id of a codec from its name.
+def bxon_codec_id(name):
+    for id in BXON_CODECS:
+        if BXON_CODECS[id][0] == name:
+            return id
+    raise ValueError("Unknown compression codec " + name)
+
+bxon_register_codec(1, "zlib", lambda d: zlib.compress(d, 9), zlib.decompress)
+bxon_register_codec(2, "lzma", lzma.compress, lzma.decompress)
+
+try:
+    import zstandard
+    bxon_register_codec(3, "zstd", lambda d: zstandard.ZstdCompressor(level=19).compress(d),
+        lambda d: zstandard.ZstdDecompressor().decompress(d))
+except ImportError:
+    pass
+
+try:
+    import lz4.frame
+    bxon_register_codec(4, "lz4", lz4.frame.compress, lz4.frame.decompress)
+except ImportError:
+    pass
+
+BXON_TYPECODES = {
+    BXON_BOOLEAN : "B",
+    BXON_INT : "i",
+    BXON_LONG : "q",
+    BXON_FLOAT : "f",
+    BXON_DOUBLE : "d",
+    BXON_BYTE : "B",
+    BXON_SHORT : "H",
+    BXON_HALF : "H"}
+
+# Buffer formats accepted for each native type, floats and integers of the
+# same size aren't interchangeable. Halves are given as their 16-bit patterns.
+BXON_BUFFER_FORMATS = {
+    BXON_BOOLEAN : "?bB",
+    BXON_INT : "iIlL",
+    BXON_LONG : "qQlLnN",
+    BXON_FLOAT : "f",
+    BXON_DOUBLE : "d",
+    BXON_BYTE : "bB",
+    BXON_SHORT : "hH",
+    BXON_HALF : "hHe"}
+
+## Create a typed buffer suitable for bxon_array.extend
+def bxon_buffer(t, data = ()):
+    return array.array(BXON_TYPECODES[t], data)
 
 ## File writing context
 class bxon_context(object):
     def __init__(self,f):
         self.file = f
+        self.compact = False
+        self.strings = None
+        # Writer call counts while profiling
+        self.counters = None
 
     def tell(self):
         return self.file.tell()
 
     def seek(self,p):
+        if self.counters != None:
+            self.counters["seek"] += 1
         self.file.seek(p,0)
 
     def write(self,p,v):
+        if self.counters != None:
+            self.counters["pack"] += 1
         self.file.write(struct.pack(p,v))
 
+    def writeBytes(self,data):
+        self.file.write(data)
+
+    def patch(self,pos,p,v):
+        self.seek(pos)
+        self.write(p,v)
+
+    # Write a tag and a length, in the smallest length class when the
+    # context is compact.
+    def writeLength(self,tag,length,lClass=BXON_LENGTH_64):
+        if self.compact:
+            lClass = bxon_length_class(length)
+        self.write("<B",(tag & ~BXON_LENGTH_MASK)|lClass)
+        self.write(BXON_LENGTH_FORMATS[lClass],length)
+
+    # Write a container header with a placeholder length, returns the
+    # context the container content is written to.
+    def open(self,obj,tag):
+        obj.tag = tag
+        obj.headerPos = self.tell()
+        self.write("<B",tag)
+        self.write("<q",0)
+        return self
+
+    # Patch the length of a finished container.
+    def finish(self,obj):
+        self.patch(obj.startPos-8,"<q",obj.endPos - obj.startPos)
+        self.seek(obj.endPos)
+
+    # Write the serialized bytes of a value.
+    def writeValue(self,obj,data):
+        obj.headerPos = self.tell()
+        self.writeBytes(data)
+        obj.endPos = self.tell()
+
+    # Run a function that writes values depending on the final position of
+    # the data written so far.
+    def resolve(self,fn):
+        fn()
+
     def close(self):
         self.file.close()
 
@@ -94,37 +233,254 @@ class bxon_context(object):
             return 1
         elif(t == BXON_BOOLEAN):
             return 1
+        elif(t == BXON_SHORT or t == BXON_HALF):
+            return 2
             
     def writeNative(self,t,s,val):
+        if self.counters != None:
+            self.counters["pack"] += 1
         if t == BXON_FLOAT:
             if s == 1:
-                self.file.write(struct.pack("<f",val))
+                self.writeBytes(struct.pack("<f",val))
             elif s == 2:
-                self.file.write(struct.pack("<2f",val[0],val[1]))
+                self.writeBytes(struct.pack("<2f",val[0],val[1]))
             elif s == 3:
-                self.file.write(struct.pack("<3f",val[0],val[1],val[2]))
+                self.writeBytes(struct.pack("<3f",val[0],val[1],val[2]))
             elif s == 4:
-                self.file.write(struct.pack("<4f",val[0],val[1],val[2],val[3]))
+                self.writeBytes(struct.pack("<4f",val[0],val[1],val[2],val[3]))
             else:
                 for i in range(len(val)):
-                    self.file.write(struct.pack("<1f",val[i]))
+                    self.writeBytes(struct.pack("<1f",val[i]))
         elif t == BXON_INT:
             if s == 1:
-                self.file.write(struct.pack("<i",val))
+                self.writeBytes(struct.pack("<i",val))
             elif s == 2:
-                self.file.write(struct.pack("<2i",val[0],val[1]))
+                self.writeBytes(struct.pack("<2i",val[0],val[1]))
             elif s == 3:
-                self.file.write(struct.pack("<3i",val[0],val[1],val[2]))
+                self.writeBytes(struct.pack("<3i",val[0],val[1],val[2]))
             elif s == 4:
-                self.file.write(struct.pack("<4i",val[0],val[1],val[2],val[3]))
+                self.writeBytes(struct.pack("<4i",val[0],val[1],val[2],val[3]))
+            else:
+                self.writeBytes(struct.pack("<%di" % len(val),*val))
         elif(t == BXON_LONG):
-            self.write("<q",val)
+            self.writeBytes(struct.pack("<q",val))
         elif(t == BXON_DOUBLE):
-            self.write("<d",val) 
-        elif(t == BXON_BOOLEAN):
-            self.write("<B",val) 
-        elif(t == BXON_BYTE):
-            self.write("<B",val) 
+            self.writeBytes(struct.pack("<d",val))
+        elif(t == BXON_BOOLEAN or t == BXON_BYTE):
+            self.writeBytes(struct.pack("<B",val))
+        elif(t == BXON_SHORT):
+            if s == 1:
+                self.writeBytes(struct.pack("<H",val))
+            else:
+                self.writeBytes(struct.pack("<%dH" % len(val),*val))
+        elif(t == BXON_HALF):
+            if s == 1:
+                self.writeBytes(struct.pack("<H",bxHalfBits(val)))
+            else:
+                self.writeBytes(struct.pack("<%dH" % len(val),*bxHalf(val)))
+
+    # Return the little endian bytes of a buffer holding values of type t.
+    def nativeBytes(self,t,buf):
+        size = self.lengthForNative(t)
+        try:
+            data = memoryview(buf)
+        except TypeError:
+            data = memoryview(bxon_buffer(t,buf))
+        if data.itemsize == 1 and data.format in ("B","b","c"):
+            return data.cast("B") if data.c_contiguous else data.tobytes()
+        if data.itemsize != size:
+            raise ValueError("Buffer item size doesn't match the native type")
+        if data.format[-1:] not in BXON_BUFFER_FORMATS[t]:
+            raise ValueError("Buffer format " + data.format + " doesn't match the native type")
+        if sys.byteorder == "big" and size > 1:
+            tmp = bxon_buffer(t,data.tolist())
+            tmp.byteswap()
+            data = memoryview(tmp)
+        if not data.c_contiguous:
+            return data.tobytes()
+        return data.cast("B")
+
+## In-memory writing context, the whole file is kept in a growable buffer
+## and written to the file in a single call when the context is closed.
+class bxon_buffered_context(bxon_context):
+    def __init__(self,f):
+        bxon_context.__init__(self,f)
+        self.buffer = bytearray()
+        self.pos = 0
+
+    def tell(self):
+        return self.pos
+
+    def seek(self,p):
+        if self.counters != None:
+            self.counters["seek"] += 1
+        self.pos = p
+
+    def write(self,p,v):
+        if self.counters != None:
+            self.counters["pack"] += 1
+        self.writeBytes(struct.pack(p,v))
+
+    def writeBytes(self,data):
+        size = len(self.buffer)
+        if self.pos == size:
+            self.buffer += data
+        else:
+            if self.pos > size:
+                self.buffer += bytes(self.pos - size)
+            self.buffer[self.pos:self.pos+len(data)] = data
+        self.pos += len(data)
+
+    def patch(self,pos,p,v):
+        if self.counters != None:
+            self.counters["pack"] += 1
+        size = pos + struct.calcsize(p)
+        if size > len(self.buffer):
+            self.buffer += bytes(size - len(self.buffer))
+        struct.pack_into(p,self.buffer,pos,v)
+
+    def close(self):
+        if self.file != None:
+            self.file.write(self.buffer)
+            self.file.close()
+
+## Node of a streaming context, buffers the content of a single container.
+## Child containers and spliced values are recorded as segments at the
+## offset of the buffer where they belong.
+class bxon_node_context(bxon_buffered_context):
+    def __init__(self,stream):
+        bxon_buffered_context.__init__(self,None)
+        self.stream = stream
+        self.compact = stream.compact
+        self.strings = stream.strings
+        self.counters = stream.counters
+        self.segments = []
+        self.resolver = None
+
+    # Moving in the node buffer isn't a file seek, it isn't counted
+    def seek(self,p):
+        self.pos = p
+
+    def open(self,obj,tag):
+        self.segments.append((self.tell(),obj,True))
+        return self.stream.open(obj,tag)
+
+    def finish(self,obj):
+        if obj.parent == None:
+            self.stream.emit(obj)
+
+    def writeValue(self,obj,data):
+        self.segments.append((self.tell(),obj,False))
+        self.writeBytes(data)
+
+    def resolve(self,fn):
+        self.resolver = fn
+
+## Streaming writing context. Containers are built in memory as a tree of
+## node buffers and written front to back once the root is flushed, with
+## every length known before it is written. The file is never seeked, so it
+## can be a pipe, a socket or a compressor. A compact context writes every
+## length in the smallest length class. With a string table, strings are
+## written as references to a table heading the root map.
+class bxon_stream_context(bxon_context):
+    def __init__(self,f,compact=False,strings=False):
+        bxon_context.__init__(self,f)
+        self.compact = compact
+        if strings:
+            self.strings = {}
+        self.pos = 0
+
+    def tell(self):
+        return self.pos
+
+    def seek(self,p):
+        if p != self.pos:
+            raise IOError("A streaming context can't seek")
+
+    def write(self,p,v):
+        if self.counters != None:
+            self.counters["pack"] += 1
+        self.writeBytes(struct.pack(p,v))
+
+    def writeBytes(self,data):
+        self.file.write(data)
+        self.pos += len(data)
+
+    def open(self,obj,tag):
+        obj.tag = tag
+        return bxon_node_context(self)
+
+    # Size of the header written before a container.
+    def headerSize(self,obj):
+        if self.compact:
+            return 1 + struct.calcsize(BXON_LENGTH_FORMATS[bxon_length_class(obj.contentSize)])
+        return 9
+
+    # Compute the content size of a container and its children.
+    def measure(self,obj):
+        node = obj.context
+        if getattr(obj,"nativeType",BXON_NIL) != BXON_NIL:
+            obj.contentSize = obj.nativeCount * obj.stride * self.lengthForNative(obj.nativeType)
+            return obj.contentSize
+        size = len(node.buffer)
+        for pos, item, isContainer in node.segments:
+            if isContainer:
+                size += self.measure(item)
+                size += self.headerSize(item)
+        obj.contentSize = size
+        return size
+
+    # Write a container header followed by its content.
+    def writeHeader(self,obj):
+        self.writeLength(obj.tag,obj.contentSize)
+
+    def emitContainer(self,obj,prefix=b""):
+        node = obj.context
+        if node.resolver != None:
+            node.resolver()
+        obj.headerPos = self.pos
+        self.writeHeader(obj)
+        obj.startPos = self.pos
+        self.writeBytes(prefix)
+        cursor = 0
+        with memoryview(node.buffer) as data:
+            for pos, item, isContainer in node.segments:
+                if pos > cursor:
+                    self.writeBytes(data[cursor:pos])
+                    cursor = pos
+                if isContainer:
+                    self.emitContainer(item)
+                else:
+                    item.headerPos = self.pos
+                    item.endPos = self.pos + len(item.data)
+            if len(data) > cursor:
+                self.writeBytes(data[cursor:])
+        missing = obj.startPos + obj.contentSize - self.pos
+        if missing > 0:
+            self.writeBytes(bytes(missing))
+        obj.endPos = self.pos
+
+    # Write a finished root container.
+    def emit(self,obj):
+        prefix = b""
+        if self.strings != None:
+            prefix = self.stringTable()
+        self.measure(obj)
+        obj.contentSize += len(prefix)
+        self.emitContainer(obj,prefix)
+
+    # Serialize the string table entry, strings ordered by reference.
+    def stringTable(self):
+        body = bxon_buffered_context(None)
+        body.compact = self.compact
+        for v in sorted(self.strings, key = self.strings.get):
+            bxon_native(BXON_STRING,v).write(body)
+        ctx = bxon_buffered_context(None)
+        ctx.compact = self.compact
+        bxon_native(BXON_STRING,BXON_STRING_TABLE).write(ctx)
+        ctx.writeLength(BXON_ARRAY,len(body.buffer))
+        ctx.writeBytes(body.buffer)
+        return bytes(ctx.buffer)
 
 ## Native value writer            
 class bxon_native(object):
@@ -142,11 +498,13 @@ class bxon_native(object):
         elif self.type == BXON_NIL: 
             ctx.write("<B",BXON_NIL)
         elif self.type == BXON_STRING:
-            ctx.write("<B",BXON_STRING | BXON_LENGTH_32)
-            data = bytearray(self.value.encode('utf-8'));
-            ctx.write("<i",len(data))
-            for c in data:
-                ctx.file.write(struct.pack("<B",c))
+            if ctx.strings != None:
+                ref = ctx.strings.setdefault(self.value,len(ctx.strings))
+                ctx.writeLength(BXON_STRING_REF,ref,bxon_length_class(ref))
+            else:
+                data = self.value.encode('utf-8')
+                ctx.writeLength(BXON_STRING,len(data),BXON_LENGTH_32)
+                ctx.writeBytes(data)
         elif self.type == BXON_BOOLEAN: 
             ctx.write("<B",BXON_BOOLEAN) 
             ctx.write("<B",self.value)    
@@ -159,12 +517,88 @@ class bxon_native(object):
         elif self.type == BXON_BYTE:
             ctx.write("<B",BXON_BYTE)
             ctx.write("<B",self.value)
+        elif self.type == BXON_SHORT:
+            ctx.write("<B",BXON_SHORT)
+            ctx.write("<H",self.value)
+        elif self.type == BXON_HALF:
+            ctx.write("<B",BXON_HALF)
+            ctx.write("<H",bxHalfBits(self.value))
+
+## Pre-serialized value, spliced into a container as is
+class bxon_raw(object):
+    def __init__(self, data):
+        self.data = data
+        self.headerPos = None
+        self.endPos = None
+
+    def write(self,p):
+        p.context.writeValue(self,self.data)
+
+    def flush(self):
+        pass
+
+## Compressed native array, written as a single block holding the codec id,
+## the filter id, the uncompressed length and the compressed bytes
+class bxon_compressed(object):
+    def __init__(self, nType, buf, codec = "zlib"):
+        self.nativeType = nType
+        self.buffer = buf
+        self.codec = bxon_codec_id(codec)
+        self.headerPos = None
+        self.endPos = None
+
+    def write(self,p):
+        ctx = p.context
+        data = bytes(ctx.nativeBytes(self.nativeType,self.buffer))
+        size = ctx.lengthForNative(self.nativeType)
+        filter = BXON_FILTER_NONE
+        if size > 1:
+            if self.nativeType in (BXON_INT, BXON_LONG, BXON_SHORT):
+                filter = BXON_FILTER_DELTA
+                data = bxon_delta(data, size)
+            else:
+                filter = BXON_FILTER_SHUFFLE
+            data = bxon_shuffle(data, size)
+        packed = BXON_CODECS[self.codec][1](data)
+
+        self.headerPos = ctx.tell()
+        ctx.writeLength(BXON_COMPRESSED|self.nativeType,10 + len(packed))
+        ctx.write("<B",self.codec)
+        ctx.write("<B",filter)
+        ctx.write("<Q",len(data))
+        ctx.writeBytes(packed)
+        self.endPos = ctx.tell()
+
+    def flush(self):
+        pass
+
+## Group the bytes of each element by significance.
+def bxon_shuffle(data, size):
+    return b"".join(data[i::size] for i in range(size))
+
+## Replace little endian integers of the given size by their difference to
+## the previous value, modulo the integer range.
+def bxon_delta(data, size):
+    fmt = {2 : "H", 4 : "I", 8 : "Q"}[size]
+    values = array.array(fmt, data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    mask = (1 << (size * 8)) - 1
+    prev = 0
+    for i in range(len(values)):
+        v = values[i]
+        values[i] = (v - prev) & mask
+        prev = v
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tobytes()
 
 ## Map container    
 class bxon_map(object):
     def __init__(self,ctx=None):
         self.parent = None
         self.context = ctx
+        self.headerPos = None
         self.startPos = None
         self.endPos = None
         self.map = {}
@@ -175,8 +609,7 @@ class bxon_map(object):
             self.context = p.context;
         
         if self.startPos == None:
-            self.context.write("<B",BXON_MAP|BXON_LENGTH_64)
-            self.context.write("<q",0)
+            self.context = self.context.open(self,BXON_MAP|BXON_LENGTH_64)
             self.endPos = self.startPos = self.context.tell()
 
     def _update(self, pos = None):
@@ -213,16 +646,14 @@ class bxon_map(object):
         for i in self.map:
             self.map[i].flush();
     
-        lenght = self.endPos - self.startPos;
-        self.context.seek(self.startPos-8);
-        self.context.write("<q",lenght)
-        self.context.seek(self.endPos);
+        self.context.finish(self)
 
 ## Array container
 class bxon_array(object):
     def __init__(self,ctx=None,nType=BXON_NIL,nCount=0,nStride=1):
         self.parent = None
         self.context = ctx
+        self.headerPos = None
         self.startPos = None
         self.endPos = None
         self.nativeType = BXON_NIL;
@@ -239,8 +670,7 @@ class bxon_array(object):
             self.parent = p;
             self.context = p.context;
         if self.startPos == None:
-            self.context.write("<B",BXON_ARRAY|BXON_LENGTH_64|self.nativeType)
-            self.context.write("<q",0)
+            self.context = self.context.open(self,BXON_ARRAY|BXON_LENGTH_64|self.nativeType)
             self.endPos = self.startPos = self.context.tell()
             if self.nativeType != BXON_NIL:
                 ePos = self.startPos + self.nativeCount * self.stride * self.context.lengthForNative(self.nativeType)
@@ -278,14 +708,40 @@ class bxon_array(object):
             self._update()
         return obj
 
+    # Write a whole buffer of native values as one contiguous block.
+    def extend(self, buf):
+        self.write()
+        if self.nativeType == BXON_NIL:
+            for obj in buf:
+                self.push(obj)
+            return buf
+        size = self.stride * self.context.lengthForNative(self.nativeType)
+        data = self.context.nativeBytes(self.nativeType,buf)
+        if len(data) % size != 0:
+            raise ValueError("Buffer length isn't a multiple of the array stride")
+        count = len(data) // size
+        if self.nativeIndex + count > self.nativeCount:
+            raise ValueError("Buffer exceeds the array native count")
+        pos = self.startPos + self.nativeIndex * size
+        if pos != self.context.tell():
+            self.context.seek(pos)
+        self.context.writeBytes(data)
+        self.nativeIndex += count
+        if(self.nativeIndex >= self.nativeCount):
+            self._update()
+        return buf
+
+    # Fill a native array once the position of the values written before it
+    # is final, fn is called right away unless the context is streaming.
+    def resolve(self, fn):
+        self.write()
+        self.context.resolve(fn)
+
     def flush(self):
         for i in range(len(self.array)):
             self.array[i].flush();
 
-        lenght = self.endPos - self.startPos;
-        self.context.seek(self.startPos-8);
-        self.context.write("<q",lenght)
-        self.context.seek(self.endPos);
+        self.context.finish(self)
 
 
 ## Object indexing classes ##
@@ -313,9 +769,13 @@ class bxMap:
     # Dictionary atribute.
     dictionary = {}
     
+    # Merged elements, by key.
+    aliases = {}
+    
     ## Constructor.
     def __init__(self):
         self.dictionary = {}
+        self.aliases = {}
     
     ## Add a element to the dictionary.
     def add(self, data, key = None):
@@ -335,8 +795,20 @@ class bxMap:
     def find(self, key):
         if( key in self.dictionary):
             return self.dictionary[key]
+        if( key in self.aliases):
+            return self.aliases[key]
         return None
     
+    ## Merge an element into another one, its users move to the target and
+    ## its key finds the target from now on.
+    def merge(self, key, target):
+        d_e = self.dictionary.pop(key)
+        target.users.extend(d_e.users)
+        self.aliases[key] = target
+        for i in self.dictionary:
+            if self.dictionary[i].id > d_e.id:
+                self.dictionary[i].id -= 1
+    
     ## Return dictionary size.
     def size(self):
         return len(self.dictionary)
@@ -356,18 +828,18 @@ class bxMap:
 ## Animation utility functions ##
 
 ## Utility function to enumerate objects animation tracks
-def bxListAnimationData(obj):
+## With bake settings the curves are sampled into reduced transform tracks.
+## With an actions map, strips reference the actions added to it instead of
+## holding their curves.
+def bxListAnimationData(obj, bake = None, actions = None):
     tracks = []
     
     if obj.animation_data != None:
         if obj.animation_data.action != None:
             action = obj.animation_data.action
-            range = action.frame_range
             name = action.name
-            gr = bxListActionCurves(action)
-            aflag = False
-            if "bones" in gr: aflag = True
-            rtrack = {"name":name,"strips":[{"range":range,"groups":gr}]}
+            aflag = bxActionHasBones(action)
+            rtrack = {"name":name,"strips":[bxListStrip(obj, action, bake, actions)]}
             if aflag : rtrack["armature"] = True
             tracks.append(rtrack)
                                 
@@ -378,89 +850,1286 @@ def bxListAnimationData(obj):
                 aflag = False
                 for s in t.strips:  
                     action = s.action
-                    range = action.frame_range
-                    gr = bxListActionCurves(action)
-                    if "bones" in gr: aflag = True
-                    tstrips.append({"range":range,"groups":gr})
+                    if bxActionHasBones(action): aflag = True
+                    tstrips.append(bxListStrip(obj, action, bake, actions))
                 rtrack = {"name":name,"strips":tstrips}
                 if aflag: rtrack["armature"] = True
                 tracks.append(rtrack)
     return tracks
 
 
-## Utility function to enumerate animation curves  
-def bxListActionCurves(action):
-    k_pos = None 
-    k_rot = None 
-    k_quat = None
-    k_scale = None
-    k_bones = {}
-    
+## Return the strip of an action, referencing it in actions when given.
+def bxListStrip(obj, action, bake, actions):
+    range = action.frame_range
+    if actions != None:
+        actions.add(action)
+        entry = actions.find(action.name)
+        entry.users.append(obj)
+        return {"range":range,"action":action.name,"id":entry.id}
+    return {"range":range,"groups":bxListStripCurves(obj, action, bake),"baked":bake != None}
+
+## Return True when an action animates pose bones.
+def bxActionHasBones(action):
     for c in action.fcurves:
-        path = c.data_path   
-        idx = c.array_index
-    
-        kf = []
-        for k in c.keyframe_points:
-            kf.append([k.handle_left,k.co,k.handle_right])
-        
-        bone_name = None
-        if path.startswith("pose.bones"):
-            tmp = path.split("\"].")
-            bone_name = tmp[0].split("[\"")[1]
-            path = tmp[1]
-            if not bone_name in k_bones: 
-                k_bones[bone_name] = {}
-                k_bones[bone_name]["position"] = None
-                k_bones[bone_name]["euler"] = None
-                k_bones[bone_name]["quat"] = None
-                k_bones[bone_name]["scale"] = None
-                
-        if path == "location":
-            if bone_name != None:
-                if k_bones[bone_name]["position"] == None :
-                    k_bones[bone_name]["position"] = [1,1,1]
-                k_bones[bone_name]["position"][idx] = kf
-            else:    
-                if k_pos == None : k_pos = [1,1,1]
-                k_pos[idx] = kf
-        elif path == "rotation_euler":
-            if bone_name != None:
-                if k_bones[bone_name]["euler"] == None :
-                    k_bones[bone_name]["euler"] = [1,1,1]
-                k_bones[bone_name]["euler"][idx] = kf
-            else:
-                if k_rot == None : k_rot = [1,1,1]
-                k_rot[idx] = kf
-        elif path == "rotation_quaternion":
-            nIdx = idx;
-            if nIdx == 0:nIdx = 3;
-            elif nIdx == 1:nIdx = 0;
-            elif nIdx == 2:nIdx = 1;
-            elif nIdx == 3:nIdx = 2;
-            if bone_name != None:
-                if k_bones[bone_name]["quat"] == None :
-                    k_bones[bone_name]["quat"] = [1,1,1,1]
-                k_bones[bone_name]["quat"][nIdx] = kf
-            else:
-                if k_quat == None : k_quat= [1,1,1,1]
-                k_quat[nIdx] = kf
-        elif path == "scale":
-            if bone_name != None:
-                if k_bones[bone_name]["scale"] == None :
-                    k_bones[bone_name]["scale"] = [1,1,1]
-                k_bones[bone_name]["scale"][idx] = kf
+        bone, prop = bxParsePath(c.data_path)
+        if bone != None and prop in bxChannelTable:
+            return True
+    return False
+
+## Enumerate the curves of an action, baked when bake settings are given.
+def bxListStripCurves(obj, action, bake):
+    if bake == None:
+        return bxListActionCurves(action)
+    return bxBakeAction(obj, action, bake)
+
+## Animated transform channels by fcurve property: the exported channel
+## name and the exported component of each fcurve array index.
+bxChannelTable = {
+    "location" : ("position", (0, 1, 2)),
+    "rotation_euler" : ("euler", (0, 1, 2)),
+    "rotation_quaternion" : ("quat", (3, 0, 1, 2)),
+    "rotation_axis_angle" : ("axis_angle", (0, 1, 2, 3)),
+    "scale" : ("scale", (0, 1, 2))}
+
+bxBonePath = re.compile(r'^pose\.bones\["(.*)"\]\.([a-z_]+)$')
+
+# Parsed (bone name, property) of each fcurve data path
+bxPathCache = {}
+
+## Return the bone name, None for object curves, and the property of a
+## fcurve data path.
+def bxParsePath(path):
+    parsed = bxPathCache.get(path)
+    if parsed == None:
+        match = bxBonePath.match(path)
+        if match:
+            parsed = (match.group(1), match.group(2))
+        else:
+            parsed = (None, path)
+        bxPathCache[path] = parsed
+    return parsed
+
+## Return the keyframes of a fcurve as (left handle, point, right handle)
+## frame and value pairs, 6 floats per keyframe.
+def bxCurveKeys(curve):
+    points = curve.keyframe_points
+    count = len(points)
+    keys = bxon_buffer(BXON_FLOAT, [0.0]) * (count * 6)
+    buf = bxon_buffer(BXON_FLOAT, [0.0]) * (count * 2)
+    for i, attr in enumerate(("handle_left", "co", "handle_right")):
+        points.foreach_get(attr, buf)
+        keys[i*2::6] = buf[0::2]
+        keys[i*2+1::6] = buf[1::2]
+    return keys
+
+## Utility function to enumerate animation curves. Returns the channels of
+## the object and of each bone ("bones"), each channel holding the keyframes
+## of every component, or the fcurves themselves when curves is set.
+## Components without a fcurve are None.
+def bxListActionCurves(action, curves = False):
+    ret = {}
+    for c in action.fcurves:
+        bone, prop = bxParsePath(c.data_path)
+        channel = bxChannelTable.get(prop)
+        if channel == None:
+            continue
+        name, components = channel
+        group = ret
+        if bone != None:
+            group = ret.setdefault("bones", {}).setdefault(bone, {})
+        if name not in group:
+            group[name] = [None] * len(components)
+        if c.array_index < len(components):
+            group[name][components[c.array_index]] = c if curves else bxCurveKeys(c)
+    return ret
+
+## Animation baking ##
+
+## Return the frames sampled every step over a frame range, both ends included.
+def bxBakeFrames(frameRange, step):
+    start, end = frameRange[0], frameRange[1]
+    count = max(int(math.floor((end - start) / step + 1e-6)), 0)
+    frames = [start + i * step for i in range(count + 1)]
+    if frames[-1] < end:
+        frames.append(end)
+    return frames
+
+## Evaluate the fcurves of a channel at each frame, components without a
+## curve keep their default value.
+def bxSampleCurves(curves, frames, default):
+    values = []
+    for f in frames:
+        for i in range(len(curves)):
+            if curves[i] == None:
+                values.append(default[i])
             else:
-                if k_scale == None : k_scale = [1,1,1]
-                k_scale[idx] = kf 
-    
+                values.append(curves[i].evaluate(f))
+    return values
+
+## Return the euler order of a rotation mode, XYZ for non euler modes.
+def bxEulerOrder(item):
+    mode = getattr(item, "rotation_mode", "XYZ")
+    if mode in ("XYZ", "XZY", "YXZ", "YZX", "ZXY", "ZYX"):
+        return mode
+    return "XYZ"
+
+## Normalize (x, y, z, w) quaternion samples, flipping them into the
+## hemisphere of the previous sample so interpolation takes the short path.
+def bxQuatSamples(values):
+    prev = None
+    for i in range(0, len(values), 4):
+        q = values[i:i+4]
+        l = math.sqrt(sum(v * v for v in q)) or 1.0
+        q = [v / l for v in q]
+        if prev != None and sum(a * b for a, b in zip(q, prev)) < 0.0:
+            q = [-v for v in q]
+        values[i:i+4] = q
+        prev = q
+    return values
+
+## Return the error of interpolating the samples between key a and key b.
+## Linear channels measure the largest component difference, quaternions
+## the angle to the normalized interpolation.
+def bxKeyError(frames, values, stride, a, b, quat):
+    error = 0.0
+    va = values[a*stride:(a+1)*stride]
+    vb = values[b*stride:(b+1)*stride]
+    for i in range(a + 1, b):
+        t = (frames[i] - frames[a]) / (frames[b] - frames[a])
+        v = [x + (y - x) * t for x, y in zip(va, vb)]
+        s = values[i*stride:(i+1)*stride]
+        if quat:
+            l = math.sqrt(sum(x * x for x in v)) or 1.0
+            d = abs(sum(x * y for x, y in zip(v, s))) / l
+            error = max(error, 2.0 * math.acos(min(d, 1.0)))
+        else:
+            error = max(error, max(abs(x - y) for x, y in zip(v, s)))
+    return error
+
+## Remove the samples that interpolation between the kept keys restores
+## within error. Returns the key frames and values as float buffers, and the
+## sample index of each key.
+def bxReduceKeys(frames, values, stride, error, quat = False):
+    keep = [0]
+    if error > 0.0:
+        for i in range(2, len(frames)):
+            if bxKeyError(frames, values, stride, keep[-1], i, quat) > error:
+                keep.append(i - 1)
+    else:
+        keep.extend(range(1, len(frames) - 1))
+    if len(frames) > 1:
+        keep.append(len(frames) - 1)
+    times = bxon_buffer(BXON_FLOAT)
+    keys = bxon_buffer(BXON_FLOAT)
+    for k in keep:
+        times.append(frames[k])
+        keys.extend(values[k*stride:(k+1)*stride])
+    return (times, keys, keep)
+
+## Return the differences between successive sample indices.
+def bxDeltaIndices(indices):
+    deltas = [indices[0]] + [indices[i] - indices[i-1] for i in range(1, len(indices))]
+    if max(deltas) <= 0xFFFF:
+        return BXON_SHORT, bxon_buffer(BXON_SHORT, deltas)
+    return BXON_INT, bxon_buffer(BXON_INT, deltas)
+
+## Encode unit (x, y, z, w) quaternions in 48 bits with the smallest three
+## method. The index of the largest component takes the top 2 bits, the other
+## components follow as 15-bit values over [-1/sqrt(2), 1/sqrt(2)], the
+## result is written as 3 shorts from the least significant.
+def bxSmallestThree(values):
+    out = bxon_buffer(BXON_SHORT)
+    qMax = (1 << 15) - 1
+    r = 1.0 / math.sqrt(2.0)
+    for i in range(0, len(values), 4):
+        q = values[i:i+4]
+        largest = max(range(4), key = lambda c: abs(q[c]))
+        if q[largest] < 0.0:
+            q = [-v for v in q]
+        bits = largest
+        for c in range(4):
+            if c != largest:
+                v = min(max(int(round((q[c] + r) / (2.0 * r) * qMax)), 0), qMax)
+                bits = (bits << 15) | v
+        out.extend((bits & 0xFFFF, (bits >> 16) & 0xFFFF, bits >> 32))
+    return out
+
+## Bake the position, rotation and scale channels of a curve group. Euler
+## rotations are converted to (x, y, z, w) quaternions.
+def bxBakeGroup(group, frames, order, bake):
+    step, error, angleError = bake
     ret = {}
-    if k_pos != None: ret["position"] = k_pos
-    if k_rot != None: ret["euler"] = k_rot
-    if k_scale != None: ret["scale"] = k_scale
-    if len(k_bones) > 0: ret["bones"] = k_bones
+    if group.get("position") != None:
+        values = bxSampleCurves(group["position"], frames, (0.0, 0.0, 0.0))
+        ret["position"] = bxReduceKeys(frames, values, 3, error)
+    if group.get("quat") != None:
+        values = bxSampleCurves(group["quat"], frames, (0.0, 0.0, 0.0, 1.0))
+        ret["quat"] = bxReduceKeys(frames, bxQuatSamples(values), 4, angleError, True)
+    elif group.get("axis_angle") != None:
+        angles = bxSampleCurves(group["axis_angle"], frames, (0.0, 0.0, 1.0, 0.0))
+        values = []
+        for i in range(0, len(angles), 4):
+            a, x, y, z = angles[i:i+4]
+            l = math.sqrt(x * x + y * y + z * z) or 1.0
+            sin = math.sin(a * 0.5) / l
+            values.extend((x * sin, y * sin, z * sin, math.cos(a * 0.5)))
+        ret["quat"] = bxReduceKeys(frames, bxQuatSamples(values), 4, angleError, True)
+    elif group.get("euler") != None:
+        eulers = bxSampleCurves(group["euler"], frames, (0.0, 0.0, 0.0))
+        values = []
+        for i in range(0, len(eulers), 3):
+            q = Euler(eulers[i:i+3], order).to_quaternion()
+            values.extend((q.x, q.y, q.z, q.w))
+        ret["quat"] = bxReduceKeys(frames, bxQuatSamples(values), 4, angleError, True)
+    if group.get("scale") != None:
+        values = bxSampleCurves(group["scale"], frames, (1.0, 1.0, 1.0))
+        ret["scale"] = bxReduceKeys(frames, values, 3, error)
+    return ret
+
+## Bake the curves of an action played by obj, with the same grouping as
+## bxListActionCurves. bake holds the frame step, the linear error and the
+## angular error in radians.
+def bxBakeAction(obj, action, bake):
+    groups = bxListActionCurves(action, True)
+    frames = bxBakeFrames(action.frame_range, bake[0])
+    ret = bxBakeGroup(groups, frames, bxEulerOrder(obj), bake)
+    if "bones" in groups:
+        ret["bones"] = {}
+        pose = getattr(obj, "pose", None)
+        for b in groups["bones"]:
+            pBone = None
+            if pose != None and b in pose.bones:
+                pBone = pose.bones[b]
+            ret["bones"][b] = bxBakeGroup(groups["bones"][b], frames, bxEulerOrder(pBone), bake)
     return ret
 
+## Mesh utility classes ##
+
+## Flat typed arrays of the mesh attributes, fetched with foreach_get.
+class bxMeshData:
+    # Mesh datablock name
+    name = None
+    # Vertex positions and normals, 3 floats per vertex
+    positions = None
+    normals = None
+    # Polygon first loop, loop count and material index
+    loopStart = None
+    loopTotal = None
+    materialIndex = None
+    # Vertex index of each loop
+    loopVertices = None
+    # UV layer names and per loop coordinates, 2 floats per loop
+    uvLayers = []
+    uvs = []
+    # Per loop split normals and vertex colors, only fetched with loop data
+    loopNormals = None
+    colorLayers = []
+    colors = []
+    colorSize = 3
+    # Material names
+    materials = []
+    # Vertex group names
+    groups = []
+    # Weight count per vertex, followed by the flat group/weight pairs
+    weightCounts = None
+    weightGroups = None
+    weightValues = None
+    # Parent armature name and its bone names, in bone id order
+    armature = None
+    bones = []
+    # Number of triangles and quads
+    f3Count = 0
+    f4Count = 0
+
+    ## Constructor.
+    def __init__(self):
+        self.uvLayers = []
+        self.uvs = []
+        self.colorLayers = []
+        self.colors = []
+        self.materials = []
+        self.groups = []
+        self.bones = []
+
+    ## Return the number of vertices.
+    def vertexCount(self):
+        return len(self.positions) // 3
+
+    ## Fetch the mesh attributes in bulk, split normals and vertex colors
+    ## are only fetched when loops is set.
+    def extract(self, obj, mesh, loops = False):
+        self.name = obj.data.name
+
+        vCount = len(mesh.vertices)
+        pCount = len(mesh.polygons)
+        lCount = len(mesh.loops)
+
+        self.positions = bxon_buffer(BXON_FLOAT,[0.0]) * (vCount * 3)
+        self.normals = bxon_buffer(BXON_FLOAT,[0.0]) * (vCount * 3)
+        mesh.vertices.foreach_get("co",self.positions)
+        mesh.vertices.foreach_get("normal",self.normals)
+
+        self.loopStart = bxon_buffer(BXON_INT,[0]) * pCount
+        self.loopTotal = bxon_buffer(BXON_INT,[0]) * pCount
+        self.materialIndex = bxon_buffer(BXON_INT,[0]) * pCount
+        mesh.polygons.foreach_get("loop_start",self.loopStart)
+        mesh.polygons.foreach_get("loop_total",self.loopTotal)
+        mesh.polygons.foreach_get("material_index",self.materialIndex)
+
+        self.loopVertices = bxon_buffer(BXON_INT,[0]) * lCount
+        mesh.loops.foreach_get("vertex_index",self.loopVertices)
+
+        self.f3Count = 0
+        self.f4Count = 0
+        for vLen in self.loopTotal:
+            if vLen == 3:
+                self.f3Count += 1
+            elif vLen == 4:
+                self.f4Count += 1
+
+        for j,layer in enumerate(mesh.uv_textures):
+            self.uvLayers.append(layer.name)
+            uvs = bxon_buffer(BXON_FLOAT,[0.0]) * (lCount * 2)
+            mesh.uv_layers[j].data.foreach_get("uv",uvs)
+            self.uvs.append(uvs)
+
+        if loops:
+            self.loopNormals = bxon_buffer(BXON_FLOAT,[0.0]) * (lCount * 3)
+            if hasattr(mesh, "calc_normals_split"):
+                mesh.calc_normals_split()
+                mesh.loops.foreach_get("normal",self.loopNormals)
+            else:
+                for l in range(lCount):
+                    n = mesh.vertices[self.loopVertices[l]].normal
+                    self.loopNormals[l*3:l*3+3] = bxon_buffer(BXON_FLOAT,n)
+
+            for layer in mesh.vertex_colors:
+                if len(layer.data) > 0:
+                    self.colorSize = len(layer.data[0].color)
+                colors = bxon_buffer(BXON_FLOAT,[0.0]) * (lCount * self.colorSize)
+                layer.data.foreach_get("color",colors)
+                self.colorLayers.append(layer.name)
+                self.colors.append(colors)
+
+        for m in mesh.materials:
+            self.materials.append(m.name)
+
+        for g in obj.vertex_groups:
+            self.groups.append(g.name)
+
+        if len(self.groups) > 0:
+            self.weightCounts = bxon_buffer(BXON_INT)
+            self.weightGroups = bxon_buffer(BXON_INT)
+            self.weightValues = bxon_buffer(BXON_FLOAT)
+            for v in mesh.vertices:
+                self.weightCounts.append(len(v.groups))
+                for group in v.groups:
+                    self.weightGroups.append(group.group)
+                    self.weightValues.append(group.weight)
+
+        if(obj.parent != None and obj.parent.type == 'ARMATURE'):
+            self.armature = obj.parent.data.name
+            self.bones = list(obj.parent.data.bones.keys())
+
+## Estimate the polygon count of an object with its modifiers applied at
+## the 'RENDER' or 'PREVIEW' settings, from its subdivision levels.
+def bxEstimatePolygons(obj, settings):
+    count = len(obj.data.polygons)
+    for m in obj.modifiers:
+        if m.type in ("SUBSURF", "MULTIRES"):
+            if settings == 'RENDER' and m.show_render:
+                count *= 4 ** m.render_levels
+            elif settings == 'PREVIEW' and m.show_viewport:
+                count *= 4 ** m.levels
+    return count
+
+## Chunked access to the attributes of a mesh too large to be fetched whole.
+## Vertices and polygons are read in slices of at most size elements, the
+## generators yield the flat typed buffers of one slice at a time.
+class bxMeshChunks:
+    # Mesh datablock name
+    name = None
+    # Material, UV layer and vertex group names
+    materials = []
+    uvLayers = []
+    groups = []
+    # Parent armature name and its bone names, in bone id order
+    armature = None
+    bones = []
+    # Number of triangles and quads
+    f3Count = 0
+    f4Count = 0
+
+    ## Constructor, counts the triangles and quads of the mesh.
+    def __init__(self, obj, mesh, size):
+        self.name = obj.data.name
+        self.mesh = mesh
+        self.size = size
+        self.materials = [m.name for m in mesh.materials]
+        self.uvLayers = [layer.name for layer in mesh.uv_textures]
+        self.groups = [g.name for g in obj.vertex_groups]
+        self.bones = []
+        if(obj.parent != None and obj.parent.type == 'ARMATURE'):
+            self.armature = obj.parent.data.name
+            self.bones = list(obj.parent.data.bones.keys())
+        for polygons in self.slices(mesh.polygons):
+            for p in polygons:
+                if p.loop_total == 3:
+                    self.f3Count += 1
+                elif p.loop_total == 4:
+                    self.f4Count += 1
+
+    ## Return the number of vertices.
+    def vertexCount(self):
+        return len(self.mesh.vertices)
+
+    ## Yield the elements of a collection in slices of at most size
+    ## elements, a single empty slice for empty collections.
+    def slices(self, collection):
+        for start in range(0, max(len(collection), 1), self.size):
+            yield collection[start:start+self.size]
+
+    ## Yield a vector attribute of the vertices, 3 floats per vertex.
+    def vertexVectors(self, attr):
+        for vertices in self.slices(self.mesh.vertices):
+            buf = bxon_buffer(BXON_FLOAT)
+            for v in vertices:
+                buf.extend(getattr(v, attr))
+            yield buf
+
+    ## Yield the vertex weights, as mesh data holding the weight counts,
+    ## groups and values of a slice of vertices.
+    def weights(self):
+        for vertices in self.slices(self.mesh.vertices):
+            data = bxMeshData()
+            data.groups = self.groups
+            data.bones = self.bones
+            data.weightCounts = bxon_buffer(BXON_INT)
+            data.weightGroups = bxon_buffer(BXON_INT)
+            data.weightValues = bxon_buffer(BXON_FLOAT)
+            for v in vertices:
+                data.weightCounts.append(len(v.groups))
+                for group in v.groups:
+                    data.weightGroups.append(group.group)
+                    data.weightValues.append(group.weight)
+            yield data
+
+    ## Yield the vertex indices of the triangles and quads, 4 per face with
+    ## -1 closing triangles.
+    def faceVertices(self):
+        loops = self.mesh.loops
+        for polygons in self.slices(self.mesh.polygons):
+            faces = bxon_buffer(BXON_INT)
+            for p in polygons:
+                vLen = p.loop_total
+                if vLen == 3 or vLen == 4:
+                    for l in range(p.loop_start, p.loop_start + vLen):
+                        faces.append(loops[l].vertex_index)
+                    if vLen == 3:
+                        faces.append(-1)
+            yield faces
+
+    ## Yield the material index of the triangles and quads.
+    def faceMaterials(self):
+        for polygons in self.slices(self.mesh.polygons):
+            materials = bxon_buffer(BXON_INT)
+            for p in polygons:
+                if p.loop_total == 3 or p.loop_total == 4:
+                    materials.append(p.material_index)
+            yield materials
+
+    ## Yield the UV coordinates of the triangle and quad loops, the layers
+    ## interleaved per loop with V flipped.
+    def faceUVs(self):
+        layers = [self.mesh.uv_layers[j].data for j in range(len(self.uvLayers))]
+        for polygons in self.slices(self.mesh.polygons):
+            uvs = bxon_buffer(BXON_FLOAT)
+            for p in polygons:
+                if p.loop_total == 3 or p.loop_total == 4:
+                    for l in range(p.loop_start, p.loop_start + p.loop_total):
+                        for data in layers:
+                            uv = data[l].uv
+                            uvs.append(uv[0])
+                            uvs.append(-uv[1])
+            yield uvs
+
+## Vertex attribute encoding ##
+
+## Return the per component minimum and extent of interleaved values.
+def bxRange(values, stride):
+    return bxRangeChunks((values,), stride)
+
+## Return the per component offset and scale of interleaved values given as
+## a sequence of buffers.
+def bxRangeChunks(chunks, stride):
+    vMin = [None] * stride
+    vMax = [None] * stride
+    for values in chunks:
+        for c in range(stride):
+            component = values[c::stride]
+            if len(component) > 0:
+                lo = min(component)
+                hi = max(component)
+                if vMin[c] == None or lo < vMin[c]:
+                    vMin[c] = lo
+                if vMax[c] == None or hi > vMax[c]:
+                    vMax[c] = hi
+    vMin = [0.0 if v == None else v for v in vMin]
+    vMax = [0.0 if v == None else v for v in vMax]
+    return vMin, [vMax[c] - vMin[c] for c in range(stride)]
+
+## Quantize interleaved values to unsigned normalized integers of the given
+## bit count, relative to a per component offset and scale.
+def bxQuantize(values, stride, offset, scale, bits):
+    qMax = (1 << bits) - 1
+    out = bxon_buffer(BXON_SHORT if bits > 8 else BXON_BYTE, [0]) * len(values)
+    for c in range(stride):
+        if scale[c] <= 0.0:
+            continue
+        f = qMax / scale[c]
+        o = offset[c]
+        for i in range(c, len(values), stride):
+            out[i] = min(max(int(round((values[i] - o) * f)), 0), qMax)
+    return out
+
+## Octahedral encode unit normals into two unsigned normalized integers.
+def bxOctEncode(normals, bits):
+    qMax = (1 << bits) - 1
+    out = bxon_buffer(BXON_SHORT if bits > 8 else BXON_BYTE)
+    for i in range(0, len(normals), 3):
+        x = normals[i]
+        y = normals[i+1]
+        z = normals[i+2]
+        l = abs(x) + abs(y) + abs(z)
+        if l > 0.0:
+            x /= l
+            y /= l
+            z /= l
+        if z < 0.0:
+            x, y = (1.0 - abs(y)) * (1.0 if x >= 0.0 else -1.0), (1.0 - abs(x)) * (1.0 if y >= 0.0 else -1.0)
+        out.append(min(max(int(round((x * 0.5 + 0.5) * qMax)), 0), qMax))
+        out.append(min(max(int(round((y * 0.5 + 0.5) * qMax)), 0), qMax))
+    return out
+
+## Return the 16-bit pattern of the half float nearest to v, rounding ties
+## to even. struct's "e" format isn't available before Python 3.6.
+def bxHalfBits(v):
+    sign = 0x8000 if math.copysign(1.0, v) < 0.0 else 0
+    v = abs(v)
+    if v != v:
+        return sign | 0x7E00
+    if v == float("inf"):
+        return sign | 0x7C00
+    if v == 0.0:
+        return sign
+    m, e = math.frexp(v)
+    if e < -13:
+        # Subnormal, multiples of 2^-24
+        return sign | int(round(v * 16777216.0))
+    q = int(round(math.ldexp(v, 11 - e)))
+    exponent = e + 14
+    if q == 2048:
+        q = 1024
+        exponent += 1
+    if exponent >= 31:
+        return sign | 0x7C00
+    return sign | (exponent << 10) | (q - 1024)
+
+## Convert values to half floats, stored as their 16-bit patterns.
+def bxHalf(values):
+    return bxon_buffer(BXON_HALF, [bxHalfBits(v) for v in values])
+
+## Return fixed stride skinning influences of each vertex as bone index and
+## weight buffers. Vertex groups are mapped to the bone of the same name, or
+## kept as group ids without bones. The strongest influences are kept,
+## sorted by weight and normalized, unused slots have index and weight 0.
+def bxSkinWeights(data, influences):
+    boneIds = {}
+    for i, name in enumerate(data.bones):
+        boneIds[name] = i
+    groupBones = []
+    for i, name in enumerate(data.groups):
+        if len(data.bones) > 0:
+            groupBones.append(boneIds.get(name))
+        else:
+            groupBones.append(i)
+
+    indices = bxon_buffer(BXON_INT)
+    weights = bxon_buffer(BXON_FLOAT)
+    w = 0
+    for count in data.weightCounts:
+        vWeights = []
+        for k in range(count):
+            bone = groupBones[data.weightGroups[w]]
+            if bone != None and data.weightValues[w] > 0.0:
+                vWeights.append((-data.weightValues[w], bone))
+            w += 1
+        vWeights.sort()
+        vWeights = vWeights[:influences]
+        total = -sum(v[0] for v in vWeights)
+        for k in range(influences):
+            if k < len(vWeights):
+                indices.append(vWeights[k][1])
+                weights.append(-vWeights[k][0] / total)
+            else:
+                indices.append(0)
+                weights.append(0.0)
+    return indices, weights
+
+## Quantize normalized weights to 16 bits, the rounding error of each vertex
+## is added to its strongest weight so the weights still sum to 65535.
+def bxQuantizeWeights(weights, influences):
+    out = bxon_buffer(BXON_SHORT)
+    for i in range(0, len(weights), influences):
+        q = [int(round(v * 65535.0)) for v in weights[i:i+influences]]
+        if q[0] > 0:
+            q[0] += 65535 - sum(q)
+        out.extend(q)
+    return out
+
+## Welded vertex and triangle index buffers built from bxMeshData. Each
+## unique (vertex, split normal, uv..., color...) loop tuple becomes one
+## vertex, polygons are fan triangulated.
+class bxIndexedMesh:
+    # Per vertex positions and normals, 3 floats per vertex
+    positions = None
+    normals = None
+    # Per vertex coordinates of each UV and color layer
+    uvs = []
+    colors = []
+    colorSize = 3
+    # Source mesh vertex of each welded vertex
+    sourceVertices = None
+    # Triangle vertex indices, 3 per triangle
+    indices = None
+    # Material index of each triangle
+    triangleMaterials = None
+
+    ## Constructor.
+    def __init__(self):
+        self.uvs = []
+        self.colors = []
+
+    ## Return the number of vertices.
+    def vertexCount(self):
+        return len(self.sourceVertices)
+
+    ## Return the number of triangles.
+    def triangleCount(self):
+        return len(self.indices) // 3
+
+    ## Weld the loops of a mesh into unique vertices.
+    def weld(self, data):
+        self.colorSize = data.colorSize
+        self.positions = bxon_buffer(BXON_FLOAT)
+        self.normals = bxon_buffer(BXON_FLOAT)
+        self.sourceVertices = bxon_buffer(BXON_INT)
+        self.uvs = [bxon_buffer(BXON_FLOAT) for uvs in data.uvs]
+        self.colors = [bxon_buffer(BXON_FLOAT) for c in data.colors]
+        self.indices = bxon_buffer(BXON_INT)
+        self.triangleMaterials = bxon_buffer(BXON_INT)
+
+        cs = self.colorSize
+        loopNormals = data.loopNormals
+        vertexMap = {}
+        remap = bxon_buffer(BXON_INT,[0]) * len(data.loopVertices)
+
+        for l,v in enumerate(data.loopVertices):
+            key = [v]
+            key.extend(loopNormals[l*3:l*3+3])
+            for uvs in data.uvs:
+                key.extend(uvs[l*2:l*2+2])
+            for colors in data.colors:
+                key.extend(colors[l*cs:l*cs+cs])
+            key = tuple(key)
+            i = vertexMap.get(key)
+            if i == None:
+                i = len(self.sourceVertices)
+                vertexMap[key] = i
+                self.sourceVertices.append(v)
+                self.positions.extend(data.positions[v*3:v*3+3])
+                self.normals.extend(loopNormals[l*3:l*3+3])
+                for j,uvs in enumerate(data.uvs):
+                    self.uvs[j].append(uvs[l*2])
+                    self.uvs[j].append(-uvs[l*2+1])
+                for j,colors in enumerate(data.colors):
+                    self.colors[j].extend(colors[l*cs:l*cs+cs])
+            remap[l] = i
+
+        for p in range(len(data.loopTotal)):
+            ls = data.loopStart[p]
+            for k in range(1, data.loopTotal[p] - 1):
+                self.indices.append(remap[ls])
+                self.indices.append(remap[ls+k])
+                self.indices.append(remap[ls+k+1])
+                self.triangleMaterials.append(data.materialIndex[p])
+
+    ## Simulate a FIFO post-transform cache, returns the average cache miss
+    ## ratio per triangle (ACMR) and per vertex (ATVR).
+    def cacheStats(self, cacheSize = 16):
+        cache = []
+        cached = set()
+        misses = 0
+        for v in self.indices:
+            if v not in cached:
+                misses += 1
+                cache.append(v)
+                cached.add(v)
+                if len(cache) > cacheSize:
+                    cached.discard(cache.pop(0))
+        tCount = max(self.triangleCount(), 1)
+        vCount = max(self.vertexCount(), 1)
+        return misses / tCount, misses / vCount
+
+    ## Reorder triangles for post-transform vertex cache locality, using
+    ## Tom Forsyth's linear-speed vertex cache optimisation.
+    def optimizeVertexCache(self, cacheSize = 32):
+        tCount = self.triangleCount()
+        vCount = self.vertexCount()
+        if tCount == 0:
+            return
+
+        indices = self.indices
+        vertexTris = [[] for v in range(vCount)]
+        for t in range(tCount):
+            for k in range(3):
+                vertexTris[indices[t*3+k]].append(t)
+
+        remaining = [len(tris) for tris in vertexTris]
+        cachePos = [-1] * vCount
+
+        def vertexScore(v):
+            if remaining[v] == 0:
+                return -1.0
+            score = 0.0
+            pos = cachePos[v]
+            if pos >= 0:
+                if pos < 3:
+                    score = 0.75
+                else:
+                    score = (1.0 - (pos - 3) / (cacheSize - 3)) ** 1.5
+            return score + 2.0 * remaining[v] ** -0.5
+
+        vScore = [vertexScore(v) for v in range(vCount)]
+        tScore = [vScore[indices[t*3]] + vScore[indices[t*3+1]] + vScore[indices[t*3+2]] for t in range(tCount)]
+        emitted = [False] * tCount
+        order = []
+        cache = []
+        scan = 0
+
+        best = max(range(tCount), key = lambda t: tScore[t])
+        while best >= 0:
+            emitted[best] = True
+            order.append(best)
+            tri = indices[best*3:best*3+3]
+            for v in tri:
+                vertexTris[v].remove(best)
+                remaining[v] -= 1
+                if v in cache:
+                    cache.remove(v)
+            cache[0:0] = tri
+
+            evicted = cache[cacheSize:]
+            del cache[cacheSize:]
+            for v in evicted:
+                cachePos[v] = -1
+            for i,v in enumerate(cache):
+                cachePos[v] = i
+
+            touched = set()
+            for v in cache + evicted:
+                score = vertexScore(v)
+                diff = score - vScore[v]
+                vScore[v] = score
+                for t in vertexTris[v]:
+                    tScore[t] += diff
+                    touched.add(t)
+
+            best = -1
+            bestScore = -1.0
+            for t in touched:
+                if tScore[t] > bestScore:
+                    best = t
+                    bestScore = tScore[t]
+
+            if best < 0:
+                while scan < tCount and emitted[scan]:
+                    scan += 1
+                if scan < tCount:
+                    best = scan
+
+        self.indices = bxon_buffer(BXON_INT, [indices[t*3+k] for t in order for k in range(3)])
+        self.triangleMaterials = bxon_buffer(BXON_INT, [self.triangleMaterials[t] for t in order])
+
+    ## Renumber vertices in order of first use for vertex fetch locality.
+    def optimizeVertexFetch(self):
+        vCount = self.vertexCount()
+        remap = [-1] * vCount
+        order = []
+        for v in self.indices:
+            if remap[v] < 0:
+                remap[v] = len(order)
+                order.append(v)
+        for v in range(vCount):
+            if remap[v] < 0:
+                remap[v] = len(order)
+                order.append(v)
+
+        def permute(values, size):
+            out = bxon_buffer(BXON_FLOAT)
+            for v in order:
+                out.extend(values[v*size:v*size+size])
+            return out
+
+        self.positions = permute(self.positions, 3)
+        self.normals = permute(self.normals, 3)
+        self.uvs = [permute(uvs, 2) for uvs in self.uvs]
+        self.colors = [permute(colors, self.colorSize) for colors in self.colors]
+        self.sourceVertices = bxon_buffer(BXON_INT, [self.sourceVertices[v] for v in order])
+        self.indices = bxon_buffer(BXON_INT, [remap[v] for v in self.indices])
+
+## Mesh simplification ##
+
+def bxCross(a, b):
+    return (a[1]*b[2] - a[2]*b[1], a[2]*b[0] - a[0]*b[2], a[0]*b[1] - a[1]*b[0])
+
+def bxSub(a, b):
+    return (a[0] - b[0], a[1] - b[1], a[2] - b[2])
+
+def bxDot(a, b):
+    return a[0]*b[0] + a[1]*b[1] + a[2]*b[2]
+
+## Return the quadric of the plane through p with unit normal n, scaled by
+## weight, as its 10 coefficients followed by the weight.
+def bxPlaneQuadric(n, p, weight):
+    a, b, c = n
+    d = -bxDot(n, p)
+    return [a*a*weight, a*b*weight, a*c*weight, a*d*weight, b*b*weight, b*c*weight, b*d*weight,
+            c*c*weight, c*d*weight, d*d*weight, weight]
+
+## Add quadric r to quadric q.
+def bxQuadricAdd(q, r):
+    for i in range(11):
+        q[i] += r[i]
+
+## Return the squared distance of a point to the planes of a quadric,
+## averaged by their weights.
+def bxQuadricError(q, p):
+    if q[10] <= 0.0:
+        return 0.0
+    x, y, z = p
+    e = (q[0]*x*x + 2.0*q[1]*x*y + 2.0*q[2]*x*z + 2.0*q[3]*x + q[4]*y*y + 2.0*q[5]*y*z
+         + 2.0*q[6]*y + q[7]*z*z + 2.0*q[8]*z + q[9])
+    return max(e, 0.0) / q[10]
+
+## Quadric error metric simplification of a triangle mesh by half edge
+## collapses. Vertices are never moved, so each level indexes a subset of
+## the source vertices. Open borders, and UV or normal seams of welded
+## meshes, are held in place by constraint planes.
+class bxSimplifier:
+    # Weight of the border constraint planes relative to the face planes
+    borderWeight = 10.0
+    # Smallest cosine of the rotation of a triangle normal by a collapse
+    minNormalCos = 0.2
+    # Smallest triangle area relative to the average source triangle
+    minAreaRatio = 1e-3
+    # Vertex positions
+    points = []
+    # Vertex indices of each triangle and whether it is still in the mesh
+    triangles = []
+    alive = []
+    triangleCount = 0
+    # Triangles using each vertex
+    vertexTriangles = []
+    # Accumulated quadric of each vertex
+    quadrics = []
+    # Collapse candidates as (error, source, target, versions) entries,
+    # outdated once either vertex version changed
+    heap = []
+    version = []
+    removed = []
+    # Largest collapse error so far, in position units
+    error = 0.0
+    # Twice the area below which a triangle is degenerate
+    minArea = 0.0
+
+    ## Constructor, builds the vertex quadrics and the collapse candidates.
+    def __init__(self, positions, indices):
+        vCount = len(positions) // 3
+        self.points = [tuple(positions[v*3:v*3+3]) for v in range(vCount)]
+        self.triangles = [list(indices[t:t+3]) for t in range(0, len(indices), 3)]
+        self.alive = [True] * len(self.triangles)
+        self.triangleCount = len(self.triangles)
+        self.vertexTriangles = [set() for v in range(vCount)]
+        self.quadrics = [[0.0] * 11 for v in range(vCount)]
+        self.heap = []
+        self.version = [0] * vCount
+        self.removed = [False] * vCount
+        self.error = 0.0
+        self.minArea = 0.0
+
+        edges = {}
+        totalArea = 0.0
+        for t, tri in enumerate(self.triangles):
+            if tri[0] == tri[1] or tri[1] == tri[2] or tri[0] == tri[2]:
+                self.alive[t] = False
+                self.triangleCount -= 1
+                continue
+            p0, p1, p2 = [self.points[v] for v in tri]
+            n = bxCross(bxSub(p1, p0), bxSub(p2, p0))
+            l = math.sqrt(bxDot(n, n))
+            totalArea += l
+            if l > 0.0:
+                n = (n[0] / l, n[1] / l, n[2] / l)
+                q = bxPlaneQuadric(n, p0, l * 0.5)
+                for v in tri:
+                    bxQuadricAdd(self.quadrics[v], q)
+            for k in range(3):
+                a, b = tri[k], tri[(k+1) % 3]
+                self.vertexTriangles[a].add(t)
+                key = (min(a, b), max(a, b))
+                if key in edges:
+                    edges[key] = None
+                else:
+                    edges[key] = (a, b, n)
+        if self.triangleCount > 0:
+            self.minArea = self.minAreaRatio * totalArea / self.triangleCount
+
+        for key in edges:
+            border = edges[key]
+            if border == None:
+                continue
+            a, b, n = border
+            e = bxSub(self.points[b], self.points[a])
+            bn = bxCross(e, n)
+            l = math.sqrt(bxDot(bn, bn))
+            if l > 0.0:
+                q = bxPlaneQuadric((bn[0] / l, bn[1] / l, bn[2] / l), self.points[a], self.borderWeight * bxDot(e, e))
+                bxQuadricAdd(self.quadrics[a], q)
+                bxQuadricAdd(self.quadrics[b], q)
+
+        for a, b in edges:
+            self.pushEdge(a, b)
+
+    ## Queue the cheaper collapse direction of an edge.
+    def pushEdge(self, a, b):
+        q = list(self.quadrics[a])
+        bxQuadricAdd(q, self.quadrics[b])
+        aError = bxQuadricError(q, self.points[a])
+        bError = bxQuadricError(q, self.points[b])
+        if bError <= aError:
+            heapq.heappush(self.heap, (bError, a, b, self.version[a], self.version[b]))
+        else:
+            heapq.heappush(self.heap, (aError, b, a, self.version[b], self.version[a]))
+
+    ## Return the normal of a triangle scaled by twice its area.
+    def normal(self, tri):
+        p0, p1, p2 = [self.points[v] for v in tri]
+        return bxCross(bxSub(p1, p0), bxSub(p2, p0))
+
+    ## Collapse vertex src into its neighbour dst, unless that would fold
+    ## over or degenerate a triangle. Returns True when collapsed.
+    def collapse(self, src, dst):
+        adjacent = False
+        for t in self.vertexTriangles[src]:
+            tri = self.triangles[t]
+            if dst in tri:
+                adjacent = True
+                continue
+            before = self.normal(tri)
+            after = self.normal([dst if v == src else v for v in tri])
+            lAfter = math.sqrt(bxDot(after, after))
+            if lAfter <= self.minArea:
+                return False
+            # Reject rotations past acos(minNormalCos), flips included
+            if bxDot(before, after) < self.minNormalCos * math.sqrt(bxDot(before, before)) * lAfter:
+                return False
+        if not adjacent:
+            return False
+
+        for t in self.vertexTriangles[src]:
+            tri = self.triangles[t]
+            if dst in tri:
+                self.alive[t] = False
+                self.triangleCount -= 1
+                for v in tri:
+                    if v != src:
+                        self.vertexTriangles[v].discard(t)
+            else:
+                tri[tri.index(src)] = dst
+                self.vertexTriangles[dst].add(t)
+        self.vertexTriangles[src] = set()
+        self.removed[src] = True
+        bxQuadricAdd(self.quadrics[dst], self.quadrics[src])
+        self.version[dst] += 1
+
+        neighbours = set()
+        for t in self.vertexTriangles[dst]:
+            neighbours.update(self.triangles[t])
+        neighbours.discard(dst)
+        for v in neighbours:
+            self.pushEdge(dst, v)
+        return True
+
+    ## Simplify down to each target triangle count, in decreasing order,
+    ## stopping once the next collapse error exceeds maxError (0 for no
+    ## limit). Returns the remaining source triangles, their vertex indices
+    ## and the error of each target.
+    def simplify(self, targets, maxError = 0.0):
+        levels = []
+        for target in targets:
+            while self.triangleCount > target and len(self.heap) > 0:
+                entry = heapq.heappop(self.heap)
+                cost, src, dst, vSrc, vDst = entry
+                if self.removed[src] or self.removed[dst] or self.version[src] != vSrc or self.version[dst] != vDst:
+                    continue
+                error = math.sqrt(cost)
+                if maxError > 0.0 and error > maxError:
+                    heapq.heappush(self.heap, entry)
+                    break
+                if self.collapse(src, dst):
+                    self.error = max(self.error, error)
+            triangles = self.liveTriangles()
+            levels.append((triangles, self.indices(triangles), self.error))
+        return levels
+
+    ## Return the source indices of the remaining triangles, degenerate
+    ## triangles left out.
+    def liveTriangles(self):
+        out = []
+        for t, tri in enumerate(self.triangles):
+            if self.alive[t]:
+                n = self.normal(tri)
+                if math.sqrt(bxDot(n, n)) > self.minArea:
+                    out.append(t)
+        return out
+
+    ## Return the vertex indices of triangles.
+    def indices(self, triangles):
+        out = bxon_buffer(BXON_INT)
+        for t in triangles:
+            out.extend(self.triangles[t])
+        return out
+
+## Table of contents of the exported datablocks, stored under the root
+## "index" key. For each datablock type it holds the names, the byte offset
+## of each datablock relative to the root map and its length in bytes.
+class bxIndex:
+    # Datablock types in export order
+    types = []
+    # Written values per datablock type
+    entries = {}
+
+    ## Constructor.
+    def __init__(self):
+        self.types = []
+        self.entries = {}
+
+    ## Add a written datablock.
+    def add(self, type, name, value):
+        if type not in self.entries:
+            self.types.append(type)
+            self.entries[type] = []
+        self.entries[type].append((name, value))
+
+    ## Write the index into the root map.
+    def write(self, root):
+        node = root.put("index", bxon_map())
+        for t in self.types:
+            entries = self.entries[t]
+            tNode = node.put(t, bxon_map())
+            names = tNode.put("names", bxon_array())
+            for e in entries:
+                names.push(bxon_native(BXON_STRING, e[0]))
+            offsets = tNode.put("offsets", bxon_array(nType=BXON_LONG, nCount = len(entries)))
+            lengths = tNode.put("lengths", bxon_array(nType=BXON_LONG, nCount = len(entries)))
+            offsets.resolve(lambda a = offsets, e = entries: a.extend([v.headerPos - root.headerPos for n, v in e]))
+            lengths.resolve(lambda a = lengths, e = entries: a.extend([v.endPos - v.headerPos for n, v in e]))
+
+## Content hashing and export cache ##
+
+## Update a hash with a python value, vectors and matrices are hashed by value.
+def bxHashValue(h, v):
+    if v is None or isinstance(v, (bool, int, float, str)):
+        h.update(repr(v).encode("utf-8"))
+    elif isinstance(v, dict):
+        for k in sorted(v.keys()):
+            h.update(repr(k).encode("utf-8"))
+            bxHashValue(h, v[k])
+    elif isinstance(v, array.array):
+        h.update(v.tobytes())
+    else:
+        h.update(b"[")
+        for i in v:
+            bxHashValue(h, i)
+        h.update(b"]")
+
+## Update a hash with the RNA properties of a Blender struct.
+def bxHashRNA(h, data):
+    for prop in data.bl_rna.properties:
+        if prop.identifier == "rna_type":
+            continue
+        h.update(prop.identifier.encode("utf-8"))
+        value = getattr(data, prop.identifier)
+        if prop.type in {"BOOLEAN", "INT", "FLOAT", "STRING", "ENUM"}:
+            if prop.type == "ENUM" and prop.is_enum_flag:
+                value = sorted(value)
+            elif prop.type != "STRING" and prop.type != "ENUM" and prop.is_array:
+                value = list(value)
+            bxHashValue(h, value)
+        elif prop.type == "POINTER" and value != None:
+            # Referenced objects change the result through their transform and pose
+            if hasattr(value, "name"):
+                bxHashValue(h, value.name)
+            if hasattr(value, "matrix_world"):
+                bxHashValue(h, value.matrix_world)
+            if getattr(value, "pose", None) != None:
+                for b in value.pose.bones:
+                    bxHashValue(h, b.matrix)
+
+## Return the objects referenced by the pointer properties of a Blender struct.
+def bxReferencedObjects(data):
+    objects = []
+    for prop in data.bl_rna.properties:
+        if prop.type == "POINTER" and prop.identifier != "rna_type":
+            value = getattr(data, prop.identifier)
+            if value != None and hasattr(value, "modifiers") and hasattr(value, "data"):
+                objects.append(value)
+    return objects
+
+## Persistent cache of serialized datablocks, stored next to the output file
+## with one file per content hash.
+class bxCache:
+    # Cache directory
+    path = None
+    # Keys used by the current export
+    used = set()
+
+    ## Constructor.
+    def __init__(self, filename):
+        self.path = filename + ".cache"
+        self.used = set()
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+
+    ## Return the cached bytes for a key, or None.
+    def get(self, key):
+        self.used.add(key)
+        name = os.path.join(self.path, key + ".bxon")
+        if not os.path.isfile(name):
+            return None
+        with open(name, "rb") as f:
+            return f.read()
+
+    ## Store the bytes of a key.
+    def put(self, key, data):
+        self.used.add(key)
+        with open(os.path.join(self.path, key + ".bxon"), "wb") as f:
+            f.write(data)
+
+    ## Remove the entries that weren't used by the current export.
+    def prune(self):
+        for name in os.listdir(self.path):
+            if name.endswith(".bxon") and name[:-5] not in self.used:
+                os.remove(os.path.join(self.path, name))
+
+## Export instrumentation ##
+
+## Stage of an export that isn't profiled.
+class bxNoStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+## Per stage timers, bytes per datablock type and writer call counts,
+## optionally with a cProfile or tracemalloc capture.
+class bxProfile:
+    # Seconds and calls per stage
+    stages = {}
+    # Written datablocks as (type, value) pairs
+    datablocks = []
+    # Writer call counts
+    counters = {}
+
+    ## Constructor, profiler is None, "cprofile" or "tracemalloc".
+    def __init__(self, profiler = None):
+        self.stages = {}
+        self.datablocks = []
+        self.counters = {"pack" : 0, "seek" : 0}
+        self.profiler = profiler
+        self.capture = None
+        self.startTime = None
+        self.totalTime = None
+
+    ## Time the enclosed code as a stage, nested stages are inclusive.
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry = self.stages.setdefault(name, [0.0, 0])
+            entry[0] += time.perf_counter() - start
+            entry[1] += 1
+
+    ## Time every call of a method of obj as a stage of the same name.
+    def timeMethod(self, obj, name):
+        method = getattr(obj, name)
+        def timed(*args, **kwargs):
+            with self.stage(name):
+                return method(*args, **kwargs)
+        setattr(obj, name, timed)
+
+    ## Record a written datablock, its size is read once the file is written.
+    def addDatablock(self, type, value):
+        self.datablocks.append((type, value))
+
+    ## Start the optional profiler. Writer calls are counted by the
+    ## contexts sharing the counters.
+    def start(self):
+        if self.profiler == "cprofile":
+            self.capture = cProfile.Profile()
+            self.capture.enable()
+        elif self.profiler == "tracemalloc":
+            tracemalloc.start()
+        self.startTime = time.perf_counter()
+
+    ## Stop the profiler.
+    def stop(self):
+        self.totalTime = time.perf_counter() - self.startTime
+        if self.profiler == "cprofile":
+            self.capture.disable()
+        elif self.profiler == "tracemalloc":
+            self.capture = (tracemalloc.take_snapshot(), tracemalloc.get_traced_memory())
+            tracemalloc.stop()
+
+    ## Return the report as a dictionary.
+    def report(self):
+        ret = {"seconds" : self.totalTime, "stages" : {}, "bytes" : {}, "counters" : dict(self.counters)}
+        for name in self.stages:
+            ret["stages"][name] = {"seconds" : self.stages[name][0], "calls" : self.stages[name][1]}
+        for type, value in self.datablocks:
+            ret["bytes"][type] = ret["bytes"].get(type, 0) + value.endPos - value.headerPos
+        if self.profiler == "cprofile":
+            stats = pstats.Stats(self.capture)
+            top = sorted(stats.stats.items(), key = lambda s: s[1][3], reverse = True)[:30]
+            ret["cprofile"] = [{"function" : "%s:%d(%s)" % f, "calls" : v[1], "seconds" : v[2], "cumulative" : v[3]} for f, v in top]
+        elif self.profiler == "tracemalloc":
+            snapshot, (current, peak) = self.capture
+            ret["tracemalloc"] = {"current" : current, "peak" : peak,
+                "top" : [{"location" : str(t.traceback), "size" : t.size, "count" : t.count} for t in snapshot.statistics("lineno")[:20]]}
+        return ret
+
+    ## Write the report as JSON, with the cProfile stats next to it.
+    def write(self, path):
+        report = self.report()
+        if self.profiler == "cprofile":
+            self.capture.dump_stats(os.path.splitext(path)[0] + ".prof")
+        with open(path, "w") as f:
+            json.dump(report, f, indent = 2)
+
 ## BXON exporter ##
 
 class bxExporter:
@@ -475,11 +2144,53 @@ class bxExporter:
         self.armatureMap = bxMap()
         self.cameraMap = bxMap()
         self.curveMap = bxMap()
+        self.actionMap = bxMap()
         self.applyModifiers = True
+        self.index = None
+        self.cache = None
+        self.workers = 1
+        self.meshLayout = "faces"
+        self.optimizeMesh = False
+        self.positionEncoding = "float"
+        self.normalEncoding = "float"
+        self.uvEncoding = "float"
+        self.compression = None
+        self.compressionThreshold = 4096
+        self.compact = False
+        self.maxInfluences = 0
+        self.weightEncoding = "float"
+        self.bakeAnimation = False
+        self.bakeStep = 1.0
+        self.bakeError = 0.0001
+        self.bakeAngleError = 0.0005
+        self.animationEncoding = "float"
+        self.shareActions = False
+        self.mergeMeshes = False
+        self.quiet = False
+        self.profile = None
+        self.meshChunk = 0
+        self.polygonBudget = 0
+        self.lodRatios = []
+        self.lodError = 0.0
+        # Extracted mesh arrays waiting to be exported, by mesh name
+        self.meshData = {}
         
-    ## Get unique selected elements.
-    def getSelected(self):                
-        for o in bpy.context.selected_objects:
+    ## Print a progress message unless quiet.
+    def log(self, msg):
+        if not self.quiet:
+            print(msg)
+
+    ## Time the enclosed code as a profiling stage.
+    def stage(self, name):
+        if self.profile == None:
+            return bxNoStage()
+        return self.profile.stage(name)
+
+    ## Get unique selected elements, or the elements of the given objects.
+    def getSelected(self, objects = None):
+        if objects == None:
+            objects = bpy.context.selected_objects
+        for o in objects:
             add_obj = False
             if(o.type == "MESH"):
                 add_obj = True
@@ -521,24 +2232,33 @@ class bxExporter:
             if(add_obj):
                 self.objectMap.add(o)
                 element = self.objectMap.find(o.name)
-                atracks = bxListAnimationData(o)
+                bake = None
+                if self.bakeAnimation:
+                    bake = (self.bakeStep, self.bakeError, self.bakeAngleError)
+                actions = None
+                if self.shareActions:
+                    actions = self.actionMap
+                atracks = bxListAnimationData(o, bake, actions)
                 if len(atracks) > 0:
                     element.tracks = atracks
+
+        if self.mergeMeshes:
+            self.mergeDuplicateMeshes()
       
-        print (" Selection")
-        print ("  Objects : " + str(self.objectMap.size()))
-        print ("  Meshs : " + str(self.meshMap.size()))
-        print ("  Materials : " + str(self.materialMap.size()))    
-        print ("  Textures : " + str(self.textureMap.size()))
-        print ("  Cameras : " + str(self.cameraMap.size()))
-        print ("  Lamps : " + str(self.lampMap.size()))
-        print ("  Armatures : " + str(self.armatureMap.size()))
-        print ("  Curves : " + str(self.curveMap.size()))
+        self.log(" Selection")
+        self.log("  Objects : " + str(self.objectMap.size()))
+        self.log("  Meshs : " + str(self.meshMap.size()))
+        self.log("  Materials : " + str(self.materialMap.size()))    
+        self.log("  Textures : " + str(self.textureMap.size()))
+        self.log("  Cameras : " + str(self.cameraMap.size()))
+        self.log("  Lamps : " + str(self.lampMap.size()))
+        self.log("  Armatures : " + str(self.armatureMap.size()))
+        self.log("  Curves : " + str(self.curveMap.size()))
     
     ## Write texture data.
     def exportTexture(self, array, entry):
         tex = entry.data
-        print("  Texture : \"" + tex.name + "\"")
+        self.log("  Texture : \"" + tex.name + "\"")
         node = array.push(bxon_map())
         node.put("name", tex.name)
         node.put("type", "image")
@@ -628,7 +2348,7 @@ class bxExporter:
     ## Write material data.
     def exportMaterial(self, array, entry):
         mat = entry.data
-        print("  Material : \"" + mat.name + "\"")
+        self.log("  Material : \"" + mat.name + "\"")
         #node = map.put(mat.name,bxon_map())
         
         node = array.push(bxon_map())
@@ -667,7 +2387,7 @@ class bxExporter:
     ## Write camera data.    
     def exportCamera(self, array, entry):
         cam = entry.data
-        print("  Camera : \"" + cam.name + "\"")
+        self.log("  Camera : \"" + cam.name + "\"")
         #node = map.put(cam.name, bxon_map())
         node = array.push(bxon_map())
         node.put("name",cam.name)
@@ -683,7 +2403,7 @@ class bxExporter:
         LAMP_TYPE_SUN   = 2
         LAMP_TYPE_AREA  = 3
         lamp = entry.data
-        print("  Lamp : \"" + lamp.name + "\"")
+        self.log("  Lamp : \"" + lamp.name + "\"")
         #node = map.put(lamp.name, bxon_map())
         node = array.push(bxon_map())
         node.put("name",lamp.name)
@@ -721,7 +2441,7 @@ class bxExporter:
     ## Write curve data.
     def exportCurve(self, array, entry):
         curve = entry.data
-        print("  Curve : \"" + curve.name + "\"")
+        self.log("  Curve : \"" + curve.name + "\"")
         #node = pNode.put(curve.name, bxon_map())
         node = array.push(bxon_map())
         node.put("name",curve.name)
@@ -733,10 +2453,16 @@ class bxExporter:
             left = bezNode.put("left", bxon_array(nType=BXON_FLOAT, nCount = count, nStride = 3))
             center = bezNode.put("center", bxon_array(nType=BXON_FLOAT, nCount = count, nStride = 3))
             right = bezNode.put("right", bxon_array(nType=BXON_FLOAT, nCount = count, nStride = 3))
+            bLeft = bxon_buffer(BXON_FLOAT)
+            bCenter = bxon_buffer(BXON_FLOAT)
+            bRight = bxon_buffer(BXON_FLOAT)
             for p in sp.bezier_points:
-                left.push(p.handle_left)
-                center.push(p.co)
-                right.push(p.handle_right)       
+                bLeft.extend(p.handle_left)
+                bCenter.extend(p.co)
+                bRight.extend(p.handle_right)
+            left.extend(bLeft)
+            center.extend(bCenter)
+            right.extend(bRight)
         return True
     
     def exportGraphGroup(self, groups, nStrip):
@@ -759,16 +2485,51 @@ class bxExporter:
             points = groups["position"]
             nPosition = nStrip.put("position",bxon_array())
             self.exportGraph(points, nPosition)
+
+        if("axis_angle" in groups and groups["axis_angle"] != None):
+            points = groups["axis_angle"]
+            nAxisAngle = nStrip.put("axis_angle",bxon_array())
+            self.exportGraph(points, nAxisAngle)
                             
                             
+    ## Write baked channels as key times and values.
+    def exportBakedGroup(self, groups, nStrip):
+        for name, stride in (("position", 3), ("quat", 4), ("scale", 3)):
+            if name in groups:
+                times, values, keys = groups[name]
+                nChannel = nStrip.put(name, bxon_map())
+                if self.animationEncoding == "compact":
+                    self.exportCompactChannel(nChannel, times, values, keys, stride)
+                else:
+                    self.putNative(nChannel, "times", BXON_FLOAT, 1, times)
+                    self.putNative(nChannel, "values", BXON_FLOAT, stride, values)
+
+    ## Write a baked channel with delta encoded sample indices, smallest
+    ## three quaternions and range normalized 16-bit positions and scales.
+    def exportCompactChannel(self, nChannel, times, values, keys, stride):
+        nChannel.put("time_start", times[0])
+        nChannel.put("time_end", times[-1])
+        nChannel.put("time_step", self.bakeStep)
+        nType, deltas = bxDeltaIndices(keys)
+        self.putNative(nChannel, "times", nType, 1, deltas)
+        if stride == 4:
+            nChannel.put("encoding", "smallest3")
+            self.putNative(nChannel, "values", BXON_SHORT, 3, bxSmallestThree(values))
+        else:
+            offset, scale = bxRange(values, stride)
+            nChannel.put("encoding", "unorm16")
+            nChannel.put("value_offset", bxon_array(nType=BXON_FLOAT, nCount = 1, nStride = stride)).push(offset)
+            nChannel.put("value_scale", bxon_array(nType=BXON_FLOAT, nCount = 1, nStride = stride)).push(scale)
+            self.putNative(nChannel, "values", BXON_SHORT, stride, bxQuantize(values, stride, offset, scale, 16))
+
+    ## Write the keyframes of each component, empty for components without
+    ## a fcurve.
     def exportGraph(self, points, array):
         for k in range(len(points)):
-            nKeyframes = array.push(bxon_array(nType = BXON_FLOAT, nCount = 3 * len(points[k]) , nStride = 2))
-            for m in range(len(points[k])):
-                pnt = points[k][m]
-                nKeyframes.push(pnt[0])
-                nKeyframes.push(pnt[1])
-                nKeyframes.push(pnt[2])
+            buf = points[k]
+            if buf == None:
+                buf = bxon_buffer(BXON_FLOAT)
+            self.putNative(array, None, BXON_FLOAT, 2, buf)
                                 
     def exportAnimation(self, node, tracks, armature = False):
         nTracks = node.put("tracks", bxon_array())
@@ -784,26 +2545,64 @@ class bxExporter:
 
             for s in range(len(strips)):
                 strip = strips[s]
-                groups = strip["groups"]
+                groups = strip.get("groups")
                 
                 nStrip = nStrips.push(bxon_map())
                 
-                if armature:
+                if "action" in strip:
+                    nStrip.put("range",bxon_array(nType=BXON_FLOAT, nCount = 1, nStride = 2)).push(strip["range"])
+                    nStrip.put("action", strip["id"])
+                elif armature:
                     if "bones" in groups:
                         bones = groups["bones"]                     
                         for b in bones:
                             boneGraphs = nStrip.put(b,bxon_map())
                             bData = bones[b]
                             boneGraphs.put("range",bxon_array(nType=BXON_FLOAT, nCount = 1, nStride = 2)).push(strip["range"])
-                            self.exportGraphGroup(bData, boneGraphs)  
+                            if strip.get("baked"):
+                                boneGraphs.put("baked", True)
+                                self.exportBakedGroup(bData, boneGraphs)
+                            else:
+                                self.exportGraphGroup(bData, boneGraphs)  
                 else: 
                     nStrip.put("range",bxon_array(nType=BXON_FLOAT, nCount = 1, nStride = 2)).push(strip["range"])
-                    self.exportGraphGroup(groups, nStrip)
+                    if strip.get("baked"):
+                        nStrip.put("baked", True)
+                        self.exportBakedGroup(groups, nStrip)
+                    else:
+                        self.exportGraphGroup(groups, nStrip)
                          
+    ## Write the curves of a shared action, bone channels are grouped by
+    ## bone name in "bones".
+    def exportAction(self, array, entry):
+        action = entry.data
+        self.log("  Action : \"" + action.name + "\"")
+        bake = None
+        if self.bakeAnimation:
+            bake = (self.bakeStep, self.bakeError, self.bakeAngleError)
+        groups = bxListStripCurves(entry.users[0], action, bake)
+
+        node = array.push(bxon_map())
+        node.put("name", action.name)
+        node.put("range",bxon_array(nType=BXON_FLOAT, nCount = 1, nStride = 2)).push(action.frame_range)
+        if bake != None:
+            node.put("baked", True)
+            self.exportBakedGroup(groups, node)
+        else:
+            self.exportGraphGroup(groups, node)
+        if "bones" in groups:
+            nBones = node.put("bones", bxon_map())
+            for b in groups["bones"]:
+                if bake != None:
+                    self.exportBakedGroup(groups["bones"][b], nBones.put(b, bxon_map()))
+                else:
+                    self.exportGraphGroup(groups["bones"][b], nBones.put(b, bxon_map()))
+        return True
+
     ## Write armature data.
     def exportArmature(self, array, entry):
         arm = entry.data
-        print("  Armature : \"" + arm.name + "\"")
+        self.log("  Armature : \"" + arm.name + "\"")
         node = array.push(bxon_map())
         node.put("name", arm.name)
         
@@ -861,7 +2660,7 @@ class bxExporter:
     # Write object data.    
     def exportObject(self, array, entry):
         obj = entry.data
-        print("  Object : \"" + obj.name + "\"")
+        self.log("  Object : \"" + obj.name + "\"")
         #node = map.put(obj.name, bxon_map())
         node = array.push(bxon_map())
         node.put("name", obj.name)
@@ -880,8 +2679,9 @@ class bxExporter:
         
         if (obj.type == "MESH"):
             datablock_type = "mesh"
-            datablock_name = obj.data.name
-            datablock_id = self.meshMap.find(obj.data.name).id      
+            mEntry = self.meshMap.find(obj.data.name)
+            datablock_name = mEntry.data.name
+            datablock_id = mEntry.id
                 
         elif (obj.type == "EMPTY"):
             datablock_type = "empty"
@@ -942,100 +2742,638 @@ class bxExporter:
             
         return True
             
-    def exportMesh(self, array, entry):
+    ## Put (or push when key is None) a native array holding buf. Arrays
+    ## above the compression threshold are written as compressed blocks.
+    def putNative(self, parent, key, nType, stride, buf):
+        if self.compression != None and memoryview(buf).nbytes >= self.compressionThreshold:
+            value = bxon_compressed(nType, buf, self.compression)
+        else:
+            value = bxon_array(nType=nType, nCount = len(buf) // stride, nStride = stride)
+        if key == None:
+            parent.push(value)
+        else:
+            parent.put(key, value)
+        if type(value) is bxon_array:
+            value.extend(buf)
+        return value
+
+    ## Put (or push when key is None) a native array of count elements of
+    ## stride values, filled from (native type, buffer) chunks. Arrays above
+    ## the compression threshold are joined and compressed whole.
+    def putChunked(self, parent, key, stride, count, chunks):
+        value = None
+        for nType, buf in chunks:
+            if value == None:
+                if self.compression != None and count * stride * buf.itemsize >= self.compressionThreshold:
+                    joined = array.array(buf.typecode, buf)
+                    for nType, buf in chunks:
+                        joined.extend(buf)
+                    return self.putNative(parent, key, nType, stride, joined)
+                value = bxon_array(nType=nType, nCount = count, nStride = stride)
+                if key == None:
+                    parent.push(value)
+                else:
+                    parent.put(key, value)
+            value.extend(buf)
+        return value
+
+    ## Write the position encoding settings, returns the quantization range
+    ## of normalized 16-bit positions computed over the position chunks.
+    def exportPositionEncoding(self, node, chunks):
+        if self.positionEncoding == "unorm16":
+            offset, scale = bxRangeChunks(chunks, 3)
+            node.put("position_encoding", "unorm16")
+            node.put("position_offset", bxon_array(nType=BXON_FLOAT, nCount = 1, nStride = 3)).push(offset)
+            node.put("position_scale", bxon_array(nType=BXON_FLOAT, nCount = 1, nStride = 3)).push(scale)
+            return offset, scale
+        return None
+
+    ## Return the native type and values of positions in the configured encoding.
+    def encodePositions(self, positions, posRange):
+        if self.positionEncoding == "unorm16":
+            return BXON_SHORT, bxQuantize(positions, 3, posRange[0], posRange[1], 16)
+        return BXON_FLOAT, positions
+
+    ## Write vertex positions with the configured encoding.
+    def exportPositions(self, node, positions):
+        posRange = self.exportPositionEncoding(node, (positions,))
+        nType, values = self.encodePositions(positions, posRange)
+        self.putNative(node, "positions", nType, 3, values)
+
+    ## Write the normal encoding setting.
+    def exportNormalEncoding(self, node):
+        if self.normalEncoding in ("oct16", "oct8"):
+            node.put("normal_encoding", self.normalEncoding)
+
+    ## Return the number of values per encoded normal.
+    def normalStride(self):
+        if self.normalEncoding in ("oct16", "oct8"):
+            return 2
+        return 3
+
+    ## Return the native type and values of normals in the configured encoding.
+    def encodeNormals(self, normals):
+        if self.normalEncoding == "oct16":
+            return BXON_SHORT, bxOctEncode(normals, 16)
+        elif self.normalEncoding == "oct8":
+            return BXON_BYTE, bxOctEncode(normals, 8)
+        return BXON_FLOAT, normals
+
+    ## Write vertex normals with the configured encoding.
+    def exportNormals(self, node, normals):
+        self.exportNormalEncoding(node)
+        nType, values = self.encodeNormals(normals)
+        self.putNative(node, "normals", nType, self.normalStride(), values)
+
+    ## Write the UV encoding settings shared by all layers, returns the
+    ## quantization range of normalized 16-bit coordinates.
+    def exportUVEncoding(self, node, layers):
+        if self.uvEncoding == "half":
+            node.put("uv_encoding", "half")
+        elif self.uvEncoding == "unorm16":
+            offset, scale = bxRangeChunks(layers, 2)
+            node.put("uv_encoding", "unorm16")
+            node.put("uv_offset", bxon_array(nType=BXON_FLOAT, nCount = 1, nStride = 2)).push(offset)
+            node.put("uv_scale", bxon_array(nType=BXON_FLOAT, nCount = 1, nStride = 2)).push(scale)
+            return offset, scale
+        return None
+
+    ## Return the native type and values of UV coordinates in the configured encoding.
+    def encodeUVs(self, uvs, uvRange):
+        if self.uvEncoding == "half":
+            return BXON_HALF, bxHalf(uvs)
+        elif self.uvEncoding == "unorm16":
+            return BXON_SHORT, bxQuantize(uvs, 2, uvRange[0], uvRange[1], 16)
+        return BXON_FLOAT, uvs
+
+    ## Write simplified levels of detail of a triangle mesh under "lods",
+    ## at the configured triangle ratios. Each level holds the mesh vertices
+    ## it uses, its triangles indexing them and its geometric error in
+    ## position units, the runtime projects it to select a level, with the
+    ## material of each triangle when given. Levels the error limit keeps
+    ## from reducing further are left out.
+    def exportLods(self, node, positions, indices, materials = None):
+        if len(self.lodRatios) <= 0:
+            return
+        tCount = len(indices) // 3
+        ratios = sorted(self.lodRatios, reverse = True)
+        simplifier = bxSimplifier(positions, indices)
+        levels = simplifier.simplify([int(tCount * r) for r in ratios], self.lodError)
+
+        mLods = node.put("lods", bxon_array())
+        last = tCount
+        counts = []
+        for sources, triangles, error in levels:
+            lCount = len(sources)
+            if lCount >= last:
+                continue
+            last = lCount
+            vertices = sorted(set(triangles))
+            local = {}
+            for i, v in enumerate(vertices):
+                local[v] = i
+            lod = mLods.push(bxon_map())
+            lod.put("ratio", float(lCount) / tCount)
+            lod.put("error", float(error))
+            self.putNative(lod, "vertices", BXON_INT, 1, bxon_buffer(BXON_INT, vertices))
+            if len(vertices) <= 0xFFFF:
+                self.putNative(lod, "indices", BXON_SHORT, 3, bxon_buffer(BXON_SHORT, [local[v] for v in triangles]))
+            else:
+                self.putNative(lod, "indices", BXON_INT, 3, bxon_buffer(BXON_INT, [local[v] for v in triangles]))
+            if materials != None:
+                self.putNative(lod, "triangle_materials", BXON_INT, 1, bxon_buffer(BXON_INT, [materials[t] for t in sources]))
+            counts.append(str(lCount))
+        self.log("   LODs : " + str(tCount) + " -> " + ", ".join(counts) + " triangles")
+
+    ## Write the welded vertex and triangle index buffers of a mesh.
+    def exportMeshIndexed(self, node, data):
+        mesh = bxIndexedMesh()
+        mesh.weld(data)
+
+        if self.optimizeMesh:
+            acmr, atvr = mesh.cacheStats()
+            mesh.optimizeVertexCache()
+            mesh.optimizeVertexFetch()
+            oAcmr, oAtvr = mesh.cacheStats()
+            self.log("   Vertex cache : ACMR %.3f -> %.3f, ATVR %.3f -> %.3f" % (acmr, oAcmr, atvr, oAtvr))
+
+        node.put("name", data.name)
+        node.put("layout", "indexed")
+
+        vCount = mesh.vertexCount()
+        self.exportPositions(node, mesh.positions)
+        self.exportNormals(node, mesh.normals)
+
+        if(data.armature != None):
+            node.put("armature", data.armature)
+
+        if len(data.materials) > 0:
+            mMaterials = node.put("materials",bxon_array())
+            for m in data.materials:
+                mMaterials.push(bxon_native(BXON_STRING,m))
+
+        if len(data.uvLayers) > 0:
+            mUVLayers = node.put("uv_layers",bxon_array())
+            for lName in data.uvLayers:
+                mUVLayers.push(bxon_native(BXON_STRING,lName))
+            uvRange = self.exportUVEncoding(node, mesh.uvs)
+            mUVs = node.put("uvs",bxon_array())
+            for uvs in mesh.uvs:
+                nType, values = self.encodeUVs(uvs, uvRange)
+                self.putNative(mUVs, None, nType, 2, values)
+
+        if len(data.colorLayers) > 0:
+            mColorLayers = node.put("color_layers",bxon_array())
+            for lName in data.colorLayers:
+                mColorLayers.push(bxon_native(BXON_STRING,lName))
+            mColors = node.put("colors",bxon_array())
+            for colors in mesh.colors:
+                self.putNative(mColors, None, BXON_FLOAT, mesh.colorSize, colors)
+
+        if len(data.groups) > 0:
+            if self.maxInfluences > 0:
+                self.exportSkinWeights(node, data, mesh.sourceVertices)
+            else:
+                self.putNative(node, "source_vertices", BXON_INT, 1, mesh.sourceVertices)
+                self.exportMeshWeights(node, data)
+
+        tCount = mesh.triangleCount()
+        if vCount <= 0xFFFF:
+            self.putNative(node, "indices", BXON_SHORT, 3, bxon_buffer(BXON_SHORT, mesh.indices))
+        else:
+            self.putNative(node, "indices", BXON_INT, 3, mesh.indices)
+
+        if len(data.materials) > 1:
+            self.putNative(node, "triangle_materials", BXON_INT, 1, mesh.triangleMaterials)
+
+        self.exportLods(node, mesh.positions, mesh.indices,
+            mesh.triangleMaterials if len(data.materials) > 1 else None)
+
+    ## Write fixed stride bone indices and weights, for each source vertex or
+    ## for the given welded vertices.
+    def exportSkinWeights(self, node, data, sourceVertices = None):
+        n = self.maxInfluences
+        indices, weights = bxSkinWeights(data, n)
+        if sourceVertices != None:
+            vIndices = bxon_buffer(BXON_INT)
+            vWeights = bxon_buffer(BXON_FLOAT)
+            for v in sourceVertices:
+                vIndices.extend(indices[v*n:(v+1)*n])
+                vWeights.extend(weights[v*n:(v+1)*n])
+            indices, weights = vIndices, vWeights
+
+        node.put("bone_influences", n)
+        nType, values = self.encodeBoneIndices(data, indices)
+        self.putNative(node, "bone_indices", nType, n, values)
+        if self.weightEncoding == "unorm16":
+            node.put("bone_weight_encoding", "unorm16")
+        nType, values = self.encodeBoneWeights(weights)
+        self.putNative(node, "bone_weights", nType, n, values)
+
+    ## Write fixed stride bone indices and weights of a mesh read in chunks.
+    def exportSkinWeightChunks(self, node, chunks):
+        n = self.maxInfluences
+        vCount = chunks.vertexCount()
+        node.put("bone_influences", n)
+        self.putChunked(node, "bone_indices", n, vCount,
+            (self.encodeBoneIndices(data, bxSkinWeights(data, n)[0]) for data in chunks.weights()))
+        if self.weightEncoding == "unorm16":
+            node.put("bone_weight_encoding", "unorm16")
+        self.putChunked(node, "bone_weights", n, vCount,
+            (self.encodeBoneWeights(bxSkinWeights(data, n)[1]) for data in chunks.weights()))
+
+    ## Return the native type and values of bone indices, bytes when every
+    ## bone or group id fits.
+    def encodeBoneIndices(self, data, indices):
+        if max(len(data.bones), len(data.groups)) <= 0x100:
+            return BXON_BYTE, bxon_buffer(BXON_BYTE, indices)
+        return BXON_INT, indices
+
+    ## Return the native type and values of bone weights in the configured encoding.
+    def encodeBoneWeights(self, weights):
+        if self.weightEncoding == "unorm16":
+            return BXON_SHORT, bxQuantizeWeights(weights, self.maxInfluences)
+        return BXON_FLOAT, weights
+
+    ## Write vertex group names and per vertex weights, of data or of the
+    ## given weight chunks.
+    def exportMeshWeights(self, node, data, chunks = None):
+        mGroups = node.put("vertex_groups",bxon_array())
+        for g in data.groups:
+            mGroups.push(bxon_native(BXON_STRING,g))
+
+        mWeights = node.put("vertex_weights",bxon_array())
+        for chunk in (chunks if chunks != None else (data,)):
+            w = 0
+            for count in chunk.weightCounts:
+                mVW = mWeights.push(bxon_array())
+                for k in range(count):
+                    mVW.push(bxon_native(BXON_INT,chunk.weightGroups[w]))
+                    mVW.push(bxon_native(BXON_FLOAT,chunk.weightValues[w]))
+                    w += 1
+
+    ## Write extracted mesh arrays.
+    def exportMeshData(self, node, data):
+        if self.meshLayout == "indexed":
+            return self.exportMeshIndexed(node, data)
+
+        node.put("name", data.name)
+
+        self.exportPositions(node, data.positions)
+        self.exportNormals(node, data.normals)
+
+        f3Count = data.f3Count
+        f4Count = data.f4Count
+        matCount = len(data.materials)
+        uvCount = len(data.uvLayers)
+        groupsCount = len(data.groups)
+
+        if(data.armature != None):
+            node.put("armature", data.armature);
+
+        if matCount > 0:
+            mMaterials = node.put("materials",bxon_array())
+            for m in data.materials:
+                mMaterials.push(bxon_native(BXON_STRING,m))
+
+        if groupsCount > 0:
+            if self.maxInfluences > 0:
+                self.exportSkinWeights(node, data)
+            else:
+                self.exportMeshWeights(node, data)
+
+            if data.armature != None:
+                node.put("armature", data.armature)
+
+        loopStart = data.loopStart
+        loopTotal = data.loopTotal
+        loopVertices = data.loopVertices
+
+        faces = bxon_buffer(BXON_INT)
+        for i in range(len(loopTotal)):
+            vLen = loopTotal[i]
+            if vLen == 3:
+                faces.extend(loopVertices[loopStart[i]:loopStart[i]+3])
+                faces.append(-1)
+            elif vLen == 4:
+                faces.extend(loopVertices[loopStart[i]:loopStart[i]+4])
+        self.putNative(node, "faces_vertices", BXON_INT, 4, faces)
+
+        if matCount > 1:
+            faceMaterials = bxon_buffer(BXON_INT)
+            for i in range(len(loopTotal)):
+                if loopTotal[i] == 3 or loopTotal[i] == 4:
+                    faceMaterials.append(data.materialIndex[i])
+            self.putNative(node, "faces_materials", BXON_INT, 1, faceMaterials)
+
+        if uvCount > 0:
+            mUVLayers = node.put("uv_layers",bxon_array())
+            for lName in data.uvLayers:
+                mUVLayers.push(bxon_native(BXON_STRING,lName))
+
+            faceUVs = bxon_buffer(BXON_FLOAT)
+            for i in range(len(loopTotal)):
+                vLen = loopTotal[i]
+                if vLen == 3 or vLen == 4:
+                    for l in range(loopStart[i],loopStart[i]+vLen):
+                        for uvs in data.uvs:
+                            faceUVs.append(uvs[l*2])
+                            faceUVs.append(-uvs[l*2+1])
+            uvRange = self.exportUVEncoding(node, [faceUVs])
+            nType, values = self.encodeUVs(faceUVs, uvRange)
+            self.putNative(node, "faces_uv", nType, 2, values)
+
+        if len(self.lodRatios) > 0:
+            self.log("   No LODs, they need the indexed layout")
+
+    ## Write a mesh read in chunks, in the faces layout of exportMeshData.
+    def exportMeshChunked(self, node, chunks):
+        node.put("name", chunks.name)
+
+        vCount = chunks.vertexCount()
+        posRange = self.exportPositionEncoding(node, chunks.vertexVectors("co"))
+        self.putChunked(node, "positions", 3, vCount,
+            (self.encodePositions(buf, posRange) for buf in chunks.vertexVectors("co")))
+        self.exportNormalEncoding(node)
+        self.putChunked(node, "normals", self.normalStride(), vCount,
+            (self.encodeNormals(buf) for buf in chunks.vertexVectors("normal")))
+
+        if(chunks.armature != None):
+            node.put("armature", chunks.armature);
+
+        if len(chunks.materials) > 0:
+            mMaterials = node.put("materials",bxon_array())
+            for m in chunks.materials:
+                mMaterials.push(bxon_native(BXON_STRING,m))
+
+        if len(chunks.groups) > 0:
+            if self.maxInfluences > 0:
+                self.exportSkinWeightChunks(node, chunks)
+            else:
+                self.exportMeshWeights(node, chunks, chunks.weights())
+
+            if chunks.armature != None:
+                node.put("armature", chunks.armature)
+
+        fCount = chunks.f3Count + chunks.f4Count
+        self.putChunked(node, "faces_vertices", 4, fCount,
+            ((BXON_INT, buf) for buf in chunks.faceVertices()))
+
+        if len(chunks.materials) > 1:
+            self.putChunked(node, "faces_materials", 1, fCount,
+                ((BXON_INT, buf) for buf in chunks.faceMaterials()))
+
+        if len(chunks.uvLayers) > 0:
+            mUVLayers = node.put("uv_layers",bxon_array())
+            for lName in chunks.uvLayers:
+                mUVLayers.push(bxon_native(BXON_STRING,lName))
+
+            uvCount = (chunks.f3Count * 3 + chunks.f4Count * 4) * len(chunks.uvLayers)
+            uvRange = self.exportUVEncoding(node, chunks.faceUVs())
+            self.putChunked(node, "faces_uv", 2, uvCount,
+                (self.encodeUVs(buf, uvRange) for buf in chunks.faceUVs()))
+
+        if len(self.lodRatios) > 0:
+            self.log("   No LODs, they need the indexed layout")
+
+    ## Return the mesh of an object with its modifiers applied if enabled,
+    ## and whether it was created for the export. Modifiers are applied at
+    ## their render levels, or at their viewport levels when the render
+    ## mesh would exceed the polygon budget.
+    def evaluateMesh(self, obj):
+        if not self.applyModifiers:
+            return obj.data, False
+
+        settings = 'RENDER'
+        if self.polygonBudget > 0 and bxEstimatePolygons(obj, 'RENDER') > self.polygonBudget:
+            settings = 'PREVIEW'
+        with self.stage("to_mesh"):
+            mesh = obj.to_mesh(bpy.context.scene, True, settings, False, False)
+        if settings == 'RENDER' and self.polygonBudget > 0 and len(mesh.polygons) > self.polygonBudget:
+            bpy.data.meshes.remove(mesh)
+            settings = 'PREVIEW'
+            with self.stage("to_mesh"):
+                mesh = obj.to_mesh(bpy.context.scene, True, settings, False, False)
+        if settings == 'PREVIEW':
+            self.log("   Polygon budget : viewport levels for \"" + obj.name + "\", " + str(len(mesh.polygons)) + " polygons")
+        return mesh, True
+
+    ## Fetch the mesh arrays of a mesh entry, with modifiers applied if enabled.
+    def extractMesh(self, entry):
+        if entry.data.name in self.meshData:
+            return self.meshData.pop(entry.data.name)
         obj = entry.users[0]
+        mesh, owned = self.evaluateMesh(obj)
+
+        data = bxMeshData()
+        data.extract(obj, mesh, self.meshLayout == "indexed")
+
+        if owned:
+            bpy.data.meshes.remove(mesh)
+
+        return data
+
+    ## Merge meshes with identical evaluated geometry into the first one.
+    ## The extracted arrays are kept for the export, which holds every unique
+    ## mesh in memory at once. Chunked exports read the meshes again instead.
+    def mergeDuplicateMeshes(self):
+        found = {}
+        for entry in self.meshMap.getNonSortedVector():
+            data = self.extractMesh(entry)
+            h = hashlib.sha1()
+            bxHashValue(h, [data.positions, data.normals, data.loopStart, data.loopTotal,
+                data.materialIndex, data.loopVertices, data.uvLayers, data.uvs, data.loopNormals,
+                data.colorLayers, data.colors, data.materials, data.groups, data.weightCounts,
+                data.weightGroups, data.weightValues, data.armature, data.bones])
+            key = h.hexdigest()
+            if key in found:
+                self.log("  Merged : \"" + entry.data.name + "\" into \"" + found[key].data.name + "\"")
+                self.meshMap.merge(entry.data.name, found[key])
+            else:
+                found[key] = entry
+                if self.meshChunk == 0:
+                    self.meshData[entry.data.name] = data
+
+    ## Mesh serialization settings, passed to the worker processes.
+    def meshOptions(self):
+        return {"meshLayout" : self.meshLayout,
+                "optimizeMesh" : self.optimizeMesh,
+                "positionEncoding" : self.positionEncoding,
+                "normalEncoding" : self.normalEncoding,
+                "uvEncoding" : self.uvEncoding,
+                "compression" : self.compression,
+                "compressionThreshold" : self.compressionThreshold,
+                "compact" : self.compact,
+                "maxInfluences" : self.maxInfluences,
+                "weightEncoding" : self.weightEncoding,
+                "lodRatios" : self.lodRatios,
+                "lodError" : self.lodError}
+
+    def exportMesh(self, array, entry):
         mesh = entry.data;
         
-        print("  Mesh : \"" + mesh.name + "\"")
-        mesh = obj.data
+        self.log("  Mesh : \"" + mesh.name + "\"")
         
         #node = map.put(mesh.name,bxon_map())
         node = array.push(bxon_map())
-        node.put("name", mesh.name)
-        
-        if(self.applyModifiers):
-            mesh = obj.to_mesh(bpy.context.scene, True, 'RENDER', False, False)
-           
-        vCount = len(mesh.vertices)
-        mPositions = node.put("positions", bxon_array(nType=BXON_FLOAT, nCount = vCount, nStride = 3))
-        mNormals = node.put("normals", bxon_array(nType=BXON_FLOAT, nCount = vCount, nStride = 3))
 
-        for v in mesh.vertices:
-            mPositions.push(v.co)
-            
-        for v in mesh.vertices: 
-            mNormals.push(v.normal)
-
-        f3Count = 0
-        f4Count = 0
-        matCount = len(mesh.materials)
-        uvCount = len(mesh.uv_textures)
-        colorCount = len(mesh.vertex_colors)
-        groupsCount = len(obj.vertex_groups)
+        # Large meshes are read and written in chunks, without fetching whole
+        # arrays. Welding the indexed layout needs every vertex at once.
+        if self.meshChunk > 0:
+            if self.meshLayout == "faces":
+                obj = entry.users[0]
+                evaluated, owned = self.evaluateMesh(obj)
+                self.exportMeshChunked(node, bxMeshChunks(obj, evaluated, self.meshChunk))
+                if owned:
+                    bpy.data.meshes.remove(evaluated)
+                return True
+            self.log("   Not chunked, the indexed layout reads whole meshes")
         
-        if(obj.parent != None and obj.parent.type == 'ARMATURE'):
-            node.put("armature", obj.parent.data.name);
-            
-        for i,fc in enumerate(mesh.polygons):
-            vLen = len(fc.vertices)
-            if vLen == 3:
-                f3Count += 1
-            elif vLen == 4:
-                f4Count += 1
-                
-        if matCount > 0:
-            mMaterials = node.put("materials",bxon_array())   
-            for m in mesh.materials:
-                mMaterials.push(bxon_native(BXON_STRING,m.name))
-                
-        if groupsCount > 0:
-            mGroups = node.put("vertex_groups",bxon_array())   
-            for g in obj.vertex_groups:
-                mGroups.push(bxon_native(BXON_STRING,g.name))
-                print(g.name)
-                
-            mWeights = node.put("vertex_weights",bxon_array())       
-            for i,v in enumerate(mesh.vertices):
-                mVW = mWeights.push(bxon_array())
-                for group in v.groups:
-                    mVW.push(bxon_native(BXON_INT,group.group))
-                    mVW.push(bxon_native(BXON_FLOAT,group.weight))  
-                    
-            if obj.parent != None and obj.parent.type == "ARMATURE":
-                pArmature = obj.parent.data
-                node.put("armature", pArmature.name)  
-                
-        mFaces = node.put("faces_vertices",bxon_array(nType=BXON_INT,nCount = (f3Count + f4Count), nStride = 4))
-        for i,fc in enumerate(mesh.polygons):
-            if len(fc.vertices) == 3:
-                mFaces.push([fc.vertices[0],fc.vertices[1],fc.vertices[2],-1])
-            elif len(fc.vertices) == 4:
-                mFaces.push(fc.vertices)
+        data = self.extractMesh(entry)
+        self.exportMeshData(node, data)
+        
+        return True
 
-        if matCount > 1:
-            mFm = node.put("faces_materials",bxon_array(nType=BXON_INT,nCount = (f3Count + f4Count)))
-            for i,fc in enumerate(mesh.polygons):
-                if len(fc.vertices) == 3 or len(fc.vertices) == 4:
-                    mFm.push(fc.material_index)
+    ## Export meshes with a process pool. Mesh arrays are extracted on the
+    ## main thread, workers serialize each mesh into a standalone blob and
+    ## the blobs are written in id order.
+    def exportMeshesParallel(self, array, mesh_vector):
+        if bpy != None and getattr(bpy.app, "binary_path_python", None):
+            multiprocessing.set_executable(bpy.app.binary_path_python)
 
-        if uvCount > 0:
-                mUVLayers = node.put("uv_layers",bxon_array())
-                for lName in mesh.uv_textures:
-                    mUVLayers.push(bxon_native(BXON_STRING,lName.name))
-                    
-                mFuv = node.put("faces_uv",bxon_array(nType=BXON_FLOAT, nCount = uvCount * (f3Count * 3 + f4Count * 4), nStride = 2))
-                for i,fc in enumerate(mesh.polygons):
-                    if len(fc.vertices) == 3 or len(fc.vertices) == 4: 
-                        for k,v in enumerate(fc.vertices):
-                            for j in range(uvCount):
-                                uv = mesh.uv_layers[j].data[fc.loop_indices[k]].uv
-                                mFuv.push([uv[0],-uv[1]])
-       
-        if(self.applyModifiers):
-            bpy.data.meshes.remove(mesh)
-        
+        options = self.meshOptions()
+        jobs = []
+        with concurrent.futures.ProcessPoolExecutor(max_workers = self.workers) as pool:
+            for m in mesh_vector:
+                key = None
+                if self.cache != None:
+                    key = self.hashMesh(m)
+                    data = None
+                    if key != None:
+                        data = self.cache.get(key)
+                    if data != None:
+                        self.log("  Cached : \"" + m.data.name + "\"")
+                        jobs.append((m, key, data))
+                        continue
+                self.log("  Mesh : \"" + m.data.name + "\"")
+                jobs.append((m, key, pool.submit(bxSerializeMesh, dict(options, quiet = self.quiet), self.extractMesh(m))))
+
+            for m, key, job in jobs:
+                if isinstance(job, bytes):
+                    data = job
+                else:
+                    data = job.result()
+                    if key != None:
+                        self.cache.put(key, data)
+                array.push(bxon_raw(data))
+                self.indexEntry("mesh", array, m)
         return True
                      
+    ## Return a new hash seeded with the exporter settings.
+    def newHash(self, type, entry):
+        h = hashlib.sha1()
+        bxHashValue(h, [bl_info["version"], type, entry.data.name, self.applyModifiers, self.meshOptions(),
+            self.animationEncoding, self.polygonBudget])
+        return h
+
+    ## Content hash of a mesh, its modifier stack and vertex groups.
+    ## Returns None when the mesh can't be cached.
+    def hashMesh(self, entry):
+        h = self.newHash("mesh", entry)
+        if not self.hashGeometry(h, entry.users[0], set()):
+            return None
+        return h.hexdigest()
+
+    ## Update a hash with the geometry of a mesh object, its modifier stack
+    ## and shape keys when modifiers are applied. Mesh objects referenced by
+    ## the modifiers (boolean operands, shrinkwrap targets...) are hashed
+    ## the same way. Returns False when a modifier references other geometry.
+    def hashGeometry(self, h, obj, seen):
+        seen.add(obj.name)
+        data = bxMeshData()
+        data.extract(obj, obj.data)
+        bxHashValue(h, [data.positions, data.normals, data.loopStart, data.loopTotal,
+            data.materialIndex, data.loopVertices, data.uvLayers, data.uvs, data.materials,
+            data.groups, data.weightCounts, data.weightGroups, data.weightValues, data.armature, data.bones])
+        bxHashRNA(h, obj.data)
+        if self.applyModifiers:
+            for m in obj.modifiers:
+                bxHashRNA(h, m)
+                for target in bxReferencedObjects(m):
+                    if target.type == "MESH":
+                        if target.name not in seen and not self.hashGeometry(h, target, seen):
+                            return False
+                    elif target.type in ("CURVE", "SURFACE", "FONT", "META", "LATTICE"):
+                        return False
+            keys = obj.data.shape_keys
+            if keys != None:
+                for kb in keys.key_blocks:
+                    bxHashRNA(h, kb)
+                    co = bxon_buffer(BXON_FLOAT,[0.0]) * (len(kb.data) * 3)
+                    kb.data.foreach_get("co", co)
+                    bxHashValue(h, co)
+        return True
+
+    ## Content hash of a material and its texture slots.
+    def hashMaterial(self, entry):
+        mat = entry.data
+        h = self.newHash("material", entry)
+        bxHashRNA(h, mat)
+        for tname in mat.texture_slots.keys():
+            t = mat.texture_slots[tname]
+            bxHashRNA(h, t)
+            if t.texture.type == "IMAGE":
+                nd = self.textureMap.find(t.texture.name)
+                bxHashValue(h, [t.texture.name, nd.id if nd else None])
+        return h.hexdigest()
+
+    ## Content hash of an armature and the animation of its users.
+    def hashArmature(self, entry):
+        arm = entry.data
+        h = self.newHash("armature", entry)
+        for b in arm.bones:
+            bxHashValue(h, [b.name, b.head_local, b.tail_local, b.matrix_local,
+                b.parent.name if b.parent else None])
+        for o in entry.users:
+            bxHashValue(h, self.objectMap.find(o.name).tracks)
+        return h.hexdigest()
+
+    ## Content hash of a curve.
+    def hashCurve(self, entry):
+        curve = entry.data
+        h = self.newHash("curve", entry)
+        bxHashValue(h, curve.resolution_u)
+        for sp in curve.splines:
+            for p in sp.bezier_points:
+                bxHashValue(h, [p.handle_left, p.co, p.handle_right])
+        return h.hexdigest()
+
+    ## Export a datablock through the cache. Unchanged datablocks are
+    ## spliced in as raw bytes, others are serialized and stored.
+    def exportCached(self, method, hashMethod, array, entry):
+        if self.cache == None:
+            return method(array, entry)
+        key = hashMethod(entry)
+        if key == None:
+            return method(array, entry)
+        data = self.cache.get(key)
+        if data == None:
+            data = bxSerialize(self.compact, method, entry)
+            if data == None:
+                return False
+            self.cache.put(key, data)
+        else:
+            self.log("  Cached : \"" + entry.data.name + "\"")
+        array.push(bxon_raw(data))
+        return True
+
+    ## Record the last datablock written to array in the index.
+    def indexEntry(self, type, array, entry):
+        if self.index != None:
+            self.index.add(type, entry.data.name, array.array[-1])
+        if self.profile != None:
+            self.profile.addDatablock(type, array.array[-1])
+
     def export(self, pNode):
         obj_vector = self.objectMap.getNonSortedVector()
         mesh_vector = self.meshMap.getNonSortedVector()
@@ -1045,6 +3383,7 @@ class bxExporter:
         lamp_vector = self.lampMap.getNonSortedVector()
         camera_vector = self.cameraMap.getNonSortedVector()    
         curve_vector = self.curveMap.getNonSortedVector()    
+        action_vector = self.actionMap.getNonSortedVector()
         
         if(texture_vector != None):
             array = pNode.put("texture", bxon_array())
@@ -1052,20 +3391,26 @@ class bxExporter:
                 if not(self.exportTexture(array, t)):
                     print("   Error")
                     return False
+                self.indexEntry("texture", array, t)
                 
         if(material_vector != None):
             array = pNode.put("material", bxon_array())
             for m in material_vector:
-                if not(self.exportMaterial(array, m)):
+                if not(self.exportCached(self.exportMaterial, self.hashMaterial, array, m)):
                     print("   Error")
                     return False
+                self.indexEntry("material", array, m)
                                                     
-        if(mesh_vector != None):
+        if(mesh_vector != None and self.workers > 1 and self.meshChunk <= 0):
+            array = pNode.put("mesh", bxon_array())
+            self.exportMeshesParallel(array, mesh_vector)
+        elif(mesh_vector != None):
             array = pNode.put("mesh", bxon_array())
             for m in mesh_vector:
-                if not(self.exportMesh(array, m)):
+                if not(self.exportCached(self.exportMesh, self.hashMesh, array, m)):
                     print("   Error")
                     return False
+                self.indexEntry("mesh", array, m)
                                 
         if(camera_vector != None):
             array = pNode.put("camera", bxon_array())
@@ -1073,93 +3418,411 @@ class bxExporter:
                 if not(self.exportCamera(array, c)):
                     print("   Error")
                     return False
+                self.indexEntry("camera", array, c)
                 
+        if(self.shareActions and action_vector != None):
+            array = pNode.put("action", bxon_array())
+            for a in action_vector:
+                if not(self.exportAction(array, a)):
+                    return False
+                self.indexEntry("action", array, a)
+
         if(armature_vector != None):
             array = pNode.put("armature", bxon_array())
             for a in armature_vector:
                 #ue = []
                 #for u in a[1].users:
                 #    ue.append(self.objectMap.find(u.name))
-                if not(self.exportArmature(array,a)):
-                    return False                    
+                if not(self.exportCached(self.exportArmature, self.hashArmature, array, a)):
+                    return False
+                self.indexEntry("armature", array, a)                    
 
         if(curve_vector != None):
             array = pNode.put("curve", bxon_array())
             for a in curve_vector:
-                if not(self.exportCurve(array, a)):
-                    return False    
+                if not(self.exportCached(self.exportCurve, self.hashCurve, array, a)):
+                    return False
+                self.indexEntry("curve", array, a)    
                     
         if(lamp_vector != None):
             array = pNode.put("lamp", bxon_array())
             for a in lamp_vector:
                 if not(self.exportLamp(array, a)):
-                    return False    
+                    return False
+                self.indexEntry("lamp", array, a)    
                                           
         if(obj_vector != None):
             array = pNode.put("object", bxon_array())
             for o in obj_vector:
                 if not(self.exportObject(array,o)):
                     return False
+                self.indexEntry("object", array, o)
 
         self.exportMarkers(pNode)
+
+        if self.index != None:
+            self.index.write(pNode)
         
-def runExport(filename):
-    print("\nbxon-3d start, " + time.ctime())
+## Serialize the last value written by method into a standalone blob,
+## None when method fails.
+def bxSerialize(compact, method, *args):
+    if compact:
+        f = io.BytesIO()
+        scratch = bxon_array(bxon_stream_context(f, True))
+    else:
+        scratch = bxon_array(bxon_buffered_context(None))
+    if not method(scratch, *args):
+        return None
+    scratch.flush()
+    node = scratch.array[-1]
+    if compact:
+        return f.getvalue()[node.headerPos:node.endPos]
+    return bytes(scratch.context.buffer[node.headerPos:node.endPos])
+
+## Serialize a mesh into a standalone map blob, runs in the worker processes.
+def bxSerializeMesh(options, data):
+    bx = bxExporter()
+    for k in options:
+        setattr(bx, k, options[k])
+    def write(scratch, data):
+        bx.exportMeshData(scratch.push(bxon_map()), data)
+        return True
+    return bxSerialize(bx.compact, write, data)
+
+def runExport(filename, buffered = False, stream = False, index = False, cache = False, workers = 1, layout = "faces",
+              optimize = False, positions = "float", normals = "float", uvs = "float",
+              compression = None, threshold = 4096, compact = False, strings = False,
+              influences = 0, weights = "float", bake = False, bakeStep = 1.0,
+              bakeError = 0.0001, bakeAngleError = 0.0005, animation = "float", actions = False,
+              merge = False, objects = None, quiet = False, profile = False, profiler = None,
+              chunk = 0, budget = 0, lods = None, lodError = 0.0):
+    # Compact keys are only written for baked channels
+    if animation == "compact" and not bake:
+        raise ValueError("Compact animation keys need baked animation")
+
+    # Export to the standard output, progress goes to the error stream.
+    if filename == "-":
+        out = sys.stdout.buffer
+        with contextlib.redirect_stdout(sys.stderr):
+            runExport(out, buffered, stream, index, cache, workers, layout,
+                      optimize, positions, normals, uvs, compression, threshold, compact, strings,
+                      influences, weights, bake, bakeStep, bakeError, bakeAngleError, animation, actions,
+                      merge, objects, quiet, profile, profiler, chunk, budget, lods, lodError)
+        return
+
+    if not quiet:
+        print("\nbxon-3d start, " + time.ctime())
     start_time = time.time()
 
-    f = open(filename,"wb")
-    ctx = bxon_context(f)
+    # Compact lengths and the string table need the sizes and strings known
+    # up front, the streaming writer collects them before writing the root.
+    streaming = stream or compact or strings
+
+    # A file object is written to but left open for the caller.
+    owned = isinstance(filename, str)
+    if not owned:
+        f = filename
+        # Pipes and terminals can't seek back to patch lengths, unbuffered
+        # output to them goes through the streaming writer.
+        seekable = getattr(f, "seekable", None)
+        if not buffered and (seekable == None or not seekable()):
+            streaming = True
+    elif streaming and filename.endswith(".gz"):
+        f = gzip.open(filename,"wb")
+    else:
+        f = open(filename,"wb")
+    if streaming:
+        ctx = bxon_stream_context(f, compact, strings)
+    elif buffered:
+        ctx = bxon_buffered_context(f)
+    else:
+        ctx = bxon_context(f)
+
+    # Profiling times the export stages, the context counts writer calls
+    prof = None
+    if profile or profiler != None:
+        prof = bxProfile(profiler)
+        ctx.counters = prof.counters
+        prof.start()
 
     root = bxon_map(ctx)
 
     bx = bxExporter()
+    if index:
+        bx.index = bxIndex()
+    if cache and owned:
+        bx.cache = bxCache(filename)
+    bx.workers = workers
+    bx.meshLayout = layout
+    bx.optimizeMesh = optimize
+    bx.positionEncoding = positions
+    bx.normalEncoding = normals
+    bx.uvEncoding = uvs
+    bx.compression = compression
+    bx.compressionThreshold = threshold
+    bx.compact = compact
+    bx.maxInfluences = influences
+    bx.weightEncoding = weights
+    bx.bakeAnimation = bake
+    bx.bakeStep = bakeStep
+    bx.bakeError = bakeError
+    bx.bakeAngleError = bakeAngleError
+    bx.animationEncoding = animation
+    bx.shareActions = actions
+    bx.mergeMeshes = merge
+    bx.quiet = quiet
+    bx.meshChunk = chunk
+    bx.polygonBudget = budget
+    bx.lodRatios = list(lods or [])
+    bx.lodError = lodError
+    if prof != None:
+        bx.profile = prof
+        for name in dir(bx):
+            if name.startswith("export") or name == "getSelected":
+                prof.timeMethod(bx, name)
+
+    try:
+        bx.getSelected(objects)
+
+        bx.log("\n Exporting")
+        bx.export(root)
+
+        with bx.stage("flush"):
+            root.flush()
+        with bx.stage("io"):
+            if owned:
+                ctx.close()
+            else:
+                if buffered and not streaming:
+                    f.write(ctx.buffer)
+                f.flush()
+    finally:
+        if prof != None:
+            prof.stop()
 
-    bx.getSelected()
+    if bx.cache != None:
+        bx.cache.prune()
 
-    print("\n Exporting")
-    bx.export(root)
-    
-    root.flush()
-    f.close()
+    if prof != None and owned:
+        prof.write(filename + ".profile.json")
 
     elapsed_time = time.time() - start_time
-    print("\n Time: " + str(math.floor(elapsed_time*1000)) + " ms")
-    print("bxon-3d end")
+    if not quiet:
+        print("\n Time: " + str(math.floor(elapsed_time*1000)) + " ms")
+        print("bxon-3d end")
 
 ###### EXPORT OPERATOR #######
-class export_bxon(bpy.types.Operator, ExportHelper):
-    '''Exports selected objects as bxon-3d file'''
-    bl_idname = "bxon.export"
-    bl_label = "Export"
-    filename_ext = ".bxon"
-
-    @classmethod
-    def poll(cls, context):
-        return context.active_object.type in {'MESH','CAMERA','LAMP','EMPTY','ARMATURE','CURVE'}
-
-    def execute(self, context):
-        runExport(self.filepath)
-        return {'FINISHED'}
+if bpy != None:
+    class export_bxon(bpy.types.Operator, ExportHelper):
+        '''Exports selected objects as bxon-3d file'''
+        bl_idname = "bxon.export"
+        bl_label = "Export"
+        filename_ext = ".bxon"
+
+        use_buffer = BoolProperty(
+            name="Buffered Write",
+            description="Build the file in memory and write it in a single call",
+            default=False)
+
+        use_stream = BoolProperty(
+            name="Streaming Write",
+            description="Write the file front to back without seeking, gzip compressed for .gz paths",
+            default=False)
+
+        use_index = BoolProperty(
+            name="Datablock Index",
+            description="Write a table of datablock offsets for random access",
+            default=False)
+
+        use_cache = BoolProperty(
+            name="Incremental Export",
+            description="Reuse unchanged datablocks from a cache next to the output file",
+            default=False)
+
+        workers = IntProperty(
+            name="Worker Processes",
+            description="Processes used to serialize meshes, 1 exports on the main thread",
+            default=1, min=1, max=64)
+
+        mesh_layout = EnumProperty(
+            name="Mesh Layout",
+            description="Layout of the exported mesh arrays",
+            items=(("faces", "Faces", "Per vertex positions with quad faces and per face corner UVs"),
+                   ("indexed", "Indexed", "Welded vertex buffers with a triangle index buffer")),
+            default="faces")
+
+        optimize_mesh = BoolProperty(
+            name="Optimize Triangle Order",
+            description="Reorder indexed triangles and vertices for vertex cache and fetch locality",
+            default=False)
+
+        position_encoding = EnumProperty(
+            name="Positions",
+            description="Encoding of the vertex positions",
+            items=(("float", "Float", "32-bit floats"),
+                   ("unorm16", "16-bit", "16-bit quantized within the mesh bounds")),
+            default="float")
+
+        normal_encoding = EnumProperty(
+            name="Normals",
+            description="Encoding of the vertex normals",
+            items=(("float", "Float", "32-bit floats"),
+                   ("oct16", "Octahedral 16-bit", "Octahedral mapping in 2x16 bits"),
+                   ("oct8", "Octahedral 8-bit", "Octahedral mapping in 2x8 bits")),
+            default="float")
+
+        uv_encoding = EnumProperty(
+            name="UVs",
+            description="Encoding of the UV coordinates",
+            items=(("float", "Float", "32-bit floats"),
+                   ("half", "Half", "16-bit floats"),
+                   ("unorm16", "16-bit", "16-bit quantized within the UV bounds")),
+            default="float")
+
+        compression = EnumProperty(
+            name="Compression",
+            description="Codec used for large native arrays",
+            items=[("none", "None", "Don't compress arrays")] +
+                [(BXON_CODECS[c][0], BXON_CODECS[c][0], "Compress arrays with " + BXON_CODECS[c][0]) for c in sorted(BXON_CODECS)],
+            default="none")
+
+        compression_threshold = IntProperty(
+            name="Compression Threshold",
+            description="Minimum array size in bytes to compress",
+            default=4096, min=0)
+
+        use_compact = BoolProperty(
+            name="Compact Lengths",
+            description="Write container and string lengths in the smallest length class",
+            default=False)
+
+        use_strings = BoolProperty(
+            name="String Table",
+            description="Write keys and names once in a table and reference them by index",
+            default=False)
+
+        max_influences = IntProperty(
+            name="Bone Influences",
+            description="Bone influences kept per vertex, 0 writes the vertex group weights",
+            default=0, min=0, max=8)
+
+        weight_encoding = EnumProperty(
+            name="Bone Weights",
+            description="Encoding of the bone weights",
+            items=(("float", "Float", "32-bit floats"),
+                   ("unorm16", "16-bit", "16-bit normalized")),
+            default="float")
+
+        bake_animation = BoolProperty(
+            name="Bake Animation",
+            description="Sample the animation into reduced position, quaternion and scale keys",
+            default=False)
+
+        bake_step = FloatProperty(
+            name="Bake Step",
+            description="Frames between baked samples",
+            default=1.0, min=0.01)
+
+        bake_error = FloatProperty(
+            name="Bake Error",
+            description="Largest position and scale error of the removed keys, 0 keeps every sample",
+            default=0.0001, min=0.0, precision=5)
+
+        bake_angle_error = FloatProperty(
+            name="Bake Angle Error",
+            description="Largest rotation error of the removed keys",
+            default=0.0005, min=0.0, precision=5, subtype='ANGLE')
+
+        animation_encoding = EnumProperty(
+            name="Baked Keys",
+            description="Encoding of the baked animation keys, compact needs Bake Animation",
+            items=(("float", "Float", "32-bit float times and values"),
+                   ("compact", "Compact", "Delta encoded times, 48-bit quaternions and 16-bit positions and scales")),
+            default="float")
+
+        share_actions = BoolProperty(
+            name="Shared Actions",
+            description="Write each action once and reference it from the animation strips",
+            default=False)
+
+        merge_meshes = BoolProperty(
+            name="Merge Duplicate Meshes",
+            description="Write meshes with identical evaluated geometry once",
+            default=False)
+
+        mesh_chunk = IntProperty(
+            name="Mesh Chunk Size",
+            description="Read and write meshes in chunks of this many vertices or polygons, 0 fetches them whole. Faces layout only",
+            default=0, min=0)
+
+        polygon_budget = IntProperty(
+            name="Polygon Budget",
+            description="Apply modifiers at their viewport levels when the render mesh would exceed this many polygons, 0 for no limit",
+            default=0, min=0)
+
+        lod_levels = IntProperty(
+            name="LOD Levels",
+            description="Simplified levels of detail written with each mesh, indexed layout only",
+            default=0, min=0, max=8)
+
+        lod_ratio = FloatProperty(
+            name="LOD Ratio",
+            description="Triangle ratio of each level of detail to the previous one",
+            default=0.5, min=0.01, max=0.99)
+
+        lod_error = FloatProperty(
+            name="LOD Error",
+            description="Largest geometric error of the levels of detail, 0 for no limit",
+            default=0.0, min=0.0, precision=4)
+
+        use_profile = BoolProperty(
+            name="Profile Report",
+            description="Write stage timings and sizes to a JSON file next to the output",
+            default=False)
+
+        @classmethod
+        def poll(cls, context):
+            return context.active_object.type in {'MESH','CAMERA','LAMP','EMPTY','ARMATURE','CURVE'}
+
+        def execute(self, context):
+            if self.animation_encoding == "compact" and not self.bake_animation:
+                self.report({'ERROR'}, "Compact baked keys need Bake Animation")
+                return {'CANCELLED'}
+            runExport(self.filepath, buffered = self.use_buffer, stream = self.use_stream, index = self.use_index, cache = self.use_cache,
+                workers = self.workers, layout = self.mesh_layout,
+                optimize = self.optimize_mesh, positions = self.position_encoding,
+                normals = self.normal_encoding, uvs = self.uv_encoding,
+                compression = None if self.compression == "none" else self.compression,
+                threshold = self.compression_threshold, compact = self.use_compact,
+                strings = self.use_strings, influences = self.max_influences,
+                weights = self.weight_encoding, bake = self.bake_animation,
+                bakeStep = self.bake_step, bakeError = self.bake_error,
+                bakeAngleError = self.bake_angle_error, animation = self.animation_encoding,
+                actions = self.share_actions, merge = self.merge_meshes,
+                chunk = self.mesh_chunk, budget = self.polygon_budget,
+                lods = [self.lod_ratio ** (i + 1) for i in range(self.lod_levels)], lodError = self.lod_error,
+                profile = self.use_profile)
+            return {'FINISHED'}
     
-    def invoke(self, context, event):
-        wm = context.window_manager
-
-        if True:
-            # File selector
-            wm.fileselect_add(self) # will run self.execute()
-            return {'RUNNING_MODAL'}
-        elif True:
-            # search the enum
-            wm.invoke_search_popup(self)
-            return {'RUNNING_MODAL'}
-        elif False:
-            # Redo popup
-            return wm.invoke_props_popup(self, event)
-        elif False:
-            return self.execute(context)
-
-def menu_func(self, context):
-    self.layout.operator(export_bxon.bl_idname, text="bxon-3d (.bxon)")
+        def invoke(self, context, event):
+            wm = context.window_manager
+
+            if True:
+                # File selector
+                wm.fileselect_add(self) # will run self.execute()
+                return {'RUNNING_MODAL'}
+            elif True:
+                # search the enum
+                wm.invoke_search_popup(self)
+                return {'RUNNING_MODAL'}
+            elif False:
+                # Redo popup
+                return wm.invoke_props_popup(self, event)
+            elif False:
+                return self.execute(context)
+
+    def menu_func(self, context):
+        self.layout.operator(export_bxon.bl_idname, text="bxon-3d (.bxon)")
 
 def register():
     bpy.utils.register_module(__name__)
@@ -1169,7 +3832,86 @@ def unregister():
     bpy.utils.unregister_module(__name__)
     bpy.types.INFO_MT_file_export.remove(menu_func)
 
+## Command line export of the open blend file, for background runs:
+##   blender --background scene.blend --python bxon-3d.py -- scene.bxon [options]
+def runCommandLine(argv):
+    parser = argparse.ArgumentParser(prog = "bxon-3d", description = "Export the open blend file to bxon")
+    parser.add_argument("output", help = "output file, - for the standard output")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--scene", help = "export the objects of this scene instead of the active one")
+    source.add_argument("--collection", help = "export the objects of this group or collection")
+    source.add_argument("--selected", action = "store_true", help = "export the selected objects only")
+    parser.add_argument("--report", help = "write the export time and size to this JSON file")
+    parser.add_argument("--buffered", action = "store_true")
+    parser.add_argument("--stream", action = "store_true")
+    parser.add_argument("--index", action = "store_true")
+    parser.add_argument("--cache", action = "store_true")
+    parser.add_argument("--workers", type = int, default = 1)
+    parser.add_argument("--layout", choices = ("faces", "indexed"), default = "faces")
+    parser.add_argument("--optimize", action = "store_true")
+    parser.add_argument("--positions", choices = ("float", "unorm16"), default = "float")
+    parser.add_argument("--normals", choices = ("float", "oct16", "oct8"), default = "float")
+    parser.add_argument("--uvs", choices = ("float", "half", "unorm16"), default = "float")
+    parser.add_argument("--compression", choices = [BXON_CODECS[c][0] for c in sorted(BXON_CODECS)])
+    parser.add_argument("--threshold", type = int, default = 4096)
+    parser.add_argument("--compact", action = "store_true")
+    parser.add_argument("--strings", action = "store_true")
+    parser.add_argument("--influences", type = int, default = 0)
+    parser.add_argument("--weights", choices = ("float", "unorm16"), default = "float")
+    parser.add_argument("--bake", action = "store_true")
+    parser.add_argument("--bake-step", type = float, default = 1.0)
+    parser.add_argument("--bake-error", type = float, default = 0.0001)
+    parser.add_argument("--bake-angle-error", type = float, default = 0.0005)
+    parser.add_argument("--animation", choices = ("float", "compact"), default = "float", help = "encoding of baked keys, compact needs --bake")
+    parser.add_argument("--actions", action = "store_true")
+    parser.add_argument("--merge", action = "store_true")
+    parser.add_argument("--chunk", type = int, default = 0, help = "read and write meshes in chunks of this many elements, faces layout only")
+    parser.add_argument("--polygon-budget", type = int, default = 0, help = "use viewport modifier levels above this many polygons")
+    parser.add_argument("--lods", type = float, nargs = "+", metavar = "RATIO", help = "triangle ratios of the levels of detail, indexed layout only")
+    parser.add_argument("--lod-error", type = float, default = 0.0, help = "largest error of the levels of detail, 0 for no limit")
+    parser.add_argument("--quiet", action = "store_true", help = "don't print the progress")
+    parser.add_argument("--profile", action = "store_true", help = "write a profile report next to the output")
+    parser.add_argument("--profiler", choices = ("cprofile", "tracemalloc"), help = "profile report capture")
+    args = parser.parse_args(argv)
+    if args.animation == "compact" and not args.bake:
+        parser.error("--animation compact needs --bake")
+
+    if args.selected:
+        objects = None
+    elif args.collection:
+        groups = getattr(bpy.data, "collections", None)
+        if groups == None:
+            groups = bpy.data.groups
+        objects = list(groups[args.collection].objects)
+    elif args.scene:
+        objects = list(bpy.data.scenes[args.scene].objects)
+    else:
+        objects = list(bpy.context.scene.objects)
+
+    start_time = time.time()
+    runExport(args.output, buffered = args.buffered, stream = args.stream, index = args.index,
+        cache = args.cache, workers = args.workers, layout = args.layout, optimize = args.optimize,
+        positions = args.positions, normals = args.normals, uvs = args.uvs,
+        compression = args.compression, threshold = args.threshold, compact = args.compact,
+        strings = args.strings, influences = args.influences, weights = args.weights,
+        bake = args.bake, bakeStep = args.bake_step, bakeError = args.bake_error,
+        bakeAngleError = args.bake_angle_error, animation = args.animation,
+        actions = args.actions, merge = args.merge, objects = objects, quiet = args.quiet,
+        profile = args.profile, profiler = args.profiler, chunk = args.chunk, budget = args.polygon_budget,
+        lods = args.lods, lodError = args.lod_error)
+
+    if args.report:
+        report = {"output" : args.output,
+                  "objects" : len(objects) if objects != None else len(bpy.context.selected_objects),
+                  "seconds" : time.time() - start_time,
+                  "size" : os.path.getsize(args.output) if args.output != "-" else None}
+        with open(args.report, "w") as f:
+            json.dump(report, f)
+
 if __name__ == "__main__":
-    #runExport("file.bxon")
-    register()
+    if "--" in sys.argv:
+        runCommandLine(sys.argv[sys.argv.index("--") + 1:])
+    else:
+        #runExport("file.bxon")
+        register()
 
@@ -0,0 +1,146 @@
+#!/usr/local/bin/python
+# -*- coding: utf-8 -*-
+
+# ##### BEGIN ZLIB LICENSE BLOCK #####
+#
+# Copyright (c) 2017 Luis F.Loureiro
+#
+# This software is provided 'as-is', without any express or implied
+# warranty. In no event will the authors be held liable for any damages
+# arising from the use of this software.
+#
+# Permission is granted to anyone to use this software for any purpose,
+# including commercial applications, and to alter it and redistribute it
+# freely, subject to the following restrictions:
+#
+#   1. The origin of this software must not be misrepresented; you must not
+#   claim that you wrote the original software. If you use this software
+#   in a product, an acknowledgment in the product documentation would be
+#   appreciated but is not required.
+
+#   2. Altered source versions must be plainly marked as such, and must not be
+#   misrepresented as being the original software.
+#
+#   3. This notice may not be removed or altered from any source
+#   distribution.
+#
+# ##### END ZLIB LICENSE BLOCK #####
+
+## BXON batch exporter ##
+#
+# Exports many blend files, each one in a background Blender process running
+# the bxon-3d command line. Files whose output is newer than the blend file
+# are skipped. Options after -- are passed to the exporter.
+#
+#   python bxon_batch.py -j 8 -o build/ assets/ --summary build/bxon.json -- --index --compact
+#
+# Progress goes to the error stream, the summary lists the status, time
+# and size of every file.
+
+import sys, os, time, json, argparse, subprocess, tempfile
+import concurrent.futures
+
+BXON_ADDON = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bxon-3d.py")
+
+## Return the (blend file, output file) pairs of the inputs. Directories are
+## searched recursively, their tree is kept under the output directory.
+def bxon_batch_files(inputs, outDir):
+    files = []
+    for path in inputs:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                for name in sorted(names):
+                    if name.endswith(".blend"):
+                        blend = os.path.join(root, name)
+                        rel = os.path.relpath(blend, path)
+                        files.append((blend, os.path.join(outDir, os.path.splitext(rel)[0] + ".bxon")))
+        else:
+            name = os.path.splitext(os.path.basename(path))[0] + ".bxon"
+            files.append((path, os.path.join(outDir, name)))
+    return files
+
+## Return True when the output is newer than the blend file.
+def bxon_batch_uptodate(blend, output):
+    return os.path.exists(output) and os.path.getmtime(output) >= os.path.getmtime(blend)
+
+## Export a blend file in a background Blender process.
+def bxon_batch_export(blender, blend, output, options, timeout):
+    result = {"input" : blend, "output" : output}
+    outDir = os.path.dirname(output)
+    if outDir != "":
+        os.makedirs(outDir, exist_ok = True)
+    fd, report = tempfile.mkstemp(suffix = ".json")
+    os.close(fd)
+    cmd = [blender, "--background", blend, "--python", BXON_ADDON, "--", output, "--report", report] + options
+    start = time.time()
+    try:
+        proc = subprocess.run(cmd, stdout = subprocess.PIPE, stderr = subprocess.STDOUT, timeout = timeout)
+        result["returncode"] = proc.returncode
+        if proc.returncode == 0 and os.path.getsize(report) > 0:
+            with open(report) as f:
+                exported = json.load(f)
+            result["status"] = "exported"
+            result["export_seconds"] = exported["seconds"]
+            result["objects"] = exported["objects"]
+            result["size"] = exported["size"]
+        else:
+            result["status"] = "failed"
+            result["log"] = proc.stdout.decode("utf-8", "replace")[-4000:]
+    except subprocess.TimeoutExpired:
+        result["status"] = "failed"
+        result["log"] = "Timed out after " + str(timeout) + " s"
+    finally:
+        os.remove(report)
+    result["seconds"] = time.time() - start
+    return result
+
+## Export the inputs with jobs Blender processes, returns the summary.
+def bxon_batch(inputs, outDir, blender = "blender", jobs = 1, options = [], force = False, timeout = None):
+    start = time.time()
+    results = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers = jobs) as pool:
+        futures = []
+        for blend, output in bxon_batch_files(inputs, outDir):
+            if not force and bxon_batch_uptodate(blend, output):
+                results.append({"input" : blend, "output" : output, "status" : "skipped",
+                                "size" : os.path.getsize(output)})
+                continue
+            futures.append(pool.submit(bxon_batch_export, blender, blend, output, options, timeout))
+        for f in concurrent.futures.as_completed(futures):
+            r = f.result()
+            print(r["status"] + " " + r["input"] + " (" + str(round(r["seconds"], 2)) + " s)", file = sys.stderr)
+            results.append(r)
+
+    results.sort(key = lambda r: r["input"])
+    summary = {"files" : results, "seconds" : time.time() - start}
+    for status in ("exported", "skipped", "failed"):
+        summary[status] = sum(1 for r in results if r["status"] == status)
+    summary["size"] = sum(r.get("size") or 0 for r in results)
+    return summary
+
+if __name__ == "__main__":
+    argv = sys.argv[1:]
+    options = []
+    if "--" in argv:
+        options = argv[argv.index("--") + 1:]
+        argv = argv[:argv.index("--")]
+
+    parser = argparse.ArgumentParser(description = "Export blend files to bxon with background Blender processes")
+    parser.add_argument("inputs", nargs = "+", help = "blend files or directories")
+    parser.add_argument("-o", "--out-dir", required = True, help = "output directory")
+    parser.add_argument("-j", "--jobs", type = int, default = os.cpu_count() or 1, help = "Blender processes")
+    parser.add_argument("--blender", default = os.environ.get("BLENDER", "blender"), help = "Blender executable")
+    parser.add_argument("--summary", help = "write the JSON summary to this file instead of the standard output")
+    parser.add_argument("--force", action = "store_true", help = "export up to date files too")
+    parser.add_argument("--timeout", type = float, help = "seconds allowed per file")
+    args = parser.parse_args(argv)
+
+    summary = bxon_batch(args.inputs, args.out_dir, args.blender, args.jobs, options, args.force, args.timeout)
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump(summary, f, indent = 2)
+    else:
+        json.dump(summary, sys.stdout, indent = 2)
+        sys.stdout.write("\n")
+    sys.exit(1 if summary["failed"] > 0 else 0)
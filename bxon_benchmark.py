@@ -0,0 +1,481 @@
+#!/usr/local/bin/python
+# -*- coding: utf-8 -*-
+
+# ##### BEGIN ZLIB LICENSE BLOCK #####
+#
+# Copyright (c) 2017 Luis F.Loureiro
+#
+# This software is provided 'as-is', without any express or implied
+# warranty. In no event will the authors be held liable for any damages
+# arising from the use of this software.
+#
+# Permission is granted to anyone to use this software for any purpose,
+# including commercial applications, and to alter it and redistribute it
+# freely, subject to the following restrictions:
+#
+#   1. The origin of this software must not be misrepresented; you must not
+#   claim that you wrote the original software. If you use this software
+#   in a product, an acknowledgment in the product documentation would be
+#   appreciated but is not required.
+
+#   2. Altered source versions must be plainly marked as such, and must not be
+#   misrepresented as being the original software.
+#
+#   3. This notice may not be removed or altered from any source
+#   distribution.
+#
+# ##### END ZLIB LICENSE BLOCK #####
+
+## BXON benchmark ##
+#
+# Measures the exporter throughput outside of Blender. A small fake bpy and
+# mathutils stand in for Blender, synthetic scenes are generated with meshes,
+# vertex groups, armatures and actions, and the exporter and the raw bxon
+# writers run under timeit.
+#
+#   python bxon_benchmark.py                # run and check against the baseline
+#   python bxon_benchmark.py --save         # store the results as the baseline
+#   python bxon_benchmark.py --no-check     # only print or write the results
+#   python bxon_benchmark.py --meshes 16 --vertices 20000 --bones 64 --keys 500
+#
+# Throughputs below the baseline, or peak memory above it, by more than the
+# tolerance fail the check, and so does a missing baseline. The baseline is
+# machine specific, save it on the machine running the check.
+
+import sys, os, io, math, json, types, bisect, random, argparse, timeit, tracemalloc
+import importlib.util
+
+BXON_ADDON = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bxon-3d.py")
+BXON_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bxon_benchmark.json")
+
+## Fake mathutils ##
+
+class bxon_fake_vector(list):
+    def __init__(self, v = (0.0, 0.0, 0.0)):
+        list.__init__(self, [float(x) for x in v])
+
+    def __sub__(self, o):
+        return bxon_fake_vector([a - b for a, b in zip(self, o)])
+
+    def __add__(self, o):
+        return bxon_fake_vector([a + b for a, b in zip(self, o)])
+
+    x = property(lambda self: self[0])
+    y = property(lambda self: self[1])
+    z = property(lambda self: self[2])
+
+class bxon_fake_quaternion(list):
+    def __init__(self, v = (1.0, 0.0, 0.0, 0.0)):
+        list.__init__(self, [float(x) for x in v])
+
+    w = property(lambda self: self[0])
+    x = property(lambda self: self[1])
+    y = property(lambda self: self[2])
+    z = property(lambda self: self[3])
+
+class bxon_fake_matrix(list):
+    def __init__(self, rows = None):
+        if rows == None:
+            rows = [[1.0 if i == j else 0.0 for j in range(4)] for i in range(4)]
+        list.__init__(self, [[float(x) for x in r] for r in rows])
+
+    def to_translation(self):
+        return bxon_fake_vector([self[0][3], self[1][3], self[2][3]])
+
+    def to_scale(self):
+        return bxon_fake_vector([math.sqrt(sum(self[r][c] ** 2 for r in range(3))) for c in range(3)])
+
+    def to_quaternion(self):
+        return bxon_fake_quaternion()
+
+class bxon_fake_euler(list):
+    def __init__(self, v = (0.0, 0.0, 0.0), order = "XYZ"):
+        list.__init__(self, [float(x) for x in v])
+        self.order = order
+
+    def to_quaternion(self):
+        q = [1.0, 0.0, 0.0, 0.0]
+        for c in self.order:
+            i = "XYZ".index(c)
+            a = [math.cos(self[i] / 2), 0.0, 0.0, 0.0]
+            a[1 + i] = math.sin(self[i] / 2)
+            q = [a[0]*q[0] - a[1]*q[1] - a[2]*q[2] - a[3]*q[3],
+                 a[0]*q[1] + a[1]*q[0] + a[2]*q[3] - a[3]*q[2],
+                 a[0]*q[2] - a[1]*q[3] + a[2]*q[0] + a[3]*q[1],
+                 a[0]*q[3] + a[1]*q[2] - a[2]*q[1] + a[3]*q[0]]
+        return bxon_fake_quaternion(q)
+
+## Fake bpy ##
+
+## RNA property description of a fake data block attribute.
+class bxon_fake_property(object):
+    def __init__(self, identifier, type, isArray = False):
+        self.identifier = identifier
+        self.type = type
+        self.is_array = isArray
+        self.is_enum_flag = False
+
+## Plain data block, attributes are given as keywords. Its RNA lists the
+## plain values, vectors and pointers to other data blocks.
+class bxon_fake_data(object):
+    def __init__(self, **kw):
+        self.__dict__.update(kw)
+
+    @property
+    def bl_rna(self):
+        properties = []
+        for k in sorted(self.__dict__):
+            v = self.__dict__[k]
+            if isinstance(v, bool):
+                properties.append(bxon_fake_property(k, "BOOLEAN"))
+            elif isinstance(v, int):
+                properties.append(bxon_fake_property(k, "INT"))
+            elif isinstance(v, float):
+                properties.append(bxon_fake_property(k, "FLOAT"))
+            elif isinstance(v, str):
+                properties.append(bxon_fake_property(k, "STRING"))
+            elif isinstance(v, list) and all(isinstance(x, float) for x in v):
+                properties.append(bxon_fake_property(k, "FLOAT", True))
+            elif isinstance(v, bxon_fake_data):
+                properties.append(bxon_fake_property(k, "POINTER"))
+        return bxon_fake_data(properties = properties)
+
+## Collection with name lookup and a foreach_get working on cached flat
+## columns, so the bulk fetches cost about what they cost in Blender.
+class bxon_fake_collection(list):
+    def __init__(self, items = ()):
+        list.__init__(self, items)
+        self.names = {}
+        self.columns = {}
+        for item in self:
+            name = getattr(item, "name", None)
+            if name != None:
+                self.names[name] = item
+
+    def foreach_get(self, attr, seq):
+        key = (attr, seq.typecode)
+        column = self.columns.get(key)
+        if column == None:
+            values = []
+            for item in self:
+                v = getattr(item, attr)
+                if isinstance(v, list):
+                    values.extend(v)
+                else:
+                    values.append(v)
+            column = self.columns[key] = type(seq)(seq.typecode, values)
+        seq[:] = column
+
+    def keys(self):
+        return list(self.names)
+
+    def __getitem__(self, k):
+        if isinstance(k, str):
+            return self.names[k]
+        return list.__getitem__(self, k)
+
+    def __contains__(self, k):
+        if isinstance(k, str):
+            return k in self.names
+        return list.__contains__(self, k)
+
+## Fcurve evaluated by linear interpolation of its keyframes.
+class bxon_fake_fcurve(object):
+    def __init__(self, path, index, frames, values):
+        self.data_path = path
+        self.array_index = index
+        self.frames = frames
+        self.values = values
+        self.keyframe_points = bxon_fake_collection(
+            bxon_fake_data(co = [f, v], handle_left = [f - 0.5, v], handle_right = [f + 0.5, v])
+            for f, v in zip(frames, values))
+
+    def evaluate(self, frame):
+        i = bisect.bisect_right(self.frames, frame)
+        if i == 0:
+            return self.values[0]
+        if i == len(self.frames):
+            return self.values[-1]
+        f0, f1 = self.frames[i - 1], self.frames[i]
+        t = (frame - f0) / (f1 - f0)
+        return self.values[i - 1] + (self.values[i] - self.values[i - 1]) * t
+
+## Install the fake bpy, bpy_extras and mathutils modules.
+def bxon_fake_install():
+    def module(name, **attrs):
+        m = types.ModuleType(name)
+        m.__dict__.update(attrs)
+        sys.modules[name] = m
+        return m
+
+    module("mathutils", Vector = bxon_fake_vector, Matrix = bxon_fake_matrix,
+           Quaternion = bxon_fake_quaternion, Euler = bxon_fake_euler)
+
+    prop = lambda **kw: kw.get("default")
+    menu = bxon_fake_data(append = lambda f: None, remove = lambda f: None)
+    bpy = module("bpy")
+    bpy.props = module("bpy.props", BoolProperty = prop, IntProperty = prop, FloatProperty = prop,
+                       StringProperty = prop, EnumProperty = prop, FloatVectorProperty = prop)
+    bpy.types = module("bpy.types", Operator = type("Operator", (), {}), INFO_MT_file_export = menu)
+    bpy.app = module("bpy.app", binary_path_python = None, version = (2, 79, 0))
+    bpy.utils = module("bpy.utils", register_module = lambda n: None, unregister_module = lambda n: None)
+    bpy.context = bxon_fake_data(selected_objects = [], active_object = None, scene = None)
+    bpy.data = bxon_fake_data(meshes = bxon_fake_data(remove = lambda m: None), objects = [], groups = [])
+    extras = module("bpy_extras")
+    extras.io_utils = module("bpy_extras.io_utils", ExportHelper = type("ExportHelper", (), {}))
+    return bpy
+
+## Load the exporter addon as a module.
+def bxon_bench_load():
+    spec = importlib.util.spec_from_file_location("bxon3d", BXON_ADDON)
+    mod = importlib.util.module_from_spec(spec)
+    sys.modules["bxon3d"] = mod
+    spec.loader.exec_module(mod)
+    return mod
+
+## Synthetic scenes ##
+
+## Grid mesh of about vertices vertices, every third cell split in two
+## triangles, with uvLayers UV layers and materials materials.
+def bxon_bench_mesh(name, vertices, uvLayers, materials, rnd):
+    nx = max(int(math.sqrt(vertices)) - 1, 1)
+    ny = max(vertices // (nx + 1) - 1, 1)
+    verts = []
+    for j in range(ny + 1):
+        for i in range(nx + 1):
+            verts.append(bxon_fake_data(co = [i * 0.1, j * 0.1, rnd.random() * 0.01],
+                                        normal = [0.0, 0.0, 1.0], groups = []))
+    polys = []
+    loops = []
+    def addPoly(vs, m):
+        polys.append(bxon_fake_data(loop_start = len(loops), loop_total = len(vs), material_index = m))
+        for v in vs:
+            loops.append(bxon_fake_data(vertex_index = v, normal = [0.0, 0.0, 1.0]))
+    for j in range(ny):
+        for i in range(nx):
+            a = j * (nx + 1) + i
+            b, c, d = a + 1, a + nx + 2, a + nx + 1
+            m = i % max(len(materials), 1)
+            if (i + j) % 3 == 0:
+                addPoly((a, b, c), m)
+                addPoly((a, c, d), m)
+            else:
+                addPoly((a, b, c, d), m)
+    uvs = []
+    for k in range(uvLayers):
+        data = bxon_fake_collection(bxon_fake_data(uv = [rnd.random(), rnd.random()]) for l in loops)
+        uvs.append(bxon_fake_data(name = "UV" + str(k), data = data))
+    mesh = bxon_fake_data(name = name, vertices = bxon_fake_collection(verts), polygons = bxon_fake_collection(polys),
+                          loops = bxon_fake_collection(loops), uv_layers = bxon_fake_collection(uvs),
+                          uv_textures = bxon_fake_collection(uvs), vertex_colors = bxon_fake_collection(),
+                          materials = materials, shape_keys = None)
+    mesh.calc_normals_split = lambda: None
+    return mesh
+
+def bxon_bench_material(name):
+    tex = bxon_fake_data(name = "Tex" + name, type = "IMAGE", image = bxon_fake_data(filepath = "//textures/" + name + ".png"))
+    slot = bxon_fake_data(name = "Slot" + name, texture = tex, texture_coords = "UV", blend_type = "MIX", mapping = "FLAT",
+                          offset = [0.0, 0.0, 0.0], scale = [1.0, 1.0, 1.0], uv_layer = "UV0",
+                          use_map_color_diffuse = True, diffuse_color_factor = 1.0, use_map_alpha = False,
+                          use_map_diffuse = False, use_map_translucency = False, use_map_specular = False,
+                          use_map_color_spec = False, use_map_hardness = False, use_map_normal = True,
+                          normal_factor = 0.5, use_map_displacement = False)
+    return bxon_fake_data(name = name, texture_slots = bxon_fake_collection([slot]), diffuse_color = [0.8, 0.8, 0.8],
+                          alpha = 1.0, specular_color = [1.0, 1.0, 1.0], diffuse_intensity = 0.8,
+                          specular_intensity = 0.5, specular_hardness = 50, ambient = 1.0, use_shadows = True,
+                          use_shadeless = False, emit = 0.0, use_transparency = False,
+                          transparency_method = "Z_TRANSPARENCY")
+
+## Action animating the object transform and the transform of each bone
+## with keys keyframes per fcurve.
+def bxon_bench_action(name, bones, keys, rnd):
+    curves = []
+    frames = [float(f) for f in range(keys)]
+    def channels(prefix):
+        for prop, count in (("location", 3), ("rotation_quaternion", 4), ("scale", 3)):
+            for i in range(count):
+                values = [math.sin(f * 0.1 + rnd.random()) for f in frames]
+                curves.append(bxon_fake_fcurve(prefix + prop, i, frames, values))
+    channels("")
+    for b in bones:
+        channels('pose.bones["' + b + '"].')
+    return bxon_fake_data(name = name, fcurves = curves, frame_range = [0.0, frames[-1]])
+
+def bxon_bench_object(name, type, data, parent = None, action = None):
+    obj = bxon_fake_data(name = name, type = type, data = data, parent = parent,
+                         layers = [i == 0 for i in range(20)], matrix_local = bxon_fake_matrix(),
+                         vertex_groups = bxon_fake_collection(), modifiers = bxon_fake_collection(),
+                         animation_data = None, rotation_mode = "QUATERNION")
+    if action != None:
+        obj.animation_data = bxon_fake_data(action = action, nla_tracks = bxon_fake_collection())
+    obj.to_mesh = lambda scene, apply, settings, a = False, b = False: data
+    return obj
+
+## Build a scene of meshes meshes of about vertices vertices each, skinned
+## to an armature of bones bones with an action of keys keyframes. Returns
+## the objects and the vertex and keyframe counts.
+def bxon_bench_scene(bpy, meshes, vertices, bones, keys, seed = 1):
+    rnd = random.Random(seed)
+    objects = []
+    armObj = None
+    boneNames = ["Bone" + str(k) for k in range(bones)]
+    keyCount = 0
+    if bones > 0:
+        bList = []
+        for k, name in enumerate(boneNames):
+            bList.append(bxon_fake_data(name = name, head_local = bxon_fake_vector((0, k, 0)),
+                                        tail_local = bxon_fake_vector((0, k + 1, 0)), matrix_local = bxon_fake_matrix(),
+                                        parent = bList[(k - 1) // 2] if k > 0 else None))
+        arm = bxon_fake_data(name = "Armature", bones = bxon_fake_collection(bList))
+        action = None
+        if keys > 0:
+            action = bxon_bench_action("Action", boneNames, keys, rnd)
+            keyCount = len(action.fcurves) * keys
+        armObj = bxon_bench_object("Armature", "ARMATURE", arm, action = action)
+        objects.append(armObj)
+
+    materials = [bxon_bench_material("Material" + str(k)) for k in range(2)]
+    vertexCount = 0
+    for i in range(meshes):
+        mesh = bxon_bench_mesh("Mesh" + str(i), vertices, 2, materials, rnd)
+        obj = bxon_bench_object("Mesh" + str(i), "MESH", mesh, parent = armObj)
+        if bones > 0:
+            obj.vertex_groups = bxon_fake_collection(bxon_fake_data(name = b, index = g) for g, b in enumerate(boneNames))
+            for v in mesh.vertices:
+                for g in rnd.sample(range(bones), min(bones, 4)):
+                    v.groups.append(bxon_fake_data(group = g, weight = rnd.random()))
+        vertexCount += len(mesh.vertices)
+        objects.append(obj)
+
+    bpy.context.selected_objects = objects
+    bpy.context.scene = bxon_fake_data(timeline_markers = bxon_fake_collection(), frame_start = 0,
+                                       frame_end = keys, render = bxon_fake_data(fps = 24))
+    bpy.data.objects = objects
+    return objects, vertexCount, keyCount
+
+## Benchmarks ##
+
+## Export the selected objects to memory, returns the written size.
+def bxon_bench_export(bx3d, options):
+    ctx = bx3d.bxon_buffered_context(io.BytesIO())
+    root = bx3d.bxon_map(ctx)
+    bx = bx3d.bxExporter()
+    bx.quiet = True
+    for k in options:
+        setattr(bx, k, options[k])
+    bx.getSelected()
+    bx.export(root)
+    root.flush()
+    return len(ctx.buffer)
+
+## Write count floats with the raw writers, one native array filled value
+## by value, one filled with extend and a map of count / 16 small entries.
+def bxon_bench_writers(bx3d, count):
+    ctx = bx3d.bxon_buffered_context(io.BytesIO())
+    root = bx3d.bxon_map(ctx)
+    values = [i * 0.5 for i in range(count)]
+    pushed = root.put("pushed", bx3d.bxon_array(nType = bx3d.BXON_FLOAT, nCount = count // 4, nStride = 4))
+    for i in range(0, count - 3, 4):
+        pushed.push(values[i:i+4])
+    root.put("extended", bx3d.bxon_array(nType = bx3d.BXON_FLOAT, nCount = count, nStride = 1)).extend(values)
+    entries = root.put("entries", bx3d.bxon_array())
+    for i in range(count // 16):
+        e = entries.push(bx3d.bxon_map())
+        e.put("name", "entry")
+        e.put("id", i)
+        e.put("weight", values[i])
+    root.flush()
+    return len(ctx.buffer)
+
+## Best time of fn in seconds over repeat runs of number calls, and the
+## peak traced memory of one more call.
+def bxon_bench_time(fn, repeat, number):
+    seconds = min(timeit.Timer(fn).repeat(repeat, number)) / number
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak
+
+## Run the benchmarks, returns their metrics by name.
+def bxon_benchmark(meshes = 4, vertices = 4096, bones = 16, keys = 200, repeat = 3, number = 1):
+    bpy = bxon_fake_install()
+    bx3d = bxon_bench_load()
+    results = {}
+
+    def run(name, fn, rates):
+        seconds, peak = bxon_bench_time(fn, repeat, number)
+        size = fn()
+        metrics = {"seconds" : seconds, "mb_per_sec" : size / seconds / 1e6, "peak_memory" : peak}
+        for metric, count in rates.items():
+            metrics[metric] = count / seconds
+        results[name] = metrics
+        print(name + ": " + ", ".join(k + " " + ("%.4g" % metrics[k]) for k in sorted(metrics)), file = sys.stderr)
+
+    run("writers", lambda: bxon_bench_writers(bx3d, meshes * vertices * 3), {})
+
+    objects, vertexCount, keyCount = bxon_bench_scene(bpy, meshes, vertices, bones, 0)
+    run("mesh", lambda: bxon_bench_export(bx3d, {}), {"vertices_per_sec" : vertexCount})
+    run("mesh_indexed", lambda: bxon_bench_export(bx3d, {"meshLayout" : "indexed"}), {"vertices_per_sec" : vertexCount})
+    run("mesh_quantized", lambda: bxon_bench_export(bx3d, {"positionEncoding" : "unorm16", "normalEncoding" : "oct16",
+        "uvEncoding" : "unorm16", "maxInfluences" : 4, "weightEncoding" : "unorm16"}), {"vertices_per_sec" : vertexCount})
+
+    objects, vertexCount, keyCount = bxon_bench_scene(bpy, 0, 0, bones, keys)
+    run("animation", lambda: bxon_bench_export(bx3d, {}), {"keys_per_sec" : keyCount})
+    run("animation_baked", lambda: bxon_bench_export(bx3d, {"bakeAnimation" : True, "animationEncoding" : "compact"}),
+        {"keys_per_sec" : keyCount})
+    return results
+
+## Compare results with a baseline, returns the regression messages.
+## Throughputs may not drop and peak memory may not grow by more than
+## tolerance.
+def bxon_benchmark_check(results, baseline, tolerance):
+    failures = []
+    for name in sorted(baseline):
+        if name not in results:
+            continue
+        for metric, base in sorted(baseline[name].items()):
+            value = results[name].get(metric)
+            if value == None or metric == "seconds":
+                continue
+            if metric == "peak_memory":
+                failed = value > base * (1.0 + tolerance)
+            else:
+                failed = value < base * (1.0 - tolerance)
+            if failed:
+                failures.append("%s %s: %.4g, baseline %.4g" % (name, metric, value, base))
+    return failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Benchmark the bxon exporter on synthetic scenes")
+    parser.add_argument("--meshes", type = int, default = 4, help = "meshes in the mesh scene")
+    parser.add_argument("--vertices", type = int, default = 4096, help = "vertices per mesh")
+    parser.add_argument("--bones", type = int, default = 16, help = "armature bones")
+    parser.add_argument("--keys", type = int, default = 200, help = "keyframes per fcurve")
+    parser.add_argument("--repeat", type = int, default = 3, help = "timed runs, the best one is kept")
+    parser.add_argument("--number", type = int, default = 1, help = "calls per timed run")
+    parser.add_argument("--baseline", default = BXON_BASELINE, help = "baseline file")
+    parser.add_argument("--save", action = "store_true", help = "store the results as the baseline")
+    parser.add_argument("--no-check", action = "store_true", help = "don't check the results against the baseline")
+    parser.add_argument("--tolerance", type = float, default = 0.2, help = "allowed relative regression")
+    parser.add_argument("--output", help = "write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = bxon_benchmark(args.meshes, args.vertices, args.bones, args.keys, args.repeat, args.number)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent = 2)
+
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent = 2)
+        print("Baseline saved to " + args.baseline, file = sys.stderr)
+    elif not args.no_check:
+        if not os.path.exists(args.baseline):
+            print("No baseline at " + args.baseline + ", save one with --save or skip the check with --no-check", file = sys.stderr)
+            sys.exit(1)
+        with open(args.baseline) as f:
+            failures = bxon_benchmark_check(results, json.load(f), args.tolerance)
+        for msg in failures:
+            print("Regression " + msg, file = sys.stderr)
+        sys.exit(1 if len(failures) > 0 else 0)
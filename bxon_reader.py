@@ -0,0 +1,539 @@
+#!/usr/local/bin/python
+# -*- coding: utf-8 -*-
+
+# ##### BEGIN ZLIB LICENSE BLOCK #####
+#
+# Copyright (c) 2017 Luis F.Loureiro
+#
+# This software is provided 'as-is', without any express or implied
+# warranty. In no event will the authors be held liable for any damages
+# arising from the use of this software.
+#
+# Permission is granted to anyone to use this software for any purpose,
+# including commercial applications, and to alter it and redistribute it
+# freely, subject to the following restrictions:
+#
+#   1. The origin of this software must not be misrepresented; you must not
+#   claim that you wrote the original software. If you use this software
+#   in a product, an acknowledgment in the product documentation would be
+#   appreciated but is not required.
+
+#   2. Altered source versions must be plainly marked as such, and must not be
+#   misrepresented as being the original software.
+#
+#   3. This notice may not be removed or altered from any source
+#   distribution.
+#
+# ##### END ZLIB LICENSE BLOCK #####
+
+## BXON python reader ##
+#
+# Values are decoded lazily straight from a memory mapped file. Maps and
+# arrays are returned as views that only decode a child when it is accessed,
+# native arrays are exposed as memoryview (or NumPy) views over the mapping.
+# Compressed native arrays are decompressed when accessed.
+#
+#   with bxon_open("scene.bxon") as f:
+#       positions = f.root()["mesh"][0]["positions"].native(3)
+#
+# Views keep a reference to the mapping, release them before closing the file.
+
+import struct, sys, math, mmap, array, zlib, lzma
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+BXON_NIL        = 0
+BXON_STRING     = 1
+BXON_BOOLEAN    = 2
+BXON_INT        = 3
+BXON_LONG       = 4
+BXON_FLOAT      = 5
+BXON_DOUBLE     = 6
+BXON_BYTE       = 7
+BXON_SHORT      = 8
+BXON_HALF       = 9
+BXON_STRING_REF = 10
+
+BXON_LENGTH_8   = 0x00
+BXON_LENGTH_16  = 0x10
+BXON_LENGTH_32  = 0x20
+BXON_LENGTH_64  = 0x30
+
+BXON_OBJECT     = 0x00
+BXON_ARRAY      = 0x40
+BXON_MAP        = 0x80
+BXON_COMPRESSED = 0xC0
+
+# Key of the string table heading the root map
+BXON_STRING_TABLE = "strings"
+
+BXON_FILTER_NONE    = 0
+BXON_FILTER_SHUFFLE = 1
+BXON_FILTER_DELTA   = 2
+
+BXON_TYPE_MASK      = 0x0F
+BXON_LENGTH_MASK    = 0x30
+BXON_CONTAINER_MASK = 0xC0
+
+# struct format of the length field for each length class
+BXON_LENGTH_FORMATS = {
+    BXON_LENGTH_8 : "<B",
+    BXON_LENGTH_16 : "<H",
+    BXON_LENGTH_32 : "<I",
+    BXON_LENGTH_64 : "<Q"}
+
+# struct format of each fixed size native type, halves are read as their
+# 16-bit patterns and converted by bxon_half
+BXON_NATIVE_FORMATS = {
+    BXON_BOOLEAN : "<B",
+    BXON_INT : "<i",
+    BXON_LONG : "<q",
+    BXON_FLOAT : "<f",
+    BXON_DOUBLE : "<d",
+    BXON_BYTE : "<B",
+    BXON_SHORT : "<H",
+    BXON_HALF : "<H"}
+
+# NumPy dtype of each fixed size native type
+BXON_NATIVE_DTYPES = {
+    BXON_BOOLEAN : "u1",
+    BXON_INT : "<i4",
+    BXON_LONG : "<i8",
+    BXON_FLOAT : "<f4",
+    BXON_DOUBLE : "<f8",
+    BXON_BYTE : "u1",
+    BXON_SHORT : "<u2",
+    BXON_HALF : "<f2"}
+
+# Decompression functions by codec id
+BXON_CODECS = {
+    1 : zlib.decompress,
+    2 : lzma.decompress}
+
+try:
+    import zstandard
+    BXON_CODECS[3] = lambda d: zstandard.ZstdDecompressor().decompress(d)
+except ImportError:
+    pass
+
+try:
+    import lz4.frame
+    BXON_CODECS[4] = lz4.frame.decompress
+except ImportError:
+    pass
+
+## Register the decompression function of a codec id.
+def bxon_register_codec(id, decompress):
+    BXON_CODECS[id] = decompress
+
+## Undo the byte shuffle filter.
+def bxon_unshuffle(data, size):
+    count = len(data) // size
+    out = bytearray(len(data))
+    for i in range(size):
+        out[i::size] = data[i*count:(i+1)*count]
+    return out
+
+## Undo the delta filter on little endian integers of the given size.
+def bxon_undelta(data, size):
+    values = array.array({2 : "H", 4 : "I", 8 : "Q"}[size], bytes(data))
+    if sys.byteorder == "big":
+        values.byteswap()
+    mask = (1 << (size * 8)) - 1
+    prev = 0
+    for i in range(len(values)):
+        prev = (prev + values[i]) & mask
+        values[i] = prev
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tobytes()
+
+## Decompress a compressed native array block into its raw bytes.
+def bxon_decompress(data, start, length, nType):
+    codec, filter, size = struct.unpack_from("<BBQ",data,start)
+    raw = BXON_CODECS[codec](bytes(data[start+10:start+length]))
+    if len(raw) != size:
+        raise ValueError("Corrupt compressed bxon array")
+    itemSize = struct.calcsize(BXON_NATIVE_FORMATS[nType])
+    if filter != BXON_FILTER_NONE:
+        raw = bxon_unshuffle(raw, itemSize)
+    if filter == BXON_FILTER_DELTA:
+        raw = bxon_undelta(raw, itemSize)
+    return memoryview(bytes(raw))
+
+## Return the value of a half float from its 16-bit pattern.
+def bxon_half(bits):
+    exponent = (bits >> 10) & 0x1F
+    mantissa = bits & 0x3FF
+    if exponent == 0:
+        value = math.ldexp(mantissa, -24)
+    elif exponent == 31:
+        value = float("nan") if mantissa != 0 else float("inf")
+    else:
+        value = math.ldexp(mantissa + 1024, exponent - 25)
+    return -value if bits & 0x8000 else value
+
+## Read the length field of the value starting at pos.
+## Returns the length and the offset of the value payload.
+def bxon_length(data, pos):
+    fmt = BXON_LENGTH_FORMATS[data[pos] & BXON_LENGTH_MASK]
+    return struct.unpack_from(fmt,data,pos+1)[0], pos + 1 + struct.calcsize(fmt)
+
+## Return the offset just past the value starting at pos.
+def bxon_skip(data, pos):
+    tag = data[pos]
+    t = tag & BXON_TYPE_MASK
+    if (tag & BXON_CONTAINER_MASK) != BXON_OBJECT or t == BXON_STRING:
+        length, start = bxon_length(data,pos)
+        return start + length
+    if t == BXON_NIL:
+        return pos + 1
+    if t == BXON_STRING_REF:
+        return bxon_length(data,pos)[1]
+    return pos + 1 + struct.calcsize(BXON_NATIVE_FORMATS[t])
+
+## Decode the value starting at pos.
+## Containers are returned as lazy views, natives as python values.
+## String references are resolved through the strings table.
+def bxon_decode(data, pos, strings = None):
+    tag = data[pos]
+    container = tag & BXON_CONTAINER_MASK
+    t = tag & BXON_TYPE_MASK
+    if container == BXON_MAP:
+        length, start = bxon_length(data,pos)
+        return bxon_map_view(data,start,length,strings)
+    elif container == BXON_ARRAY:
+        length, start = bxon_length(data,pos)
+        return bxon_array_view(data,start,length,t,strings)
+    elif container == BXON_COMPRESSED:
+        length, start = bxon_length(data,pos)
+        raw = bxon_decompress(data,start,length,t)
+        return bxon_array_view(raw,0,len(raw),t)
+    elif t == BXON_NIL:
+        return None
+    elif t == BXON_STRING:
+        length, start = bxon_length(data,pos)
+        return bytes(data[start:start+length]).decode("utf-8")
+    elif t == BXON_STRING_REF:
+        return strings[bxon_length(data,pos)[0]]
+    elif t == BXON_BOOLEAN:
+        return data[pos+1] != 0
+    elif t == BXON_HALF:
+        return bxon_half(struct.unpack_from("<H",data,pos+1)[0])
+    return struct.unpack_from(BXON_NATIVE_FORMATS[t],data,pos+1)[0]
+
+## Decode the root value, loading the string table heading a root map.
+def bxon_root(data):
+    root = bxon_decode(data,0)
+    if isinstance(root, bxon_map_view) and root.length > 0:
+        pos = root.start
+        if data[pos] & BXON_TYPE_MASK == BXON_STRING and bxon_decode(data,pos) == BXON_STRING_TABLE:
+            root.strings = list(bxon_decode(data,bxon_skip(data,pos)))
+    return root
+
+## Lazy map view
+class bxon_map_view(object):
+    def __init__(self, data, start, length, strings = None):
+        self.data = data
+        self.start = start
+        self.length = length
+        self.strings = strings
+        self.offsets = None
+
+    # Index the key offsets, values are skipped without being decoded.
+    def _scan(self):
+        if self.offsets != None:
+            return
+        self.offsets = {}
+        pos = self.start
+        end = self.start + self.length
+        while pos < end:
+            key = bxon_decode(self.data,pos,self.strings)
+            pos = bxon_skip(self.data,pos)
+            self.offsets[key] = pos
+            pos = bxon_skip(self.data,pos)
+
+    def offset(self, key):
+        self._scan()
+        return self.offsets[key]
+
+    def __getitem__(self, key):
+        return bxon_decode(self.data,self.offset(key),self.strings)
+
+    def get(self, key, default = None):
+        self._scan()
+        if key in self.offsets:
+            return bxon_decode(self.data,self.offsets[key],self.strings)
+        return default
+
+    def __contains__(self, key):
+        self._scan()
+        return key in self.offsets
+
+    def __len__(self):
+        self._scan()
+        return len(self.offsets)
+
+    def __iter__(self):
+        self._scan()
+        return iter(self.offsets)
+
+    def keys(self):
+        self._scan()
+        return self.offsets.keys()
+
+    def items(self):
+        for k in self:
+            yield k, self[k]
+
+## Lazy array view
+class bxon_array_view(object):
+    def __init__(self, data, start, length, nType = BXON_NIL, strings = None):
+        self.data = data
+        self.start = start
+        self.length = length
+        self.nativeType = nType
+        self.strings = strings
+        self.offsets = None
+
+    def isNative(self):
+        return self.nativeType != BXON_NIL
+
+    # Index the element offsets of an object array.
+    def _scan(self):
+        if self.offsets != None:
+            return
+        self.offsets = []
+        pos = self.start
+        end = self.start + self.length
+        while pos < end:
+            self.offsets.append(pos)
+            pos = bxon_skip(self.data,pos)
+
+    # Return the raw bytes of a native array, without copying.
+    def bytes(self):
+        return self.data[self.start:self.start+self.length]
+
+    # Return a native array as a memoryview, optionally shaped by stride.
+    # Values are little endian, the view is only meaningful on little endian hosts.
+    # Half arrays are viewed as their 16-bit patterns, see bxon_half.
+    def native(self, stride = 1):
+        fmt = BXON_NATIVE_FORMATS[self.nativeType][1:]
+        if stride > 1:
+            count = self.length // (struct.calcsize(fmt) * stride)
+            return self.bytes().cast(fmt,[count,stride])
+        return self.bytes().cast(fmt)
+
+    # Return a native array as a NumPy array, optionally shaped by stride.
+    def numpy(self, stride = 1):
+        if numpy == None:
+            raise ImportError("NumPy isn't available")
+        dtype = numpy.dtype(BXON_NATIVE_DTYPES[self.nativeType])
+        view = numpy.frombuffer(self.data,dtype,self.length // dtype.itemsize,self.start)
+        if stride > 1:
+            view = view.reshape(-1,stride)
+        return view
+
+    def __len__(self):
+        if self.isNative():
+            return self.length // struct.calcsize(BXON_NATIVE_FORMATS[self.nativeType])
+        self._scan()
+        return len(self.offsets)
+
+    def __getitem__(self, i):
+        if self.isNative():
+            fmt = BXON_NATIVE_FORMATS[self.nativeType]
+            size = struct.calcsize(fmt)
+            if i < 0:
+                i += len(self)
+            if i < 0 or (i + 1) * size > self.length:
+                raise IndexError("bxon array index out of range")
+            value = struct.unpack_from(fmt,self.data,self.start + i * size)[0]
+            if self.nativeType == BXON_HALF:
+                return bxon_half(value)
+            return value
+        self._scan()
+        return bxon_decode(self.data,self.offsets[i],self.strings)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+## Mesh attribute decoding ##
+
+# Dequantize unsigned normalized values relative to an offset and scale.
+def bxon_dequantize(values, stride, offset, scale, bits):
+    qMax = float((1 << bits) - 1)
+    return [offset[i % stride] + v / qMax * scale[i % stride] for i,v in enumerate(values)]
+
+## Return the mesh positions as a flat list of floats.
+def bxon_mesh_positions(mesh):
+    values = mesh["positions"]
+    if mesh.get("position_encoding") == "unorm16":
+        return bxon_dequantize(values, 3, list(mesh["position_offset"]), list(mesh["position_scale"]), 16)
+    return list(values)
+
+## Return the mesh normals as a flat list of floats.
+def bxon_mesh_normals(mesh):
+    values = mesh["normals"]
+    encoding = mesh.get("normal_encoding")
+    if encoding == None:
+        return list(values)
+    qMax = float((1 << (16 if encoding == "oct16" else 8)) - 1)
+    out = []
+    for i in range(0, len(values), 2):
+        x = values[i] / qMax * 2.0 - 1.0
+        y = values[i+1] / qMax * 2.0 - 1.0
+        z = 1.0 - abs(x) - abs(y)
+        if z < 0.0:
+            x, y = (1.0 - abs(y)) * (1.0 if x >= 0.0 else -1.0), (1.0 - abs(x)) * (1.0 if y >= 0.0 else -1.0)
+        l = (x * x + y * y + z * z) ** 0.5
+        out.extend((x / l, y / l, z / l))
+    return out
+
+## Return an array of UV coordinates of a mesh as a flat list of floats.
+def bxon_mesh_uvs(mesh, values):
+    if mesh.get("uv_encoding") == "unorm16":
+        return bxon_dequantize(values, 2, list(mesh["uv_offset"]), list(mesh["uv_scale"]), 16)
+    return list(values)
+
+## Return the bone weights of a skinned mesh as a flat list of floats.
+def bxon_mesh_weights(mesh):
+    values = mesh["bone_weights"]
+    if mesh.get("bone_weight_encoding") == "unorm16":
+        return [v / 65535.0 for v in values]
+    return list(values)
+
+## Return the triangles of a level of detail of a mesh as a flat list of
+## mesh vertex indices.
+def bxon_mesh_lod(mesh, level):
+    lod = mesh["lods"][level]
+    vertices = list(lod["vertices"])
+    return [vertices[i] for i in lod["indices"]]
+
+## Return the coarsest level of detail of a mesh whose error projects to at
+## most threshold pixels at distance, -1 for the full mesh. projection is
+## the viewport height in pixels over 2 tan(fov / 2).
+def bxon_mesh_select_lod(mesh, distance, projection, threshold = 1.0):
+    level = -1
+    lods = mesh.get("lods")
+    if lods != None:
+        for i in range(len(lods)):
+            if lods[i]["error"] * projection > threshold * max(distance, 1e-6):
+                break
+            level = i
+    return level
+
+## Animation track decoding ##
+
+## Return the key frames of a baked animation channel.
+def bxon_track_times(channel):
+    times = channel["times"]
+    if "time_step" not in channel:
+        return list(times)
+    start = channel["time_start"]
+    end = channel["time_end"]
+    step = channel["time_step"]
+    out = []
+    index = 0
+    for d in times:
+        index += d
+        out.append(min(start + index * step, end))
+    return out
+
+## Decode 48-bit smallest three quaternions into (x, y, z, w) floats.
+def bxon_smallest_three(values):
+    qMax = float((1 << 15) - 1)
+    r = 1.0 / 2.0 ** 0.5
+    out = []
+    for i in range(0, len(values), 3):
+        bits = values[i] | (values[i+1] << 16) | (values[i+2] << 32)
+        largest = bits >> 45
+        q = [0.0] * 4
+        shift = 30
+        for c in range(4):
+            if c != largest:
+                q[c] = ((bits >> shift) & 0x7FFF) / qMax * 2.0 * r - r
+                shift -= 15
+        q[largest] = max(1.0 - sum(v * v for v in q), 0.0) ** 0.5
+        out.extend(q)
+    return out
+
+## Return the key values of a baked animation channel as a flat list of floats.
+def bxon_track_values(channel):
+    values = channel["values"]
+    encoding = channel.get("encoding")
+    if encoding == "smallest3":
+        return bxon_smallest_three(values)
+    elif encoding == "unorm16":
+        offset = list(channel["value_offset"])
+        return bxon_dequantize(values, len(offset), offset, list(channel["value_scale"]), 16)
+    return list(values)
+
+## Memory mapped bxon file
+class bxon_file(object):
+    def __init__(self, filename):
+        self.file = open(filename,"rb")
+        self.mmap = mmap.mmap(self.file.fileno(),0,access=mmap.ACCESS_READ)
+        self.data = memoryview(self.mmap)
+
+    def root(self):
+        return bxon_root(self.data)
+
+    # Decode a single datablock through the root index, by id or by name.
+    # Only the root keys and the index block are read.
+    def datablock(self, type, key):
+        root = self.root()
+        entry = root["index"][type]
+        if isinstance(key, str):
+            key = list(entry["names"]).index(key)
+        return bxon_decode(self.data,entry["offsets"][key],root.strings)
+
+    def close(self):
+        self.data.release()
+        self.mmap.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+## Open a bxon file for lazy reading.
+def bxon_open(filename):
+    return bxon_file(filename)
+
+## Decode a bxon document held in a bytes-like object.
+def bxon_loads(buf):
+    return bxon_root(memoryview(buf))
+
+## Print the structure of a value, native arrays are summarized.
+def bxon_dump(value, indent = 0, out = sys.stdout):
+    pad = " " * indent
+    if isinstance(value, bxon_map_view):
+        for k in value:
+            v = value[k]
+            if isinstance(v, (bxon_map_view, bxon_array_view)):
+                out.write(pad + k + ":\n")
+                bxon_dump(v, indent + 2, out)
+            else:
+                out.write(pad + k + ": " + repr(v) + "\n")
+    elif isinstance(value, bxon_array_view):
+        if value.isNative():
+            out.write(pad + "<native " + str(value.nativeType) + " x " + str(len(value)) + ">\n")
+        else:
+            for i,v in enumerate(value):
+                out.write(pad + "[" + str(i) + "]\n")
+                bxon_dump(v, indent + 2, out)
+    else:
+        out.write(pad + repr(value) + "\n")
+
+if __name__ == "__main__":
+    with bxon_open(sys.argv[1]) as f:
+        root = f.root()
+        bxon_dump(root)
+        del root
@@ -0,0 +1,20 @@
+# Stand-in for the Blender executable in the batch exporter tests. It runs
+# the exporter command line on a synthetic scene instead of the blend file,
+# blend files holding "fail" exit with an error.
+
+import sys, os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bxon_test_util as util
+
+argv = sys.argv[1:]
+if os.path.basename(argv[argv.index("--python") + 1]) != "bxon-3d.py":
+    sys.exit(2)
+with open(argv[argv.index("--background") + 1]) as f:
+    if "fail" in f.read():
+        sys.exit(1)
+
+bpy, bx3d = util.load()
+bpy.context.scene.objects = util.scene(meshes = 1, vertices = 50, bones = 0, keys = 0)
+bx3d.runCommandLine(argv[argv.index("--") + 1:])
@@ -0,0 +1,42 @@
+# Shared helpers of the exporter tests. The exporter runs on the fake bpy and
+# mathutils of bxon_benchmark.py, against its synthetic scenes.
+
+import sys, os, io
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bxon_benchmark, bxon_reader
+
+_loaded = None
+
+## Return the fake bpy module and the exporter module, loaded once.
+def load():
+    global _loaded
+    if _loaded == None:
+        bpy = bxon_benchmark.bxon_fake_install()
+        _loaded = (bpy, bxon_benchmark.bxon_bench_load())
+    return _loaded
+
+## Build and select a synthetic scene, returns its objects.
+def scene(meshes = 2, vertices = 120, bones = 4, keys = 6, seed = 1):
+    bpy, bx3d = load()
+    return bxon_benchmark.bxon_bench_scene(bpy, meshes, vertices, bones, keys, seed)[0]
+
+## Export the selected objects with runExport options, returns the bytes.
+def export(**options):
+    bpy, bx3d = load()
+    out = io.BytesIO()
+    bx3d.runExport(out, quiet = True, **options)
+    return out.getvalue()
+
+## Decode an exported document into plain python values, native arrays
+## become lists. Keys of the index and the string table are left out.
+def decode(data):
+    return plain(bxon_reader.bxon_loads(data))
+
+def plain(value):
+    if isinstance(value, bxon_reader.bxon_map_view):
+        return dict((k, plain(v)) for k, v in value.items() if k not in ("index", "strings"))
+    if isinstance(value, bxon_reader.bxon_array_view):
+        return [plain(v) for v in value]
+    return value
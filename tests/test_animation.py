@@ -0,0 +1,166 @@
+import unittest, math, random
+
+import bxon_test_util as util
+import bxon_benchmark as bench
+import bxon_reader
+
+## Return the value of reduced keys at a frame, interpolated linearly.
+def interpolate(times, keys, stride, frame):
+    for k in range(1, len(times)):
+        if frame <= times[k]:
+            t = (frame - times[k-1]) / (times[k] - times[k-1])
+            a, b = keys[(k-1)*stride:k*stride], keys[k*stride:(k+1)*stride]
+            return [x + (y - x) * t for x, y in zip(a, b)]
+    return list(keys[-stride:])
+
+## Return the angle between two (x, y, z, w) quaternions.
+def angle(a, b):
+    la = math.sqrt(sum(v * v for v in a))
+    lb = math.sqrt(sum(v * v for v in b))
+    return 2.0 * math.acos(min(abs(sum(x * y for x, y in zip(a, b))) / (la * lb), 1.0))
+
+class BakeTest(unittest.TestCase):
+    def setUp(self):
+        self.bpy, self.bx3d = util.load()
+
+    def test_reduce_keys_within_error(self):
+        rnd = random.Random(2)
+        frames = [float(f) for f in range(60)]
+        values = []
+        for f in frames:
+            values.extend((math.sin(f * 0.2), f * 0.05, rnd.uniform(-0.01, 0.01)))
+        for error in (0.001, 0.01, 0.05):
+            times, keys, keep = self.bx3d.bxReduceKeys(frames, values, 3, error)
+            self.assertEqual((times[0], times[-1]), (frames[0], frames[-1]))
+            for i, f in enumerate(frames):
+                v = interpolate(times, keys, 3, f)
+                self.assertLessEqual(max(abs(x - y) for x, y in zip(v, values[i*3:i*3+3])), error + 1e-6)
+        self.assertLess(len(times), len(frames) // 2)
+
+    def test_reduce_quaternions_within_error(self):
+        frames = [float(f) for f in range(40)]
+        values = []
+        for f in frames:
+            a = f * 0.05
+            values.extend((0.0, math.sin(a), 0.0, math.cos(a)))
+        values[20*4:21*4] = [0.1, math.sin(1.0), 0.0, math.cos(1.0)]
+        values = self.bx3d.bxQuatSamples(values)
+        error = 0.01
+        times, keys, keep = self.bx3d.bxReduceKeys(frames, values, 4, error, True)
+        self.assertLess(len(times), len(frames))
+        self.assertIn(20, keep)
+        for i, f in enumerate(frames):
+            self.assertLessEqual(angle(interpolate(times, keys, 4, f), values[i*4:i*4+4]), error + 1e-6)
+
+    def test_single_frame(self):
+        for error in (0.0, 0.01):
+            times, keys, keep = self.bx3d.bxReduceKeys([3.0], [1.0, 2.0, 3.0], 3, error)
+            self.assertEqual((list(times), list(keys), keep), ([3.0], [1.0, 2.0, 3.0], [0]))
+        times, keys, keep = self.bx3d.bxReduceKeys([0.0, 1.0, 2.0], [0.0, 1.0, 2.0], 1, 0.0)
+        self.assertEqual(keep, [0, 1, 2])
+
+    def test_bake_action(self):
+        action = bench.bxon_bench_action("Action", ["Bone0", "Bone1"], 24, random.Random(4))
+        obj = bench.bxon_bench_object("Armature", "ARMATURE", None, action = action)
+        bake = (2.0, 0.005, 0.002)
+        baked = self.bx3d.bxBakeAction(obj, action, bake)
+        curves = self.bx3d.bxListActionCurves(action, True)
+        frames = self.bx3d.bxBakeFrames(action.frame_range, bake[0])
+        self.assertEqual(frames[0], 0.0)
+        self.assertEqual(frames[-1], 23.0)
+        groups = [(baked, curves)] + [(baked["bones"][b], curves["bones"][b]) for b in ("Bone0", "Bone1")]
+        for group, source in groups:
+            self.assertEqual(sorted(k for k in group if k != "bones"), ["position", "quat", "scale"])
+            for name, stride in (("position", 3), ("scale", 3)):
+                times, keys, keep = group[name]
+                for f in frames:
+                    expected = [c.evaluate(f) for c in source[name]]
+                    v = interpolate(times, keys, stride, f)
+                    self.assertLessEqual(max(abs(x - y) for x, y in zip(v, expected)), bake[1] + 1e-6)
+            times, keys, keep = group["quat"]
+            for f in frames:
+                expected = [c.evaluate(f) for c in source["quat"]]
+                self.assertLessEqual(angle(interpolate(times, keys, 4, f), expected), bake[2] + 1e-6)
+
+    def test_single_frame_action_exports(self):
+        util.scene(meshes = 1, vertices = 50, bones = 2, keys = 1)
+        for animation in ("float", "compact"):
+            data = util.decode(util.export(bake = True, bakeError = 0.0, bakeAngleError = 0.0, animation = animation))
+            strip = data["object"][0]["animation"]["tracks"][0]["strips"][0]
+            self.assertEqual(list(strip["position"]["times"]), [0.0] if animation == "float" else [0])
+
+class ActionCurvesTest(unittest.TestCase):
+    def setUp(self):
+        self.bpy, self.bx3d = util.load()
+
+    def test_grouping(self):
+        def curve(path, index):
+            return bench.bxon_fake_fcurve(path, index, [0.0, 10.0], [float(index), float(index) + 1.0])
+        bone = 'pose.bones["Arm.L 2"].'
+        curves = [curve("location", 0), curve("location", 2),
+                  curve("rotation_euler", 1), curve("hide_viewport", 0),
+                  curve(bone + "rotation_quaternion", 0), curve(bone + "rotation_quaternion", 1),
+                  curve(bone + "scale", 1), curve(bone + "scale", 5),
+                  curve('pose.bones["Spine"].location', 1),
+                  curve('pose.bones["Spine"].custom_prop', 0)]
+        action = bench.bxon_fake_data(name = "Mixed", fcurves = curves, frame_range = [0.0, 10.0])
+
+        groups = self.bx3d.bxListActionCurves(action, True)
+        self.assertEqual(sorted(groups), ["bones", "euler", "position"])
+        self.assertEqual(groups["position"], [curves[0], None, curves[1]])
+        self.assertEqual(groups["euler"], [None, curves[2], None])
+        self.assertEqual(sorted(groups["bones"]), ["Arm.L 2", "Spine"])
+        arm = groups["bones"]["Arm.L 2"]
+        # Quaternion curves are stored as (x, y, z, w)
+        self.assertEqual(arm["quat"], [curves[5], None, None, curves[4]])
+        self.assertEqual(arm["scale"], [None, curves[6], None])
+        self.assertEqual(groups["bones"]["Spine"], {"position" : [None, curves[8], None]})
+
+        keys = self.bx3d.bxListActionCurves(action)
+        self.assertEqual(list(keys["position"][0]), [-0.5, 0.0, 0.0, 0.0, 0.5, 0.0, 9.5, 1.0, 10.0, 1.0, 10.5, 1.0])
+        self.assertEqual(keys["position"][1], None)
+        self.assertEqual(list(keys["bones"]["Arm.L 2"]["quat"][3]), list(keys["position"][0]))
+
+class CompactAnimationTest(unittest.TestCase):
+    def setUp(self):
+        self.bpy, self.bx3d = util.load()
+        util.scene(meshes = 1, vertices = 50, bones = 3, keys = 24)
+
+    ## Return the baked channels of the armature object and of its bones.
+    def channels(self, animation):
+        data = bxon_reader.bxon_loads(util.export(bake = True, animation = animation))
+        ret = {"object" : data["object"][0]["animation"]["tracks"][0]["strips"][0]}
+        strip = data["armature"][0]["animation"]["tracks"][0]["strips"][0]
+        for b in strip.keys():
+            ret[b] = strip[b]
+        return ret
+
+    def test_compact_keys_decode(self):
+        reference = self.channels("float")
+        compact = self.channels("compact")
+        self.assertEqual(sorted(compact), ["Bone0", "Bone1", "Bone2", "object"])
+        for b in compact:
+            for name in ("position", "quat", "scale"):
+                channel, expected = compact[b][name], reference[b][name]
+                self.assertEqual(channel["encoding"], "smallest3" if name == "quat" else "unorm16")
+                times = bxon_reader.bxon_track_times(channel)
+                self.assertEqual(len(times), len(expected["times"]))
+                for t, e in zip(times, bxon_reader.bxon_track_times(expected)):
+                    self.assertAlmostEqual(t, e, 5)
+                values = bxon_reader.bxon_track_values(channel)
+                if name == "quat":
+                    self.assertEqual(values, bxon_reader.bxon_smallest_three(channel["values"]))
+                    for i in range(0, len(values), 4):
+                        self.assertLessEqual(angle(values[i:i+4], list(expected["values"])[i:i+4]), 0.0005)
+                else:
+                    for v, e in zip(values, bxon_reader.bxon_track_values(expected)):
+                        self.assertLessEqual(abs(v - e), 1e-4)
+
+    def test_compact_needs_bake(self):
+        with self.assertRaises(ValueError):
+            util.export(animation = "compact")
+        with self.assertRaises(SystemExit):
+            self.bx3d.runCommandLine(["out.bxon", "--animation", "compact"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+import unittest, os, sys, json, stat, time, tempfile, subprocess
+
+import bxon_test_util as util
+import bxon_benchmark as bench
+import bxon_batch
+
+TESTS = os.path.dirname(os.path.abspath(__file__))
+BATCH = os.path.join(os.path.dirname(TESTS), "bxon_batch.py")
+
+class BatchTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.assets = self.path("assets")
+        self.out = self.path("out")
+        self.blender = self.path("blender")
+        with open(self.blender, "w") as f:
+            f.write("#!/bin/sh\nexec \"" + sys.executable + "\" \"" + os.path.join(TESTS, "bxon_stub_blender.py") + "\" \"$@\"\n")
+        os.chmod(self.blender, os.stat(self.blender).st_mode | stat.S_IEXEC)
+        for name in ("b.blend", os.path.join("sub", "a.blend"), os.path.join("sub", "notes.txt")):
+            self.touch(os.path.join(self.assets, name))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def path(self, *names):
+        return os.path.join(self.tmp.name, *names)
+
+    def touch(self, path, content = "blend"):
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+        with open(path, "w") as f:
+            f.write(content)
+
+    def run_batch(self, *args):
+        cmd = [sys.executable, BATCH, "-j", "2", "-o", self.out, "--blender", self.blender] + list(args)
+        proc = subprocess.run(cmd, stdout = subprocess.PIPE, stderr = subprocess.PIPE)
+        return proc.returncode, json.loads(proc.stdout.decode("utf-8")), proc.stderr.decode("utf-8")
+
+    def test_files_keep_the_tree(self):
+        single = self.path("single.blend")
+        files = bxon_batch.bxon_batch_files([self.assets, single], self.out)
+        self.assertEqual(files, [
+            (os.path.join(self.assets, "b.blend"), os.path.join(self.out, "b.bxon")),
+            (os.path.join(self.assets, "sub", "a.blend"), os.path.join(self.out, "sub", "a.bxon")),
+            (single, os.path.join(self.out, "single.bxon"))])
+
+    def test_uptodate(self):
+        blend = os.path.join(self.assets, "b.blend")
+        output = self.path("b.bxon")
+        self.assertFalse(bxon_batch.bxon_batch_uptodate(blend, output))
+        self.touch(output)
+        t = os.path.getmtime(blend)
+        os.utime(output, (t + 10, t + 10))
+        self.assertTrue(bxon_batch.bxon_batch_uptodate(blend, output))
+        os.utime(output, (t - 10, t - 10))
+        self.assertFalse(bxon_batch.bxon_batch_uptodate(blend, output))
+
+    def test_batch_exports_and_skips(self):
+        code, summary, log = self.run_batch(self.assets, "--", "--index", "--quiet")
+        self.assertEqual(code, 0)
+        self.assertEqual((summary["exported"], summary["skipped"], summary["failed"]), (2, 0, 0))
+        self.assertIn("exported " + os.path.join(self.assets, "b.blend"), log)
+        output = os.path.join(self.out, "sub", "a.bxon")
+        with open(output, "rb") as f:
+            data = f.read()
+        self.assertIn("index", util.bxon_reader.bxon_loads(data))
+        self.assertEqual(summary["size"], len(data) + os.path.getsize(os.path.join(self.out, "b.bxon")))
+
+        code, summary, log = self.run_batch(self.assets)
+        self.assertEqual((summary["exported"], summary["skipped"]), (0, 2))
+        code, summary, log = self.run_batch(self.assets, "--force", "--", "--quiet")
+        self.assertEqual((summary["exported"], summary["skipped"]), (2, 0))
+
+    def test_batch_reports_failures(self):
+        self.touch(os.path.join(self.assets, "broken.blend"), "fail")
+        summary = self.path("summary.json")
+        proc = subprocess.run([sys.executable, BATCH, "-o", self.out, "--blender", self.blender,
+                               "--summary", summary, self.assets, "--", "--quiet"], stdout = subprocess.PIPE)
+        self.assertEqual(proc.returncode, 1)
+        self.assertEqual(proc.stdout, b"")
+        with open(summary) as f:
+            summary = json.load(f)
+        self.assertEqual((summary["exported"], summary["failed"]), (2, 1))
+        self.assertEqual([r["status"] for r in summary["files"]], ["exported", "failed", "exported"])
+
+class CommandLineTest(unittest.TestCase):
+    def setUp(self):
+        self.bpy, self.bx3d = util.load()
+        self.objects = util.scene(meshes = 3, vertices = 50, bones = 0)
+        self.meshes = [o for o in self.objects if o.type == "MESH"]
+        self.bpy.context.scene.objects = self.objects
+        self.data = (self.bpy.data.groups, self.bpy.context.selected_objects)
+        self.bpy.data.scenes = {"Other" : bench.bxon_fake_data(objects = self.meshes[:1])}
+        self.bpy.data.groups = {"Group" : bench.bxon_fake_data(objects = self.meshes[1:])}
+        self.bpy.context.selected_objects = self.meshes[2:]
+        self.tmp = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.tmp.name, "scene.bxon")
+        self.report = os.path.join(self.tmp.name, "report.json")
+
+    def tearDown(self):
+        del self.bpy.data.scenes
+        self.bpy.data.groups, self.bpy.context.selected_objects = self.data
+        self.tmp.cleanup()
+
+    def run_cli(self, *args):
+        self.bx3d.runCommandLine([self.output, "--report", self.report, "--quiet"] + list(args))
+        with open(self.report) as f:
+            report = json.load(f)
+        with open(self.output, "rb") as f:
+            data = f.read()
+        self.assertEqual(report["size"], len(data))
+        return report, util.decode(data)
+
+    def test_sources(self):
+        for args, objects in (((), len(self.objects)), (("--scene", "Other"), 1),
+                              (("--collection", "Group"), 2), (("--selected",), 1)):
+            report, data = self.run_cli(*args)
+            self.assertEqual(report["objects"], objects)
+            self.assertEqual(len(data["object"]), objects)
+
+    def test_options(self):
+        report, data = self.run_cli("--layout", "indexed", "--positions", "unorm16", "--compression", "zlib",
+                                    "--threshold", "64", "--lods", "0.5", "0.25")
+        for mesh in data["mesh"]:
+            self.assertEqual(mesh["layout"], "indexed")
+            self.assertEqual(mesh["position_encoding"], "unorm16")
+            self.assertEqual(len(mesh["lods"]), 2)
+
+    def test_rejects_bad_arguments(self):
+        for args in ([self.output, "--scene", "Other", "--selected"], [self.output, "--layout", "strips"], []):
+            with self.assertRaises(SystemExit):
+                self.bx3d.runCommandLine(args)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest, os, sys, tempfile, subprocess
+
+import bxon_benchmark as bench
+
+BENCHMARK = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bxon_benchmark.py")
+
+class BenchmarkTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.baseline = os.path.join(self.tmp.name, "baseline.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_benchmark(self, *args):
+        cmd = [sys.executable, BENCHMARK, "--meshes", "1", "--vertices", "50", "--bones", "2", "--keys", "5",
+               "--repeat", "1", "--baseline", self.baseline] + list(args)
+        return subprocess.run(cmd, stdout = subprocess.PIPE, stderr = subprocess.PIPE)
+
+    def test_missing_baseline_fails(self):
+        proc = self.run_benchmark()
+        self.assertEqual(proc.returncode, 1)
+        self.assertIn(b"No baseline", proc.stderr)
+        self.assertEqual(self.run_benchmark("--no-check").returncode, 0)
+        self.assertFalse(os.path.exists(self.baseline))
+
+    def test_saved_baseline_checks(self):
+        self.assertEqual(self.run_benchmark("--save").returncode, 0)
+        self.assertTrue(os.path.exists(self.baseline))
+        self.assertEqual(self.run_benchmark("--tolerance", "0.99").returncode, 0)
+
+    def test_check(self):
+        baseline = {"mesh" : {"mb_per_sec" : 10.0, "peak_memory" : 1000, "seconds" : 1.0}, "gone" : {"mb_per_sec" : 1.0}}
+        self.assertEqual(bench.bxon_benchmark_check({"mesh" : {"mb_per_sec" : 9.0, "peak_memory" : 1100, "seconds" : 9.0}},
+                                                    baseline, 0.2), [])
+        failures = bench.bxon_benchmark_check({"mesh" : {"mb_per_sec" : 7.0, "peak_memory" : 1300}}, baseline, 0.2)
+        self.assertEqual(len(failures), 2)
+
+if __name__ == "__main__":
+    unittest.main()
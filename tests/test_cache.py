@@ -0,0 +1,50 @@
+import unittest, os, tempfile
+
+import bxon_test_util as util
+import bxon_benchmark as bench
+
+class CacheTest(unittest.TestCase):
+    def setUp(self):
+        self.bpy, self.bx3d = util.load()
+        self.objects = util.scene(meshes = 3, vertices = 100)
+        self.meshes = [o for o in self.objects if o.type == "MESH"]
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "scene.bxon")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def exportCached(self):
+        self.bx3d.runExport(self.path, quiet = True, cache = True)
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def hashMesh(self, obj):
+        bx = self.bx3d.bxExporter()
+        bx.getSelected()
+        return bx.hashMesh(bx.meshMap.find(obj.data.name))
+
+    def test_cached_export_matches(self):
+        plain = util.export()
+        self.assertEqual(self.exportCached(), plain)
+        # Second run splices the cached datablocks
+        self.assertEqual(self.exportCached(), plain)
+
+    def test_referenced_geometry_changes_key(self):
+        obj, target = self.meshes[0], self.meshes[1]
+        obj.modifiers.append(bench.bxon_fake_data(name = "Boolean", type = "BOOLEAN",
+                                                  operation = "DIFFERENCE", object = target))
+        key = self.hashMesh(obj)
+        target.data.vertices[0].co[2] += 1.0
+        target.data.vertices.columns.clear()
+        self.assertNotEqual(self.hashMesh(obj), key)
+
+    def test_referenced_curve_skips_cache(self):
+        obj = self.meshes[0]
+        curve = bench.bxon_bench_object("Curve", "CURVE", bench.bxon_fake_data(name = "Curve"))
+        obj.modifiers.append(bench.bxon_fake_data(name = "Shrinkwrap", type = "SHRINKWRAP", target = curve))
+        self.assertEqual(self.hashMesh(obj), None)
+        self.assertEqual(self.exportCached(), util.export())
+
+if __name__ == "__main__":
+    unittest.main()
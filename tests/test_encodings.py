@@ -0,0 +1,68 @@
+import unittest, struct, random
+
+import bxon_test_util as util
+import bxon_reader
+
+class EncodingTest(unittest.TestCase):
+    def setUp(self):
+        self.bpy, self.bx3d = util.load()
+        util.scene(meshes = 2, vertices = 150, bones = 4)
+        self.reference = util.decode(util.export(layout = "indexed"))["mesh"]
+
+    def meshes(self, **options):
+        return util.decode(util.export(layout = "indexed", **options))["mesh"]
+
+    def assertClose(self, values, expected, tolerance):
+        self.assertEqual(len(values), len(expected))
+        for a, b in zip(values, expected):
+            self.assertLessEqual(abs(a - b), tolerance)
+
+    def test_half_bits_match_struct(self):
+        rnd = random.Random(3)
+        values = [0.0, -0.0, 1.0, -2.5, 65504.0, 65520.0, 6.1e-5, 5.96e-8, 2.98e-8, 1e-9, float("inf"), -float("inf")]
+        values += [rnd.uniform(-2.0, 2.0) for i in range(2000)]
+        values += [rnd.uniform(-1e-4, 1e-4) for i in range(2000)]
+        for v in values:
+            try:
+                expected = struct.unpack("<H", struct.pack("<e", v))[0]
+            except OverflowError:
+                expected = 0x7C00 | (0x8000 if v < 0.0 else 0)
+            self.assertEqual(self.bx3d.bxHalfBits(v), expected, v)
+
+    def test_positions_unorm16(self):
+        for mesh, ref in zip(self.meshes(positions = "unorm16"), self.reference):
+            self.assertEqual(mesh["position_encoding"], "unorm16")
+            extent = max(mesh["position_scale"])
+            self.assertClose(bxon_reader.bxon_mesh_positions(mesh), ref["positions"], extent / 65535.0)
+
+    def test_normals_oct(self):
+        for encoding, tolerance in (("oct16", 1e-3), ("oct8", 2e-2)):
+            for mesh, ref in zip(self.meshes(normals = encoding), self.reference):
+                self.assertEqual(mesh["normal_encoding"], encoding)
+                self.assertClose(bxon_reader.bxon_mesh_normals(mesh), ref["normals"], tolerance)
+
+    def test_uvs(self):
+        for encoding in ("half", "unorm16"):
+            for mesh, ref in zip(self.meshes(uvs = encoding), self.reference):
+                for values, expected in zip(mesh["uvs"], ref["uvs"]):
+                    self.assertClose(bxon_reader.bxon_mesh_uvs(mesh, values), expected, 1e-3)
+
+    def test_half_native(self):
+        root = bxon_reader.bxon_loads(util.export(layout = "indexed", uvs = "half"))
+        for mesh, ref in zip(root["mesh"], self.reference):
+            for values, expected in zip(mesh["uvs"], ref["uvs"]):
+                # native views halves as their bit patterns
+                bits = values.native(2).tolist()
+                self.assertEqual(sum(bits, []), [self.bx3d.bxHalfBits(v) for v in expected])
+                decoded = [bxon_reader.bxon_half(b) for b in values.native()]
+                self.assertEqual(decoded, list(values))
+                self.assertClose(decoded, expected, 1e-3)
+
+    def test_weights_unorm16(self):
+        reference = self.meshes(influences = 4)
+        for mesh, ref in zip(self.meshes(influences = 4, weights = "unorm16"), reference):
+            self.assertEqual(mesh["bone_weight_encoding"], "unorm16")
+            self.assertClose(bxon_reader.bxon_mesh_weights(mesh), ref["bone_weights"], 2.0 / 65535.0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+import unittest, os, gc, tempfile
+
+import bxon_test_util as util
+import bxon_reader
+
+class IndexTest(unittest.TestCase):
+    def setUp(self):
+        self.bpy, self.bx3d = util.load()
+        util.scene(meshes = 3, vertices = 80, bones = 3, keys = 4)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "scene.bxon")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_datablock_by_name(self):
+        for options in ({}, {"compact" : True}, {"strings" : True}, {"compact" : True, "strings" : True},
+                        {"buffered" : True}, {"compression" : "zlib", "threshold" : 64}):
+            self.bx3d.runExport(self.path, quiet = True, index = True, **options)
+            with open(self.path, "rb") as f:
+                expected = util.decode(f.read())
+            with bxon_reader.bxon_open(self.path) as f:
+                index = f.root()["index"]
+                types = list(index.keys())
+                self.assertIn("mesh", types)
+                for type in types:
+                    names = list(index[type]["names"])
+                    self.assertEqual(names, [b["name"] for b in expected[type]])
+                    for i, name in enumerate(names):
+                        self.assertEqual(util.plain(f.datablock(type, name)), expected[type][i], (type, name, options))
+                        self.assertEqual(util.plain(f.datablock(type, i)), expected[type][i])
+                with self.assertRaises(ValueError):
+                    f.datablock("mesh", "Missing")
+                index = None
+                gc.collect()
+
+if __name__ == "__main__":
+    unittest.main()
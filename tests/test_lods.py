@@ -0,0 +1,58 @@
+import unittest, random
+
+import bxon_test_util as util
+import bxon_reader
+
+## Return the positions and triangles of a near planar grid of size x size
+## quads, with a little height noise.
+def grid(size, noise, seed = 1):
+    rnd = random.Random(seed)
+    positions = []
+    for j in range(size + 1):
+        for i in range(size + 1):
+            positions.extend((float(i), float(j), rnd.uniform(-noise, noise)))
+    indices = []
+    for j in range(size):
+        for i in range(size):
+            a = j * (size + 1) + i
+            b, c, d = a + 1, a + size + 2, a + size + 1
+            indices.extend((a, b, c, a, c, d))
+    return positions, indices
+
+class LodTest(unittest.TestCase):
+    def setUp(self):
+        self.bpy, self.bx3d = util.load()
+
+    def test_near_planar_grid_keeps_orientation(self):
+        positions, indices = grid(32, 0.01)
+        self.assertEqual(len(indices) // 3, 2048)
+        simplifier = self.bx3d.bxSimplifier(positions, indices)
+        levels = simplifier.simplify([1024, 512, 256, 64])
+        self.assertLess(len(levels[-1][0]), 512)
+        for sources, triangles, error in levels:
+            self.assertEqual(len(triangles), len(sources) * 3)
+            for t in range(0, len(triangles), 3):
+                p = [positions[v*3:v*3+3] for v in triangles[t:t+3]]
+                n = self.bx3d.bxCross(self.bx3d.bxSub(p[1], p[0]), self.bx3d.bxSub(p[2], p[0]))
+                # Upward facing with a non zero area
+                self.assertGreater(n[2], 0.2 * self.bx3d.bxDot(n, n) ** 0.5)
+                self.assertGreater(n[2], 1e-3)
+
+    def test_levels_carry_triangle_materials(self):
+        util.scene(meshes = 2, vertices = 300, bones = 0)
+        meshes = util.decode(util.export(layout = "indexed", lods = [0.5, 0.25]))["mesh"]
+        for mesh in meshes:
+            self.assertEqual(len(mesh["lods"]), 2)
+            for level, lod in enumerate(mesh["lods"]):
+                triangles = bxon_reader.bxon_mesh_lod(mesh, level)
+                self.assertEqual(len(lod["triangle_materials"]), len(triangles) // 3)
+                self.assertEqual(set(lod["triangle_materials"]), set(mesh["triangle_materials"]))
+
+    def test_faces_layout_has_no_lods(self):
+        util.scene(meshes = 2, vertices = 300, bones = 0)
+        for options in ({}, {"chunk" : 17}):
+            data = util.export(lods = [0.5], **options)
+            self.assertEqual(data, util.export(**options))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import unittest, io, random, contextlib
+
+import bxon_test_util as util
+import bxon_benchmark as bench
+
+## Read the mesh arrays one element at a time, the way exportMesh walked the
+## mesh before the foreach_get path.
+def extractPerElement(bx3d, obj, mesh):
+    data = bx3d.bxMeshData()
+    data.positions = bx3d.bxon_buffer(bx3d.BXON_FLOAT)
+    data.normals = bx3d.bxon_buffer(bx3d.BXON_FLOAT)
+    for v in mesh.vertices:
+        data.positions.extend(v.co)
+        data.normals.extend(v.normal)
+    data.loopStart = bx3d.bxon_buffer(bx3d.BXON_INT, [p.loop_start for p in mesh.polygons])
+    data.loopTotal = bx3d.bxon_buffer(bx3d.BXON_INT, [p.loop_total for p in mesh.polygons])
+    data.materialIndex = bx3d.bxon_buffer(bx3d.BXON_INT, [p.material_index for p in mesh.polygons])
+    data.loopVertices = bx3d.bxon_buffer(bx3d.BXON_INT, [l.vertex_index for l in mesh.loops])
+    for j, layer in enumerate(mesh.uv_textures):
+        uvs = bx3d.bxon_buffer(bx3d.BXON_FLOAT)
+        for d in mesh.uv_layers[j].data:
+            uvs.extend(d.uv)
+        data.uvs.append(uvs)
+    data.f3Count = sum(1 for p in mesh.polygons if p.loop_total == 3)
+    data.f4Count = sum(1 for p in mesh.polygons if p.loop_total == 4)
+    return data
+
+## Return the triangles of an indexed mesh as sorted (vertices, material)
+## entries, each vertex as its source vertex and position, rotated to start
+## at the smallest vertex so the winding is kept.
+def triangleSet(mesh):
+    out = []
+    for t in range(mesh.triangleCount()):
+        tri = [(mesh.sourceVertices[v], tuple(mesh.positions[v*3:v*3+3])) for v in mesh.indices[t*3:t*3+3]]
+        k = tri.index(min(tri))
+        out.append((tuple(tri[k:] + tri[:k]), mesh.triangleMaterials[t]))
+    return sorted(out)
+
+class MeshExtractTest(unittest.TestCase):
+    def test_foreach_get_matches_per_element(self):
+        bpy, bx3d = util.load()
+        for obj in util.scene(meshes = 3, vertices = 150):
+            if obj.type != "MESH":
+                continue
+            data = bx3d.bxMeshData()
+            data.extract(obj, obj.data)
+            ref = extractPerElement(bx3d, obj, obj.data)
+            for attr in ("positions", "normals", "loopStart", "loopTotal", "materialIndex",
+                         "loopVertices", "uvs", "f3Count", "f4Count"):
+                self.assertEqual(getattr(data, attr), getattr(ref, attr), attr)
+
+    def test_element_reads_export_the_same_bytes(self):
+        # Chunked export reads vertices and polygons element by element
+        util.scene(meshes = 3, vertices = 150)
+        self.assertEqual(util.export(), util.export(chunk = 17))
+
+    def test_optimize_keeps_triangles(self):
+        bpy, bx3d = util.load()
+        # Welded grid with its triangles shuffled
+        size = 24
+        mesh = bx3d.bxIndexedMesh()
+        mesh.positions = bx3d.bxon_buffer(bx3d.BXON_FLOAT)
+        for j in range(size + 1):
+            for i in range(size + 1):
+                mesh.positions.extend((i, j, 0.0))
+        mesh.normals = bx3d.bxon_buffer(bx3d.BXON_FLOAT, [0.0, 0.0, 1.0] * ((size + 1) ** 2))
+        mesh.sourceVertices = bx3d.bxon_buffer(bx3d.BXON_INT, range((size + 1) ** 2))
+        grid = []
+        for j in range(size):
+            for i in range(size):
+                a = j * (size + 1) + i
+                grid.append(((a, a + 1, a + size + 2), i % 2))
+                grid.append(((a, a + size + 2, a + size + 1), i % 2))
+        random.Random(7).shuffle(grid)
+        mesh.indices = bx3d.bxon_buffer(bx3d.BXON_INT, [v for tri, m in grid for v in tri])
+        mesh.triangleMaterials = bx3d.bxon_buffer(bx3d.BXON_INT, [m for tri, m in grid])
+        triangles = triangleSet(mesh)
+        acmr, atvr = mesh.cacheStats()
+        mesh.optimizeVertexCache()
+        mesh.optimizeVertexFetch()
+        oAcmr, oAtvr = mesh.cacheStats()
+        self.assertEqual(triangleSet(mesh), triangles)
+        self.assertGreater(acmr, 2.0)
+        self.assertLess(oAcmr, 0.8)
+        self.assertLess(oAtvr, atvr)
+        # Vertices are in first use order
+        seen = []
+        for v in mesh.indices:
+            if v not in seen:
+                seen.append(v)
+        self.assertEqual(seen, list(range(len(seen))))
+
+    def test_merged_meshes_are_chunked(self):
+        bpy, bx3d = util.load()
+        objects = util.scene(meshes = 2, vertices = 150, bones = 0)
+        materials = objects[0].data.materials
+        for name in ("CopyA", "CopyB"):
+            mesh = bench.bxon_bench_mesh(name, 150, 2, materials, random.Random(5))
+            objects.append(bench.bxon_bench_object(name, "MESH", mesh))
+        merged = util.export(merge = True)
+        self.assertLess(len(merged), len(util.export()))
+        log = io.StringIO()
+        with contextlib.redirect_stdout(log):
+            bx3d.runExport(io.BytesIO(), merge = True, chunk = 17)
+        self.assertEqual(util.export(merge = True, chunk = 17), merged)
+        # Merged meshes aren't kept in memory for the chunked export
+        self.assertNotIn("Not chunked", log.getvalue())
+
+    def test_indexed_layout_logs_fallback(self):
+        bpy, bx3d = util.load()
+        util.scene(meshes = 2, vertices = 150)
+        log = io.StringIO()
+        with contextlib.redirect_stdout(log):
+            bx3d.runExport(io.BytesIO(), layout = "indexed", chunk = 17)
+        self.assertIn("Not chunked", log.getvalue())
+        self.assertEqual(util.export(layout = "indexed", chunk = 17), util.export(layout = "indexed"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest, io, array
+
+import bxon_test_util as util
+import bxon_reader
+
+class NativeBufferTest(unittest.TestCase):
+    def setUp(self):
+        self.bpy, self.bx3d = util.load()
+
+    ## Write a buffer as a native array of type nType, returns the decoded values.
+    def roundTrip(self, nType, buf, stride = 1):
+        bx3d = self.bx3d
+        ctx = bx3d.bxon_buffered_context(None)
+        root = bx3d.bxon_map(ctx)
+        values = root.put("v", bx3d.bxon_array(nType = nType, nCount = len(buf) // stride, nStride = stride))
+        values.extend(buf)
+        root.flush()
+        return list(bxon_reader.bxon_loads(bytes(ctx.buffer))["v"])
+
+    def test_typed_buffers(self):
+        bx3d = self.bx3d
+        self.assertEqual(self.roundTrip(bx3d.BXON_FLOAT, array.array("f", [1.5, -2.0, 3.25]), 3), [1.5, -2.0, 3.25])
+        self.assertEqual(self.roundTrip(bx3d.BXON_INT, array.array("i", [1, -2, 3])), [1, -2, 3])
+        self.assertEqual(self.roundTrip(bx3d.BXON_INT, array.array("I", [1, 2, 3])), [1, 2, 3])
+        self.assertEqual(self.roundTrip(bx3d.BXON_DOUBLE, array.array("d", [0.1, 0.2])), [0.1, 0.2])
+        self.assertEqual(self.roundTrip(bx3d.BXON_SHORT, array.array("H", [1, 65535])), [1, 65535])
+        self.assertEqual(self.roundTrip(bx3d.BXON_HALF, bx3d.bxHalf([0.5, -2.0])), [0.5, -2.0])
+        self.assertEqual(self.roundTrip(bx3d.BXON_FLOAT, [1.0, 2.0]), [1.0, 2.0])
+
+    def test_mismatched_buffers(self):
+        bx3d = self.bx3d
+        for nType, buf in ((bx3d.BXON_INT, array.array("f", [1.0, 2.0])),
+                           (bx3d.BXON_FLOAT, array.array("i", [1, 2])),
+                           (bx3d.BXON_LONG, array.array("d", [1.0, 2.0])),
+                           (bx3d.BXON_DOUBLE, array.array("q", [1, 2])),
+                           (bx3d.BXON_FLOAT, array.array("d", [1.0, 2.0]))):
+            with self.assertRaises(ValueError):
+                self.roundTrip(nType, buf)
+
+if __name__ == "__main__":
+    unittest.main()
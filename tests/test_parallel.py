@@ -0,0 +1,13 @@
+import unittest
+
+import bxon_test_util as util
+
+class ParallelTest(unittest.TestCase):
+    def test_workers_write_the_same_bytes(self):
+        util.scene(meshes = 4, vertices = 100)
+        serial = util.export()
+        self.assertEqual(util.export(workers = 2), serial)
+        self.assertEqual(util.export(workers = 2, layout = "indexed"), util.export(layout = "indexed"))
+
+if __name__ == "__main__":
+    unittest.main()
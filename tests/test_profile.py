@@ -0,0 +1,81 @@
+import unittest, io, os, json, struct, tempfile, tracemalloc
+
+import bxon_test_util as util
+
+class ProfileTest(unittest.TestCase):
+    def setUp(self):
+        self.bpy, self.bx3d = util.load()
+        self.objects = util.scene(meshes = 2, vertices = 100)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "scene.bxon")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def exportProfiled(self, **options):
+        self.bx3d.runExport(self.path, quiet = True, profile = True, **options)
+        with open(self.path, "rb") as f:
+            data = f.read()
+        with open(self.path + ".profile.json") as f:
+            return data, json.load(f)
+
+    def test_profiled_export_matches(self):
+        for options in ({}, {"buffered" : True}, {"stream" : True}):
+            data, report = self.exportProfiled(**options)
+            self.assertEqual(data, util.export())
+            self.assertGreater(report["counters"]["pack"], 0)
+            self.assertIn("exportMesh", report["stages"])
+
+    def test_failed_export_restores_state(self):
+        for profiler in (None, "tracemalloc"):
+            with self.assertRaises(AttributeError):
+                self.bx3d.runExport(self.path, quiet = True, profile = True, profiler = profiler, objects = [None])
+            self.assertIs(self.bx3d.struct, struct)
+            self.assertFalse(tracemalloc.is_tracing())
+        data, first = self.exportProfiled()
+        data, second = self.exportProfiled()
+        self.assertEqual(first["counters"], second["counters"])
+        self.assertEqual(data, util.export())
+
+    ## Write a map holding an int and a native array of count values, returns
+    ## the (pack, seek) counts of the context.
+    def countWrites(self, cls, nType, count, stride = 1):
+        ctx = cls(io.BytesIO())
+        ctx.counters = {"pack" : 0, "seek" : 0}
+        root = self.bx3d.bxon_map(ctx)
+        root.put("n", 1)
+        values = root.put("v", self.bx3d.bxon_array(nType = nType, nCount = count, nStride = stride))
+        for i in range(count):
+            values.push(i if stride == 1 else [i] * stride)
+        root.flush()
+        return ctx.counters["pack"], ctx.counters["seek"]
+
+    def test_exact_counts(self):
+        bx3d = self.bx3d
+        # Map and array headers, 2 keys, the int, and a length patch per
+        # container. Seeks skip the array values, patch and return to the end
+        # of each container. Streaming writes lengths once known, never seeking.
+        expected = {bx3d.bxon_context : (12, 5), bx3d.bxon_buffered_context : (12, 3),
+                    bx3d.bxon_stream_context : (10, 0)}
+        for cls in expected:
+            pack, seek = expected[cls]
+            for nType, stride in ((bx3d.BXON_LONG, 1), (bx3d.BXON_DOUBLE, 1), (bx3d.BXON_BOOLEAN, 1),
+                                  (bx3d.BXON_BYTE, 1), (bx3d.BXON_SHORT, 1), (bx3d.BXON_HALF, 1),
+                                  (bx3d.BXON_SHORT, 3), (bx3d.BXON_FLOAT, 1), (bx3d.BXON_FLOAT, 3),
+                                  (bx3d.BXON_INT, 4)):
+                self.assertEqual(self.countWrites(cls, nType, 0, stride), (pack, seek), (cls, nType, stride))
+                # Each pushed value is packed once, after seeking back to the
+                # first value
+                self.assertEqual(self.countWrites(cls, nType, 3, stride),
+                                 (pack + 3, seek + (1 if cls != bx3d.bxon_stream_context else 0)), (cls, nType, stride))
+
+    def test_streaming_export_doesnt_seek(self):
+        data, report = self.exportProfiled(stream = True)
+        self.assertEqual(report["counters"]["seek"], 0)
+        data, buffered = self.exportProfiled(buffered = True)
+        data, default = self.exportProfiled()
+        self.assertEqual(buffered["counters"]["pack"], default["counters"]["pack"])
+        self.assertLess(buffered["counters"]["seek"], default["counters"]["seek"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest, io, os, sys, random, threading
+
+import bxon_test_util as util
+import bxon_benchmark as bench
+
+## Binary output that can't seek, like a pipe.
+class Unseekable(io.BytesIO):
+    def seekable(self):
+        return False
+
+    def seek(self, *args):
+        raise io.UnsupportedOperation("seek")
+
+class RoundTripTest(unittest.TestCase):
+    def setUp(self):
+        self.bpy, self.bx3d = util.load()
+        util.scene(meshes = 2, vertices = 200, bones = 4, keys = 8)
+        self.reference = {}
+
+    def expected(self, layout):
+        if layout not in self.reference:
+            self.reference[layout] = util.decode(util.export(layout = layout, influences = 4))
+        return self.reference[layout]
+
+    def assertRoundTrip(self, **options):
+        for layout in ("faces", "indexed"):
+            data = util.export(layout = layout, influences = 4, **options)
+            self.assertEqual(util.decode(data), self.expected(layout), (layout, options))
+
+    def test_compression(self):
+        for codec in ("zlib", "lzma"):
+            self.assertRoundTrip(compression = codec, threshold = 64)
+        plain = util.export()
+        self.assertLess(len(util.export(compression = "zlib", threshold = 64)), len(plain))
+
+    def test_stream(self):
+        self.assertRoundTrip(stream = True)
+        self.assertEqual(util.export(stream = True), util.export())
+
+    def test_compact(self):
+        self.assertRoundTrip(compact = True)
+        self.assertRoundTrip(compact = True, compression = "zlib", threshold = 64)
+        self.assertLess(len(util.export(compact = True)), len(util.export()))
+
+    def test_strings(self):
+        self.assertRoundTrip(strings = True)
+        self.assertRoundTrip(strings = True, compact = True, index = True)
+        data = util.export(strings = True)
+        self.assertIn("strings", util.bxon_reader.bxon_loads(data))
+        self.assertLess(len(data), len(util.export()))
+
+    def test_shared_action(self):
+        objects = util.scene(meshes = 3, vertices = 50, bones = 0)
+        action = bench.bxon_bench_action("Walk", [], 10, random.Random(3))
+        for obj in objects[:2]:
+            obj.animation_data = bench.bxon_fake_data(action = action, nla_tracks = bench.bxon_fake_collection())
+        for bake in (False, True):
+            data = util.decode(util.export(actions = True, bake = bake))
+            self.assertEqual([a["name"] for a in data["action"]], ["Walk"])
+            self.assertEqual(data["action"][0].get("baked", False), bake)
+            self.assertIn("position", data["action"][0])
+            for obj in data["object"][:2]:
+                strip = obj["animation"]["tracks"][0]["strips"][0]
+                self.assertEqual(strip["action"], 0)
+                self.assertNotIn("position", strip)
+            self.assertNotIn("animation", data["object"][2])
+        # Without sharing each object holds its own curves
+        data = util.decode(util.export())
+        self.assertNotIn("action", data)
+        for obj in data["object"][:2]:
+            self.assertIn("position", obj["animation"]["tracks"][0]["strips"][0])
+
+    def test_unseekable_output(self):
+        out = Unseekable()
+        self.bx3d.runExport(out, quiet = True)
+        self.assertEqual(out.getvalue(), util.export())
+
+    def test_pipe_output(self):
+        r, w = os.pipe()
+        chunks = []
+        reader = threading.Thread(target = lambda: chunks.append(os.fdopen(r, "rb").read()))
+        reader.start()
+        with os.fdopen(w, "wb") as out:
+            self.bx3d.runExport(out, quiet = True)
+        reader.join()
+        self.assertEqual(chunks[0], util.export())
+
+    def test_standard_output(self):
+        out = Unseekable()
+        stdout = sys.stdout
+        sys.stdout = io.TextIOWrapper(out)
+        try:
+            self.bx3d.runExport("-", quiet = True)
+        finally:
+            sys.stdout.detach()
+            sys.stdout = stdout
+        self.assertEqual(out.getvalue(), util.export())
+
+if __name__ == "__main__":
+    unittest.main()